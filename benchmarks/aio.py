@@ -0,0 +1,110 @@
+"""What `parse_async` costs over `parse`, and how long it keeps the event loop from running other tasks.
+
+Run as `python benchmarks/aio.py [KB ...]`.
+
+At each size (64, 256 and 1024 KB by default) a JSON document (read whole, then parsed) and CSV rows (parsed row by
+row as they arrive) are fed through an `asyncio.StreamReader`. The times are the best of five. `overhead` is how much
+longer the async parse takes than `parse` of the same text with nothing else running in the loop. Then a task keeps
+going round the loop alongside - `busy` is the time of the parse sharing the interpreter with it and `stall` the
+longest the task had to wait.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pypeg import *
+from pypeg import pace, parse_async
+
+from suite import csv_grammar, csv_input, json_grammar, json_input
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+WORKLOADS = {
+    'json': (json_grammar, json_input, {'ignore': r'\s+'}),
+    'csv': (csv_grammar, csv_input, {}),
+}
+
+
+async def run_async(el, data, kw, busy):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+
+    stall = 0.0
+    done = not busy
+
+    async def tick():
+        nonlocal stall
+
+        last = time.perf_counter()
+
+        while not done:
+            await asyncio.sleep(0)
+
+            now = time.perf_counter()
+            stall = max(stall, now - last)
+            last = now
+
+    ticker = asyncio.ensure_future(tick())
+
+    start = time.perf_counter()
+    await parse_async(el, reader, encoding='utf-8', **kw)
+    elapsed = time.perf_counter() - start
+
+    done = True
+    await ticker
+
+    return elapsed, stall
+
+
+def best_sync(el, text, kw):
+    times = []
+
+    for _ in range(5):
+        start = time.perf_counter()
+        el.parse(text, **kw)
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main():
+    sizes = [int(x) for x in sys.argv[1:]] or [64, 256, 1024]
+
+    sys.setrecursionlimit(100000)
+    random.seed(0)
+
+    loop = asyncio.new_event_loop()
+
+    print('{:>6} {:>6} {:>10} {:>10} {:>10} {:>10} {:>10}'.format('name', 'KB', 'sync ms', 'async ms', 'overhead',
+                                                                   'busy ms', 'stall ms'))
+
+    for name, (grammar, make_input, kw) in WORKLOADS.items():
+        el = grammar()
+        paced_el = pace(el)
+
+        for size in sizes:
+            text = make_input(size * 1024)
+            data = text.encode('utf-8')
+
+            sync = best_sync(el, text, kw)
+            idle = min([loop.run_until_complete(run_async(paced_el, data, kw, False))[0] for _ in range(5)])
+            busy = [loop.run_until_complete(run_async(paced_el, data, kw, True)) for _ in range(5)]
+
+            print('{:>6} {:>6} {:>10.1f} {:>10.1f} {:>9.1%} {:>10.1f} {:>10.1f}'.format(
+                name, size, sync * 1000, idle * 1000, idle / sync - 1, min([x[0] for x in busy]) * 1000,
+                max([x[1] for x in busy]) * 1000))
+
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Compares the throughput of an interpreted and a compiled `expr` grammar.
+
+Run as `python benchmarks/compiled.py [--depth N] [--baseline PATH]`.
+
+The interpreter has been sped up along with the compiler, so the speedup over it is modest. `--baseline` takes a
+checkout of an earlier `pypeg` (e.g. `git worktree add /tmp/baseline <commit>`), whose interpreter parses the same
+inputs in a separate process to compare with as well.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+# Run in the process measuring the baseline - its `pypeg` gets imported before this module, which then uses it.
+BASELINE = '''
+import json, sys
+
+sys.path.insert(0, sys.argv[1])
+
+import pypeg
+
+sys.path.insert(0, sys.argv[2])
+
+import compiled
+
+text, kw = json.load(sys.stdin)
+
+print(compiled.throughput(compiled.grammar(), text, 3, **kw))
+'''
+
+
+def grammar():
+    return expr(r(r'\d+'), [(s('*') | s('/'), 2, 0), (s('+') | s('-'), 2, 0)])
+
+
+def make_input(depth, sep=''):
+    if depth == 0:
+        return str(random.randint(0, 99))
+
+    if random.random() < 0.3:
+        return '(' + make_input(depth - 1, sep) + ')'
+
+    return sep.join([make_input(depth - 1, sep), random.choice('+-*/'), make_input(depth - 1, sep)])
+
+
+def throughput(el, text, repeat, **kw):
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        el.parse(text, **kw)
+
+    return len(text) * repeat / (time.perf_counter() - start) / 2 ** 20
+
+
+def baseline(path, text, kw):
+    out = subprocess.run([sys.executable, '-c', BASELINE, os.path.abspath(path), os.path.dirname(__file__)],
+                         input=json.dumps([text, kw]), capture_output=True, text=True, check=True)
+
+    return float(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Interpreted and compiled expr grammar.')
+
+    parser.add_argument('--depth', type=int, default=12, help='depth of the expressions parsed')
+    parser.add_argument('--baseline', help='checkout of an earlier pypeg to compare with')
+
+    args = parser.parse_args()
+
+    random.seed(0)
+
+    el = grammar()
+    fast = el.compile()
+
+    for sep, kw in [('', {}), (' ', {'ignore': r'\s+'})]:
+        text = make_input(args.depth, sep)
+
+        if el.parse(text, **kw) != fast.parse(text, **kw):
+            raise AssertionError('Compiled grammar gives a different result!')
+
+        a = throughput(el, text, 3, **kw)
+        b = throughput(fast, text, 3, **kw)
+
+        line = '{:<16} {:>8} chars   interpreted {:.3f} MB/s   compiled {:.3f} MB/s   speedup {:.1f}x'.format(
+            'ignore={!r}'.format(kw.get('ignore', None)), len(text), a, b, b / a)
+
+        if args.baseline is not None:
+            c = baseline(args.baseline, text, kw)
+
+            line += '   baseline {:.3f} MB/s   speedup {:.1f}x'.format(c, b / c)
+
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Precedence climbing in `expr` against the grammar of nested repetitions it replaces.
+
+Run as `python benchmarks/expr.py [LEVELS ...]`.
+
+Both parse the same inputs with a grammar of the given numbers of binary operator levels (4 and 12 by default) - a
+long flat expression, one nested deep in parentheses and one with the operators of all levels mixed.
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+SYMBOLS = ['||', '&&', '|', '^', '&', '==', '<', '<<', '+', '-', '*', '/', '%', '**']
+
+
+def grammar(levels):
+    ops = [(s(x), 2, 1 if x == '**' else 0) for x in SYMBOLS[-levels:]]
+
+    return expr(r(r'\d+'), ops[::-1] + [(s('-'), 1, 0)]), [str(o[0].value) for o in ops]
+
+
+def flat(symbols, n):
+    return ' '.join([str(random.randint(0, 99)) + ' ' + random.choice(symbols) for _ in range(n)]) + ' 1'
+
+
+def deep(symbols, n):
+    return '(' * n + '1' + ''.join([' {} {})'.format(random.choice(symbols), random.randint(0, 99)) for _ in range(n)])
+
+
+def mixed(symbols, n):
+    return ' '.join(['-{} {}'.format(random.randint(0, 99), symbols[i % len(symbols)]) for i in range(n)]) + ' 1'
+
+
+def best_time(fn, repeat=5):
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        t = time.perf_counter() - start
+
+        best = t if best is None else min(best, t)
+
+    return best
+
+
+def main():
+    levels = [int(x) for x in sys.argv[1:]] or [4, 12]
+
+    sys.setrecursionlimit(100000)
+    random.seed(0)
+
+    print('{:>6} {:<6} {:>8} {:>12} {:>12} {:>8}'.format('levels', 'input', 'chars', 'climbing ms', 'grammar ms',
+                                                         'speedup'))
+
+    for k in levels:
+        el, symbols = grammar(k)
+
+        for name, make, n in [('flat', flat, 2000), ('deep', deep, 200), ('mixed', mixed, 2000)]:
+            text = make(symbols, n)
+
+            el.engine = True
+            a = best_time(lambda: el.parse(text, ignore=r'\s+'))
+
+            el.engine = False
+            b = best_time(lambda: el.parse(text, ignore=r'\s+'))
+
+            el.engine = True
+
+            print('{:>6} {:<6} {:>8} {:>12.2f} {:>12.2f} {:>7.1f}x'.format(k, name, len(text), a * 1000, b * 1000,
+                                                                           b / a))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Reparsing a JSON document after small edits against parsing it all again.
+
+Run as `python benchmarks/incremental.py [KB ...]`.
+
+At each size (16, 64 and 256 KB by default) the document is edited the way typing does - a digit of a number gets
+replaced, a space inserted, a string gets longer - and parsed again after every edit. The times are the medians.
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pypeg import *
+
+from suite import json_grammar, json_input
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+def random_edit(text):
+    while True:
+        i = random.randrange(1, len(text) - 1)
+
+        if text[i].isdigit() and text[i - 1].isdigit():
+            return i, 1, str(random.randint(0, 9))
+
+        elif text[i] == ' ':
+            return i, 0, ' '
+
+        elif text[i] == '"' and text[i + 1].isalpha():  # Opening quote.
+            return i + 1, 0, 'x'
+
+
+def median(xs):
+    return sorted(xs)[len(xs) // 2]
+
+
+def main():
+    sizes = [int(x) for x in sys.argv[1:]] or [16, 64, 256]
+
+    sys.setrecursionlimit(100000)
+    random.seed(0)
+
+    el = json_grammar()
+
+    print('{:>6} {:>10} {:>12} {:>10} {:>10}'.format('KB', 'edits', 'reparse ms', 'full ms', 'speedup'))
+
+    for size in sizes:
+        doc = Document(el, json_input(size * 1024), ignore=r'\s+')
+        doc.parse()
+
+        edited, full = [], []
+
+        for _ in range(100):
+            e = random_edit(doc.text)
+
+            start = time.perf_counter()
+            doc.edit(*e)
+            edited.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            el.parse(doc.text, ignore=r'\s+')
+            full.append(time.perf_counter() - start)
+
+        a, b = median(edited), median(full)
+
+        print('{:>6} {:>10} {:>12.2f} {:>10.2f} {:>9.1f}x'.format(size, len(edited), a * 1000, b * 1000, b / a))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Checks that parsing time grows linearly with the size of the input.
+
+Run as `python benchmarks/scaling.py [max size in KB]`.
+"""
+
+import os
+import sys
+import time
+from math import log
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+SIZES = [10, 100, 1000, 10000]  # In KB.
+
+
+def grammar():
+    key = r(r'[a-z_]+')
+    value = r(r'\d+') | r(r'"[^"]*"')
+
+    return ((key == 'key') + s('=').spr() + (value == 'value') + s(';').spr())[0:]
+
+
+def make_input(size):
+    entry = 'some_key = "some value"; other = 12345;\n'
+
+    return entry * (size // len(entry) + 1)
+
+
+def measure(el, text, **kw):
+    start = time.perf_counter()
+    el.parse(text, **kw)
+
+    return time.perf_counter() - start
+
+
+def main():
+    sizes = SIZES if len(sys.argv) < 2 else [x for x in SIZES if x <= int(sys.argv[1])]
+
+    el = grammar()
+    results = []
+
+    for size in sizes:
+        text = make_input(size * 1024)
+        t = measure(el, text, ignore=r'\s+')
+
+        results.append((len(text), t))
+
+        print('{:>10} KB {:>10.3f} s {:>8.2f} MB/s'.format(size, t, len(text) / t / 2 ** 20))
+
+    if len(results) > 1:
+        (n0, t0), (n1, t1) = results[0], results[-1]
+
+        print('Scaling exponent: {:.2f} (1.0 is linear)'.format(log(t1 / t0) / log(n1 / n0)))
+
+
+if __name__ == '__main__':
+    main()
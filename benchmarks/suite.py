@@ -0,0 +1,297 @@
+"""Throughput, peak memory and scaling of representative grammars, saved for comparing runs.
+
+Run as `python benchmarks/suite.py [--sizes KB ...] [--only NAME ...] [--out FILE] [--compare FILE]`.
+
+Every workload is measured at each size (best of at least `--repeat` runs) and once more under `tracemalloc` for the
+peak memory. The scaling exponent is the slope of log(time) against log(size), 1.0 being linear. With `--compare`, the
+throughput is checked against an earlier result file and the run fails when a workload got slower by more than
+`--threshold`.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from math import log
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+SIZES = [16, 64, 256, 1024]  # In KB.
+
+
+# Workloads - a grammar, a function generating about the given number of characters of input and the parse options.
+
+def json_grammar():
+    value = ptr()
+
+    string = r(r'"(?:[^"\\]|\\.)*"')
+    number = r(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+
+    member = (string == 'key') + s(':').spr() + value
+
+    obj = (s('{').spr() + delim_lst(member, s(',').spr(), extra_comma=0) + s('}').spr()) == 'object'
+    arr = (s('[').spr() + delim_lst(value, s(',').spr(), extra_comma=0) + s(']').spr()) == 'array'
+
+    value &= obj | arr | string | number | s('true') | s('false') | s('null')
+
+    return value
+
+
+def json_lexed_grammar():
+    # The same grammar matched against tokens.
+    lexer = Lexer([r(r'"(?:[^"\\]|\\.)*"'), r(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?'),
+                   '{', '}', '[', ']', ',', ':', 'true', 'false', 'null'], ignore=r'\s+')
+
+    return lexer.grammar(json_grammar())
+
+
+def json_value(depth):
+    x = random.random()
+
+    if depth > 0 and x < 0.3:
+        return '{' + ', '.join(['"key_{}": {}'.format(i, json_value(depth - 1))
+                                for i in range(random.randint(1, 5))]) + '}'
+
+    elif depth > 0 and x < 0.5:
+        return '[' + ', '.join([json_value(depth - 1) for _ in range(random.randint(1, 5))]) + ']'
+
+    elif x < 0.7:
+        return '"some \\"text\\" {}"'.format(random.randint(0, 10 ** 6))
+
+    elif x < 0.9:
+        return str(random.uniform(-1000, 1000))
+
+    return random.choice(['true', 'false', 'null'])
+
+
+def json_input(size):
+    items = []
+    length = 0
+
+    while length < size:
+        items.append(json_value(4))
+        length += len(items[-1]) + 2
+
+    return '[' + ',\n'.join(items) + ']'
+
+
+def expr_grammar():
+    return expr(r(r'\d+'), [(s('*') | s('/'), 2, 0), (s('+') | s('-'), 2, 0)])
+
+
+def expr_term(depth):
+    if depth == 0:
+        return str(random.randint(0, 999))
+
+    if random.random() < 0.3:
+        return '(' + expr_term(depth - 1) + ')'
+
+    return ' '.join([expr_term(depth - 1), random.choice('+-*/'), expr_term(depth - 1)])
+
+
+def expr_input(size):
+    terms = []
+    length = 0
+
+    while length < size:
+        terms.append(expr_term(5))
+        length += len(terms[-1]) + 3
+
+    return ' + '.join(terms)
+
+
+def csv_grammar():
+    field = r(r'"(?:[^"]|"")*"') | r(r'[^,\n"]*')
+    row = field + (s(',').spr() + field)[0:] + s('\n').spr()
+
+    return g(row)[0:]
+
+
+def csv_input(size):
+    rows = []
+    length = 0
+
+    while length < size:
+        row = ','.join([random.choice([str(random.randint(0, 10 ** 6)), 'plain text',
+                                       '"quoted, with ""quotes"""', '']) for _ in range(8)]) + '\n'
+
+        rows.append(row)
+        length += len(row)
+
+    return ''.join(rows)
+
+
+def comments_input(size):
+    lines = [
+        'key = "value";  # a comment after the code\n',
+        '# a whole line of comment\n',
+        'other_key = 12345;\n',
+        'text = \'quoted\'; list = [1, 2, 3];  # and another one\n',
+    ]
+
+    block = ''.join(lines)
+
+    return block * (size // len(block) + 1)
+
+
+WORKLOADS = {
+    'json': (json_grammar, json_input, {'ignore': r'\s+'}),
+    'json-lexed': (json_lexed_grammar, json_input, {}),
+    'expr': (expr_grammar, expr_input, {'ignore': r'\s+'}),
+    'csv': (csv_grammar, csv_input, {}),
+    'comments': (None, comments_input, {}),
+}
+
+
+def runner(name):
+    grammar, make_input, kw = WORKLOADS[name]
+
+    if grammar is None:
+        return lambda text: trim_comments(text, '#')
+
+    el = grammar()
+
+    return lambda text: el.parse(text, **kw)
+
+
+# Measuring
+
+def best_time(fn, text, repeat, min_total=0.2):
+    # At least `repeat` runs and `min_total` seconds, the fast workloads are noisy otherwise.
+    best = None
+    total = 0.0
+    i = 0
+
+    while i < repeat or total < min_total:
+        start = time.perf_counter()
+        fn(text)
+        t = time.perf_counter() - start
+
+        best = t if best is None else min(best, t)
+        total += t
+        i += 1
+
+    return best
+
+
+def peak_memory(fn, text):
+    tracemalloc.start()
+
+    try:
+        fn(text)
+
+        return tracemalloc.get_traced_memory()[1]
+
+    finally:
+        tracemalloc.stop()
+
+
+def scaling_exponent(points):
+    # Least squares slope in the log-log plane.
+    if len(points) < 2:
+        return None
+
+    xs = [log(n) for n, _ in points]
+    ys = [log(t) for _, t in points]
+
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+
+    return sum([(x - mx) * (y - my) for x, y in zip(xs, ys)]) / sum([(x - mx) ** 2 for x in xs])
+
+
+def run(name, sizes, repeat):
+    make_input = WORKLOADS[name][1]
+    fn = runner(name)
+
+    random.seed(0)
+
+    rows = []
+
+    for size in sizes:
+        text = make_input(size * 1024)
+
+        t = best_time(fn, text, repeat)
+        m = peak_memory(fn, text)
+
+        rows.append({'size': len(text), 'seconds': t, 'mb_per_s': len(text) / t / 2 ** 20, 'peak_bytes': m})
+
+        print('{:<9} {:>8} KB {:>9.3f} s {:>8.2f} MB/s {:>9.2f} MB peak ({:.1f}x input)'.format(
+            name, size, t, rows[-1]['mb_per_s'], m / 2 ** 20, m / len(text)))
+
+    exponent = scaling_exponent([(x['size'], x['seconds']) for x in rows])
+
+    if exponent is not None:
+        print('{:<9} scaling exponent {:.2f}'.format(name, exponent))
+
+    return {'runs': rows, 'scaling_exponent': exponent}
+
+
+def compare(results, old, threshold):
+    # Throughput against an earlier run, at the sizes both have.
+    slower = []
+
+    for name, a in results.items():
+        if name not in old:
+            continue
+
+        before = {x['size']: x['mb_per_s'] for x in old[name]['runs']}
+
+        for x in a['runs']:
+            if x['size'] not in before:
+                continue
+
+            ratio = x['mb_per_s'] / before[x['size']]
+
+            print('{:<9} {:>10} B {:>8.2f} -> {:>8.2f} MB/s ({:+.1%})'.format(name, x['size'], before[x['size']],
+                                                                            x['mb_per_s'], ratio - 1))
+
+            if ratio < 1 - threshold:
+                slower.append(name)
+
+    return sorted(set(slower))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of representative grammars.')
+
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='input sizes in KB')
+    parser.add_argument('--only', nargs='+', choices=sorted(WORKLOADS), default=sorted(WORKLOADS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', help='file to save the results to (JSON)')
+    parser.add_argument('--compare', help='results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown, 0.1 is 10%%')
+
+    args = parser.parse_args()
+
+    results = {name: run(name, args.sizes, args.repeat) for name in args.only}
+
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            old = json.load(f)['results']
+
+        slower = compare(results, old, args.threshold)
+
+        if len(slower) > 0:
+            print('Slower than before: {}'.format(', '.join(slower)))
+
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
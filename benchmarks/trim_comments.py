@@ -0,0 +1,99 @@
+"""Compares `trim_comments` with the character by character loop it replaced.
+
+Run as `python benchmarks/trim_comments.py [size in KB]`.
+"""
+
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+def trim_comments_loop(string, comment_marker, *, end_comment='\n', quote_markers=None, nested_comments=True):
+    out = ''
+
+    quote_markers = {'"', '\''} if quote_markers is None else quote_markers
+
+    commented = 0
+    quoted_by = None
+
+    i = 0
+
+    while i < len(string):
+        if not commented:
+            if quoted_by is None and string[i:len(comment_marker) + i] == comment_marker:
+                commented += 1
+
+                i += 1
+
+                continue
+
+            else:
+                for q in quote_markers:
+                    if string[i:len(q) + i] == q:
+                        if quoted_by == q:
+                            quoted_by = None
+
+                        break
+
+            out += string[i]
+
+        elif string[i:len(end_comment) + i] == end_comment:
+            commented -= 1 if nested_comments else commented
+
+            i += len(end_comment)
+
+            continue
+
+        i += 1
+
+    return out
+
+
+def make_input(size):
+    lines = [
+        'key = "value";  # a comment after the code\n',
+        '# a whole line of comment\n',
+        'other_key = 12345;\n',
+        'text = \'quoted\'; list = [1, 2, 3];  # and another one\n',
+    ]
+
+    block = ''.join(lines)
+
+    return block * (size // len(block) + 1)
+
+
+def throughput(fn, text):
+    start = time.perf_counter()
+    out = fn(text)
+
+    return out, len(text) / (time.perf_counter() - start) / 2 ** 20
+
+
+def main():
+    size = 1024 if len(sys.argv) < 2 else int(sys.argv[1])
+
+    text = make_input(size * 1024)
+
+    old, a = throughput(lambda x: trim_comments_loop(x, '#'), text)
+    new, b = throughput(lambda x: trim_comments(x, '#'), text)
+    streamed, c = throughput(lambda x: ''.join(iter_trim_comments(io.StringIO(x), '#')), text)
+
+    if not old == new == streamed:
+        raise AssertionError('Comments trimmed differently!')
+
+    print('{} KB   loop {:.2f} MB/s   trim_comments {:.2f} MB/s ({:.0f}x)   iter_trim_comments {:.2f} MB/s ({:.0f}x)'
+          .format(size, a, b, b / a, c, c / a))
+
+
+if __name__ == '__main__':
+    main()
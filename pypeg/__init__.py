@@ -1,6 +1,24 @@
 from pypeg.core import *
+from pypeg.lexer import Lexer
+from pypeg.incremental import Document
 
 __author__ = 'Jan Růžička'
 __email__ = 'jan.ruzicka01@gmail.com'
 
 __version__ = '1.0'
+
+
+def __getattr__(name):
+    # `multiprocessing` and `asyncio` take longer to import than all of the rest, so `parse_many` and `parse_async`
+    # are imported on their first use - by name, `from pypeg import *` leaves them out.
+    if name == 'parse_many':
+        from pypeg.batch import parse_many
+
+        return parse_many
+
+    if name in {'pace', 'parse_async'}:
+        import pypeg.aio
+
+        return getattr(pypeg.aio, name)
+
+    raise AttributeError('module \'pypeg\' has no attribute \'{}\''.format(name))
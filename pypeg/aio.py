@@ -0,0 +1,244 @@
+import asyncio
+from codecs import getincrementaldecoder
+from concurrent.futures import CancelledError
+from functools import partial
+from threading import Event
+
+from pypeg.core import *
+from pypeg.stream import iterparse, top_level
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+# Parsing input coming from an `asyncio.StreamReader` or an async iterator of chunks without blocking the event loop.
+# The parse runs in a thread of the loop's executor and every `steps` steps (matches of a rule or of an item of a
+# repetition) it waits for the loop to go round, so that the other tasks aren't starved. The result is that of
+# `ParserElement.parse`.
+#
+# A grammar repeating a rule at its top (`counter` or `delim_lst`) matched against the whole of a text input gets
+# parsed as it arrives, through a window of it (see `pypeg.stream` for `lookahead` and `max_record`) - the thread
+# asks the loop for the next chunk when the window needs one (a syntax error shows only the text still in it). Any
+# other input is read up to its end first - a PEG can backtrack anywhere and has to check for the end - while the
+# other tasks run.
+#
+# The steps are counted by `paced` elements which `pace` puts into a copy of the grammar - a grammar parsed often is
+# better paced once, `parse_async` takes it as it is then. A compiled part of the grammar runs in one go.
+#
+#   rest, result = await parse_async(grammar, reader, encoding='utf-8', ignore=r'\s+')
+
+async def parse_async(el, source, *, steps=1000, chunk_size=65536, encoding=None, lookahead=4096, max_record=2 ** 24,
+                      **kw):
+    if steps < 1:
+        raise ValueError('A parse has to take at least one step at a time!')
+
+    if type(el) is not paced:
+        el = pace(el)
+
+    loop = asyncio.get_running_loop()
+    pacer = Pacer(loop, steps)
+
+    reader = Reader(source, chunk_size, encoding)
+    first = await reader.read()
+
+    top = repeated(el)
+
+    if top is not None and type(first) is str and not kw.get('not_whole', False):
+        parse = partial(parse_stream, top, reader.chunks(first, pacer), lookahead=lookahead, max_record=max_record,
+                        pacer=pacer, **kw)
+
+    else:
+        parse = partial(el.parse, await reader.rest(first), pacer=pacer, **kw)
+
+    try:
+        return await loop.run_in_executor(None, parse)
+
+    except asyncio.CancelledError:
+        pacer.cancel()  # Stops the thread at its next step or read.
+
+        raise
+
+
+def parse_stream(el, chunks, **kw):
+    out = []
+    items = iterparse(el, chunks, **kw)
+
+    while True:
+        try:
+            out += next(items)
+
+        except StopIteration as e:  # Returns the rest of the input.
+            return e.value, out
+
+
+def repeated(el):
+    # The repetition at the top of a paced grammar, to be parsed an item at a time - `None` if there's none.
+    while type(el) in {paced, ptr}:
+        el = el.el
+
+    x = top_level(el, None)[0]
+
+    if type(x) is counter or type(x) is delim_lst and not (x.extra_comma == 1 and x.min > 0):
+        return el
+
+    return None
+
+
+class Reader:
+    # Chunks of the input of `parse_async`, decoded when there's an encoding. `read` returns `None` at the end.
+    __slots__ = ['source', 'chunk_size', 'decoder', 'ended']
+
+    def __init__(self, source, chunk_size, encoding):
+        self.source = source if hasattr(source, 'read') else source.__aiter__()
+        self.chunk_size = chunk_size
+        self.decoder = None if encoding is None else getincrementaldecoder(encoding)()
+        self.ended = False
+
+    async def read(self):
+        if self.ended:
+            return None
+
+        if hasattr(self.source, 'read'):
+            chunk = await self.source.read(self.chunk_size)
+
+            if len(chunk) == 0:
+                chunk = None
+
+        else:
+            try:
+                chunk = await self.source.__anext__()
+
+            except StopAsyncIteration:
+                chunk = None
+
+        if chunk is None:
+            self.ended = True
+
+            if self.decoder is not None:
+                return self.decoder.decode(b'', final=True) or None
+
+        elif type(chunk) not in {str, bytes}:
+            raise ParseError('Can\'t match non-string!')
+
+        elif self.decoder is not None and type(chunk) is bytes:
+            return self.decoder.decode(chunk)
+
+        return chunk
+
+    async def rest(self, first):
+        # All of the input from the `first` chunk on.
+        parts = []
+        chunk = first
+
+        while chunk is not None:
+            parts.append(chunk)
+            chunk = await self.read()
+
+        if len(parts) == 0:
+            return b'' if hasattr(self.source, 'read') and self.decoder is None else ''
+
+        return parts[0][:0].join(parts)
+
+    def chunks(self, first, pacer):
+        # The chunks from the `first` on for the parse's thread, read by the loop.
+        chunk = first
+
+        while chunk is not None:
+            yield chunk
+
+            chunk = pacer.wait(self.read())
+
+
+def pace(el):
+    # The grammar counting its steps, `parse_async` can parse it as many times as needed.
+    return paced(el.transform(bind))
+
+
+def bind(x, original):
+    t = type(x)
+
+    if t is ptr:
+        if x.el is not None and type(x.el) is not paced:
+            x.el = paced(x.el)
+
+        return x
+
+    elif t is named:
+        return paced(x)
+
+    elif t is counter:
+        x.el = paced(x.el)
+
+    return x
+
+
+class Pacer:
+    # The loop the parse hands the control over to, every `steps` steps.
+    __slots__ = ['loop', 'steps', 'left', 'turn', 'reading', 'cancelled']
+
+    def __init__(self, loop, steps):
+        self.loop = loop
+        self.steps = steps
+        self.left = steps
+        self.turn = Event()
+        self.reading = None
+        self.cancelled = False
+
+    def step(self):
+        self.left -= 1
+
+        if self.left > 0:
+            return
+
+        self.left = self.steps
+
+        # Everything ready to run in the loop goes before the callback.
+        self.turn.clear()
+        self.loop.call_soon_threadsafe(self.turn.set)
+        self.turn.wait()
+
+        if self.cancelled:
+            raise asyncio.CancelledError()
+
+    def wait(self, coro):
+        # Runs `coro` in the loop and waits for its result, from the parse's thread.
+        future = self.reading = asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+        if self.cancelled:  # `cancel` may have missed it.
+            future.cancel()
+
+        try:
+            return future.result()
+
+        except CancelledError:
+            raise asyncio.CancelledError()
+
+    def cancel(self):
+        self.cancelled = True
+
+        if self.reading is not None:
+            self.reading.cancel()
+
+
+class paced(ParserElement):
+    # Counts a step of the parse that `parse_async` runs, parsed otherwise it's just the element.
+    __slots__ = ['el']
+    transparent = True
+
+    def __init__(self, el):
+        super(paced, self).__init__(el.value)
+
+        self.el = el
+
+    def __str__(self):
+        return str(self.el)
+
+    def match(self, text, pos, ctx):
+        pacer = ctx.options.get('pacer', None)
+
+        if pacer is not None:
+            pacer.step()
+
+        return self.el.match(text, pos, ctx)
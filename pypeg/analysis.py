@@ -0,0 +1,261 @@
+from re import compile, escape
+
+import pypeg.core
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+# FIRST sets - which characters can an element start with. A FIRST set is a tuple `(chars, patterns, nullable)`,
+# where `patterns` are single character regexes and `nullable` tells whether the element can match without consuming
+# anything. `None` stands for an unknown FIRST set, which has to be treated as "anything".
+
+NOTHING = (frozenset(), (), True)
+
+CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: r'\d', sre_constants.CATEGORY_NOT_DIGIT: r'\D',
+    sre_constants.CATEGORY_SPACE: r'\s', sre_constants.CATEGORY_NOT_SPACE: r'\S',
+    sre_constants.CATEGORY_WORD: r'\w', sre_constants.CATEGORY_NOT_WORD: r'\W',
+}
+
+
+def regex_first(pattern):
+    try:
+        tree = sre_parse.parse(pattern.pattern, pattern.flags)
+
+    except Exception:
+        return None
+
+    a = regex_seq_first(list(tree))
+
+    if a is None:
+        return None
+
+    classes, nullable = a
+
+    if type(pattern.pattern) is bytes:  # The classes only use characters below 256.
+        classes = [x.encode('latin-1') for x in classes]
+
+    return frozenset(), tuple([compile(x, pattern.flags) for x in classes]), nullable
+
+
+def regex_seq_first(items):
+    classes = []
+
+    for op, av in items:
+        a = regex_item_first(op, av)
+
+        if a is None:
+            return None
+
+        classes += a[0]
+
+        if not a[1]:
+            return classes, False
+
+    return classes, True
+
+
+def regex_item_first(op, av):
+    c = sre_constants
+
+    if op is c.LITERAL:
+        return [escape(chr(av))], False
+
+    elif op is c.NOT_LITERAL:
+        return ['[^{}]'.format(escape(chr(av)))], False
+
+    elif op is c.ANY:
+        return ['.'], False
+
+    elif op is c.IN:
+        parts = []
+
+        for x, y in av:
+            if x is c.NEGATE:
+                parts.append('^')
+
+            elif x is c.LITERAL:
+                parts.append(escape(chr(y)))
+
+            elif x is c.RANGE:
+                parts.append('{}-{}'.format(escape(chr(y[0])), escape(chr(y[1]))))
+
+            elif x is c.CATEGORY and y in CATEGORIES:
+                parts.append(CATEGORIES[y])
+
+            else:
+                return None
+
+        return ['[{}]'.format(''.join(parts))], False
+
+    elif op is c.BRANCH:
+        classes, nullable = [], False
+
+        for x in av[1]:
+            a = regex_seq_first(list(x))
+
+            if a is None:
+                return None
+
+            classes += a[0]
+            nullable = nullable or a[1]
+
+        return classes, nullable
+
+    elif op is c.SUBPATTERN:
+        if av[1] or av[2]:  # Local flags.
+            return None
+
+        return regex_seq_first(list(av[3]))
+
+    elif op is getattr(c, 'ATOMIC_GROUP', None):
+        return regex_seq_first(list(av))
+
+    elif op in {c.MAX_REPEAT, c.MIN_REPEAT, getattr(c, 'POSSESSIVE_REPEAT', None)}:
+        if av[1] == 0:
+            return [], True
+
+        a = regex_seq_first(list(av[2]))
+
+        return None if a is None else (a[0], a[1] or av[0] == 0)
+
+    elif op in {c.AT, c.ASSERT, c.ASSERT_NOT}:  # Zero width, can't rule anything out.
+        return [], True
+
+    return None
+
+
+def first_set(el, done=None):
+    done = {} if done is None else done
+
+    if id(el) in done:
+        return done[id(el)]
+
+    done[id(el)] = None  # Recursion (left recursion in fact) - give up on the cycle.
+
+    done[id(el)] = element_first(el, done)
+
+    return done[id(el)]
+
+
+def element_first(el, done):
+    core = pypeg.core
+    t = type(el)
+
+    if el is core.EMPTY:
+        return NOTHING
+
+    elif t is core.s:
+        return (frozenset([el.value[:1]]), (), False) if el.value else NOTHING
+
+    elif t is core.r:
+        return regex_first(el.pattern)
+
+    elif t in {core.union, core.choice, core.longest, core.replay}:
+        return choice_first([first_set(x, done) for x in el.xs])
+
+    elif t is core.combinator:
+        a = NOTHING
+
+        for x in el.xs:
+            if x is core.cut:  # A failure after the cut must stay fatal.
+                return None
+
+            b = first_set(x, done)
+
+            if b is None:
+                return None
+
+            a = (a[0] | b[0], a[1] + b[1], b[2])
+
+            if not b[2]:
+                break
+
+        return a
+
+    elif t in {core.optional, core.observer}:
+        a = first_set(el.el, done)
+
+        return None if a is None else (a[0], a[1], True)
+
+    elif t is core.negative:
+        return NOTHING
+
+    elif t is core.counter:
+        a = first_set(el.el, done)
+
+        return None if a is None else (a[0], a[1], a[2] or el.min == 0)
+
+    elif t in {core.expr, core.delim_lst}:
+        return first_set(el.expr, done)
+
+    elif t is core.ptr:
+        return None if el.el is None else first_set(el.el, done)
+
+    elif t.transparent:
+        return first_set(el.el, done)
+
+    return el.first()  # `debugged` has to see every attempt, it's unknown like anything else.
+
+
+def choice_first(xs):
+    if any([x is None for x in xs]):
+        return None
+
+    chars, patterns, nullable = frozenset(), (), False
+
+    for x in xs:
+        chars |= x[0]
+        patterns += x[1]
+        nullable = nullable or x[2]
+
+    return chars, patterns, nullable
+
+
+def accepts(first, c):
+    if first is None or first[2]:
+        return True
+
+    return c in first[0] or any([p.match(c) for p in first[1]])
+
+
+# Picks the alternatives of a choice which can start at the next character, preserving their order.
+
+class FirstDispatch:
+    __slots__ = ['firsts', 'cache', 'useful', 'generation']
+
+    def __init__(self, xs):
+        done = {}
+
+        # Pointing a `ptr` elsewhere can change the sets, the dispatch made before then is `stale`.
+        self.generation = pypeg.core.ptr.generation
+
+        self.firsts = [first_set(x, done) for x in xs]
+        self.cache = {}
+        self.useful = any([x is not None and not x[2] for x in self.firsts])
+
+    @property
+    def stale(self):
+        return self.generation != pypeg.core.ptr.generation
+
+    def candidates(self, c, d=None):
+        # `c` is the next character, `d` the next one after skipping ignored text (`''` at the end of input).
+        key = c if d is None or d == c else (c, d)
+
+        a = self.cache.get(key, None)
+
+        if a is None:
+            a = self.cache[key] = tuple([i for i, x in enumerate(self.firsts)
+                                         if accepts(x, c) or d is not None and accepts(x, d)])
+
+        return a
@@ -0,0 +1,87 @@
+from functools import partial
+from multiprocessing import Pool
+
+from pypeg.core import *
+from pypeg.utils import FatalParseError
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+# Parses many independent documents with one grammar in a pool of processes. Grammars often don't pickle (lambdas in
+# `apply` or `debugged`), so `grammar` can be a function building the grammar, called once in every worker instead -
+# it has to be defined at the top level of a module to be sent there. A grammar itself only gets sent when it pickles
+# or when the workers are forked.
+#
+# The documents are sent in chunks of `chunk_size`. With `ordered`, the results come in the order of the inputs,
+# otherwise as soon as they're done, as `(index, result)` pairs. A parse error is raised, or with `errors='return'`
+# handed over in place of the result. The results are those of `ParserElement.parse`.
+
+def parse_many(grammar, inputs, *, workers=None, chunk_size=16, ordered=True, errors='raise', **kw):
+    # The arguments are checked right away, not once the results are asked for.
+    if errors not in {'raise', 'return'}:
+        raise ValueError('Invalid error handling, expected \'raise\' or \'return\'!')
+
+    if workers is not None and workers < 1 or chunk_size < 1:
+        raise ValueError('There has to be at least one worker and one document in a chunk!')
+
+    return run(grammar, inputs, workers, chunk_size, ordered, errors, kw)
+
+
+def run(grammar, inputs, workers, chunk_size, ordered, errors, kw):
+    if workers == 1:  # Not worth a process, nor the state of one - the calls may nest or run in threads.
+        results = map(partial(parse_with, build(grammar), kw), enumerate(inputs))
+
+        yield from collect(results, ordered, errors)
+
+        return
+
+    with Pool(workers, init, (grammar, kw)) as pool:
+        if ordered:
+            results = pool.imap(parse_one, enumerate(inputs), chunk_size)
+
+        else:
+            results = pool.imap_unordered(parse_one, enumerate(inputs), chunk_size)
+
+        yield from collect(results, ordered, errors)
+
+
+def collect(results, ordered, errors):
+    for i, a, error in results:
+        if error is not None:
+            if errors == 'raise':
+                raise error
+
+            a = error
+
+        yield a if ordered else (i, a)
+
+
+def build(grammar):
+    return grammar if isinstance(grammar, ParserElement) else grammar()
+
+
+def parse_with(el, kw, item):
+    i, text = item
+
+    try:
+        return i, el.parse(text, **kw), None
+
+    except (ParseError, FatalParseError) as e:
+        return i, None, e
+
+
+# The worker side.
+
+state = {}
+
+
+def init(grammar, kw):
+    state['el'] = build(grammar)
+    state['kw'] = kw
+
+
+def parse_one(item):
+    return parse_with(state['el'], state['kw'], item)
@@ -0,0 +1,146 @@
+import os
+import pickle
+import sys
+
+from hashlib import sha1
+from inspect import getsource, getmodule
+from types import BuiltinFunctionType, FunctionType
+
+import pypeg.core
+from pypeg.core import *
+from pypeg.utils import CACHES, LazyPattern, slot_names
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+# Saving a built grammar to skip building it at startup - neither the operator overloads nor the analyses done on the
+# way run again. Python can't store the regexes compiled, they get compiled when first used after loading. Functions
+# (`apply` etc.) are stored by name, so they have to be defined at the top level of a module - a grammar using lambdas
+# can't be saved.
+
+def fingerprint(el):
+    # Hash of the structure of the grammar - element types, their values, names and patterns, and how they connect.
+    # Whatever the elements cache for themselves (`CACHES`) is left out.
+    index = {}
+
+    for x in el.walk():
+        index[id(x)] = len(index)
+
+    h = sha1()
+
+    for x in el.walk():
+        h.update('{}:{}('.format(index[id(x)], type(x).__qualname__).encode())
+
+        for name in slot_names(type(x)):
+            if name not in CACHES and hasattr(x, name):
+                h.update('{}={};'.format(name, describe(getattr(x, name), index)).encode())
+
+        h.update(b')')
+
+    return h.hexdigest()
+
+
+def describe(v, index):
+    if isinstance(v, ParserElement):
+        return '#{}'.format(index[id(v)])
+
+    elif type(v) in {list, tuple}:
+        return '[{}]'.format(','.join([describe(x, index) for x in v]))
+
+    elif type(v) in {type(pypeg.core.compile('')), LazyPattern}:
+        return 'r{!r}/{}'.format(v.pattern, v.flags)
+
+    elif type(v) in {FunctionType, BuiltinFunctionType}:
+        return '{}.{}'.format(v.__module__, v.__qualname__)
+
+    elif v is None or type(v) in {str, bytes, int, float, bool}:
+        return repr(v)
+
+    return '?'
+
+
+def save(el, path, key=None):
+    # The grammar is stored under `key`, its fingerprint by default. It's written to a temporary file first, so that
+    # a reader never sees half of it.
+    if key is None:
+        key = fingerprint(el)
+
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+
+    with open(tmp, 'wb') as f:
+        pickle.dump((header(), key), f, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(el, f, pickle.HIGHEST_PROTOCOL)
+
+    os.replace(tmp, path)
+
+
+def load(path, key=None):
+    # Returns `None` when the file is missing, was saved by another version of Python or build of `pypeg`, (if given)
+    # under another key, or refers to classes which have been renamed or changed since.
+    try:
+        with open(path, 'rb') as f:
+            head, k = pickle.load(f)
+
+            if head != header() or key is not None and k != key:
+                return None
+
+            return pickle.load(f)
+
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError, ValueError):
+        return None
+
+
+def cached(factory, path, key=None):
+    # The grammar built by `factory`, loaded from `path` if it's there and up to date - saved there otherwise.
+    # Without a `key`, the grammar counts as changed whenever the source of the module defining `factory` does; a
+    # grammar spread over more modules needs a `key` of its own.
+    if key is None:
+        key = source_key(factory)
+
+    el = load(path, key)
+
+    if el is None:
+        el = factory()
+
+        save(el, path, key)
+
+    return el
+
+
+def source_key(factory):
+    module = getmodule(factory)
+
+    try:
+        source = getsource(module)
+
+    except (OSError, TypeError):
+        source = getsource(factory)
+
+    return sha1('{}.{}\n{}'.format(factory.__module__, factory.__qualname__, source).encode()).hexdigest()
+
+
+def header():
+    return 'pypeg', pypeg.core.__version__, sys.version_info[:2], sources_key()
+
+
+SOURCES = []
+
+
+def sources_key():
+    # Hash of the sources of `pypeg`, the grammars pickle its internals - a file saved by another build of it is stale
+    # even when the version stays the same.
+    if len(SOURCES) == 0:
+        h = sha1()
+        path = os.path.dirname(pypeg.core.__file__)
+
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.py'):
+                with open(os.path.join(path, name), 'rb') as f:
+                    h.update(name.encode() + b'\0' + f.read())
+
+        SOURCES.append(h.hexdigest())
+
+    return SOURCES[0]
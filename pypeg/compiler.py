@@ -0,0 +1,823 @@
+import sys
+from re import compile, escape
+from threading import get_ident
+
+from pypeg.core import *
+from pypeg.core import longest, observer
+from pypeg.analysis import FirstDispatch
+from pypeg.utils import FatalParseError, ParseContext, TEXT_TYPES, fold, skipper
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+# Merging terminals into one regex relies on atomic groups to keep PEG's no-backtracking semantics.
+ATOMIC_GROUPS = sys.version_info >= (3, 11)
+
+
+# Compiled grammar - behaves like the original element, parses using a program of flat closures.
+
+class compiled(ParserElement):
+    __slots__ = ['el', 'programs']
+    transparent = True
+
+    def __init__(self, el):
+        super(compiled, self).__init__(el.value)
+
+        self.el = el
+        self.programs = {}
+
+    def __str__(self):
+        return 'compiled({})'.format(self.el)
+
+    def compile(self):
+        return self
+
+    def __getstate__(self):
+        # The programs are closures, they get lowered again when needed.
+        return None, {'value': self.value, 'el': self.el, 'programs': {}}
+
+    def program(self, ignore=None):
+        if ignore not in self.programs:
+            self.programs[ignore] = Compiler(ignore).lower(self.el)
+
+        return self.programs[ignore]
+
+    def parse_at(self, text, pos, **kw):
+        if not isinstance(text, TEXT_TYPES):
+            raise ParseError('Can\'t match non-string!')
+
+        self.check_text(text)
+
+        a = self.match(text, pos, ParseContext(text, **kw))
+
+        # The program doesn't keep track of failures, the element tree reparses the input to explain what went wrong.
+        if a is None:
+            return self.el.parse_at(text, pos, **kw)
+
+        return a
+
+    def parse_all(self, string, **kw):
+        try:
+            return super(compiled, self).parse_all(string, **kw)
+
+        except ParseError:  # Same as in `parse_at`.
+            return self.el.parse_all(string, **kw)
+
+    def match(self, text, pos, ctx):
+        # Memoization needs the element tree, the program has nowhere to keep it.
+        if ctx.packrat is not None:
+            return self.el.match(text, pos, ctx)
+
+        return self.program(ctx.ignore)(text, pos, not ctx.not_whole)
+
+
+# Lowers an element tree into closures `f(text, pos, whole)`, which return `(pos, result)` or `None` on failure.
+
+class Compiler:
+    def __init__(self, ignore=None):
+        if ignore is not None and type(ignore) not in {str, bytes}:
+            raise TypeError('I can ignore parts of string only using RegEx!')
+
+        # Patterns get put together as strings, the binary ones byte for byte.
+        self.binary = type(ignore) is bytes
+
+        self.ignore = ignore
+        self.source = ignore.decode('latin-1') if self.binary else ignore
+        self.ig = None if ignore is None else compile(ignore)
+
+        self.done = {}
+
+        self.lowerings = {
+            s: self.lower_s, r: self.lower_r, u: self.lower_u, g: self.lower_g, G: self.lower_G,
+            group: self.lower_group, combo: self.lower_combo, union: self.lower_union, named: self.lower_named,
+            apply: self.lower_apply, counter: self.lower_counter, longest: self.lower_longest,
+            suppress: self.lower_suppress, debugged: self.lower_debugged, optional: self.lower_optional,
+            negative: self.lower_negative, take_out: self.lower_take_out, observer: self.lower_observer,
+            combinator: self.lower_combinator, expr: self.lower_expr, delim_lst: self.lower_delim_lst,
+            ptr: self.lower_ptr, memo: self.lower_wrapped, compiled: self.lower_wrapped, wrap.wrapper: self.lower_wrap,
+        }
+
+    def lower(self, el):
+        if id(el) not in self.done:
+            if el is EMPTY:
+                self.done[id(el)] = lambda text, pos, whole: (pos, [])
+
+            else:
+                self.done[id(el)] = self.lowerings.get(type(el), self.lower_fallback)(el)
+
+        return self.done[id(el)]
+
+    # Whitespace handling
+
+    def skipper(self):
+        return None if self.ig is None else skipper(self.ignore)
+
+    def at_end(self):
+        skip = self.skipper()
+
+        if skip is None:
+            return lambda text, pos: pos >= len(text)
+
+        return lambda text, pos: skip(text, pos) >= len(text)
+
+    # Terminals
+
+    def lower_s(self, el):
+        v = el.value
+        n = len(v)
+
+        return self.literal(n, v, [v])
+
+    def literal(self, n, v, out):
+        if type(v) is bytes:  # A memory map has no `startswith`, but any binary input can be matched by a regex.
+            return self.binary_literal(n, v, out)
+
+        skip = self.skipper()
+        at_end = self.at_end()
+
+        def f(text, pos, whole):
+            if not text.startswith(v, pos):
+                if skip is None:
+                    return None
+
+                q = skip(text, pos)
+
+                if q == pos or not text.startswith(v, q):
+                    return None
+
+                pos = q
+
+            pos += n
+
+            if whole and not at_end(text, pos):
+                return None
+
+            return pos, list(out)
+
+        return f
+
+    def binary_literal(self, n, v, out):
+        match = compile(escape(v)).match
+        skip = self.skipper()
+        at_end = self.at_end()
+
+        def f(text, pos, whole):
+            if match(text, pos) is None:
+                if skip is None:
+                    return None
+
+                q = skip(text, pos)
+
+                if q == pos or match(text, q) is None:
+                    return None
+
+                pos = q
+
+            pos += n
+
+            if whole and not at_end(text, pos):
+                return None
+
+            return pos, list(out)
+
+        return f
+
+    def lower_r(self, el):
+        match = el.pattern.match
+        skip = self.skipper()
+        at_end = self.at_end()
+
+        def f(text, pos, whole):
+            a = match(text, pos)
+
+            if a is None:
+                if skip is None:
+                    return None
+
+                q = skip(text, pos)
+
+                if q == pos:
+                    return None
+
+                a = match(text, q)
+
+                if a is None:
+                    return None
+
+            pos = a.end()
+
+            if whole and not at_end(text, pos):
+                return None
+
+            return pos, [a.group()]
+
+        return f
+
+    @staticmethod
+    def terminal(el):
+        # Returns `(pattern, literal, kept)` for elements that match a single token, `None` otherwise.
+        kept = True
+
+        if type(el) is suppress:
+            el, kept = el.el, False
+
+        if type(el) is s:
+            return escape(el.value), el.value, kept
+
+        if type(el) is r and el.pattern.groups == 0 and el.pattern.flags == compile('').flags:
+            return el.pattern.pattern, None, kept
+
+        return None
+
+    def lower_run(self, run):
+        # Fuses consecutive terminals of a sequence: literals into one `startswith` when nothing gets ignored,
+        # anything else into one regex of atomic groups, each trying to match before and after skipping ignored text.
+        if self.binary or any([type(x[0]) is bytes for x in run]):
+            return None
+
+        out = [x[1] for x in run if x[2]]
+
+        if self.ig is None and all([x[1] is not None for x in run]):
+            v = ''.join([x[1] for x in run])
+
+            return self.literal(len(v), v, out)
+
+        if not ATOMIC_GROUPS or (self.ig is not None and self.ig.groups > 0):
+            return None
+
+        skip = '' if self.ig is None else '(?:(?>(?:{})*))??'.format(self.source)
+        pattern = compile(''.join(['(?>{}({}))'.format(skip, x[0]) for x in run]))
+
+        kept = [i + 1 for i, x in enumerate(run) if x[2]]
+        match = pattern.match
+
+        def f(text, pos, whole):
+            a = match(text, pos)
+
+            if a is None:
+                return None
+
+            return a.end(), [a.group(i) for i in kept]
+
+        return f
+
+    # Wrappers
+
+    def lower_wrapped(self, el):
+        return self.lower(el.el)
+
+    def lower_u(self, el):
+        inner = self.lower(el.el)
+
+        def f(text, pos, whole):
+            a = inner(text, pos, whole)
+
+            if a is not None and type(a[1]) is list and len(a[1]) == 1:
+                return a[0], a[1][0]
+
+            return a
+
+        return f
+
+    def lower_g(self, el):
+        inner = self.lower(el.el)
+
+        # Terminals produce exactly one token, there is nothing to group.
+        if type(el.el) in {s, r}:
+            return inner
+
+        def f(text, pos, whole):
+            a = inner(text, pos, whole)
+
+            if a is not None and type(a[1]) is list and len(a[1]) > 1:
+                return a[0], [a[1]]
+
+            return a
+
+        return f
+
+    def lower_G(self, el):
+        inner = self.lower(el.el)
+
+        def f(text, pos, whole):
+            a = inner(text, pos, whole)
+
+            if a is not None and (len(a[1]) == 0 or type(a[1][0]) not in {list, tuple}):
+                return a[0], [a[1]]
+
+            return a
+
+        return f
+
+    def lower_group(self, el):
+        inner = self.lower(el.el)
+
+        def f(text, pos, whole):
+            a = inner(text, pos, whole)
+
+            return None if a is None else (a[0], [a[1]])
+
+        return f
+
+    def lower_combo(self, el):
+        inner = self.lower(el.el)
+
+        def f(text, pos, whole):
+            a = inner(text, pos, whole)
+
+            if a is None:
+                return None
+
+            out = []
+
+            for x in a[1]:
+                if len(out) > 0 and type(out[-1]) in {str, bytes, list}:
+                    out[-1] = out[-1] + x
+
+                else:
+                    out.append(x)
+
+            return a[0], out
+
+        return f
+
+    def lower_named(self, el):
+        inner = self.lower(el.el)
+        at_end = self.at_end()
+        name = el.name
+
+        def f(text, pos, whole):
+            a = inner(text, pos, whole)
+
+            if a is None or whole and not at_end(text, a[0]):
+                return None
+
+            return a[0], [(name, a[1])]
+
+        return f
+
+    def lower_apply(self, el):
+        inner = self.lower(el.el)
+        at_end = self.at_end()
+        fn = el.fn
+
+        def f(text, pos, whole):
+            a = inner(text, pos, whole)
+
+            if a is None or whole and not at_end(text, a[0]):
+                return None
+
+            return a[0], list(map(fn, a[1]))
+
+        return f
+
+    def lower_suppress(self, el):
+        if type(el.el) is s:
+            return self.literal(len(el.value), el.value, [])
+
+        inner = self.lower(el.el)
+        at_end = self.at_end()
+
+        def f(text, pos, whole):
+            a = inner(text, pos, whole)
+
+            if a is None or whole and not at_end(text, a[0]):
+                return None
+
+            return a[0], []
+
+        return f
+
+    def lower_checked(self, el):
+        inner = self.lower(el.expr)
+        at_end = self.at_end()
+
+        def f(text, pos, whole):
+            a = inner(text, pos, whole)
+
+            if a is None or whole and not at_end(text, a[0]):
+                return None
+
+            return a
+
+        return f
+
+    lower_delim_lst = lower_checked
+
+    def lower_expr(self, el):
+        # `expr` switches the whole-input check off for itself as well. It climbs the precedence levels as
+        # `expr.climb` does, unless its engine is off.
+        if not el.engine:
+            inner = self.lower(el.expr)
+
+            return lambda text, pos, whole: inner(text, pos, False)
+
+        top = len(el.binary) - 1
+
+        def f(text, pos, whole):
+            return climb(text, pos, top)
+
+        self.done[id(el)] = f  # The parenthesized expressions in the factor come back here.
+
+        factor = self.lower(el.factor)
+        binary = [self.lower(x) for x in el.binary]
+        left = el.left
+        operators_at = self.operators_at(el)
+
+        def climb(text, pos, k):
+            a = factor(text, pos, False)
+
+            if a is None:
+                return None
+
+            pos, out = a
+
+            near, at = None, -1
+
+            for j in range(k + 1):
+                items = None
+                op = binary[j]
+
+                while True:
+                    if at != pos:
+                        near, at = operators_at(text, pos), pos
+
+                    if near is not None and j not in near:
+                        break
+
+                    a = op(text, pos, False)
+
+                    if a is None:
+                        break
+
+                    b = climb(text, a[0], j - 1)
+
+                    if b is None:
+                        break
+
+                    if items is None:
+                        items = list(out)
+
+                    items += a[1]
+                    items += b[1]
+
+                    pos = b[0]
+
+                if items is not None:
+                    out = fold(items, 3, left[j])
+
+            return pos, out
+
+        return f
+
+    def operators_at(self, el):
+        # `expr.operators_at` without the failures, `None` when the FIRST sets don't tell.
+        dispatch = FirstDispatch(el.binary)
+
+        if not dispatch.useful:
+            return lambda text, pos: None
+
+        candidates = dispatch.candidates
+        skip = self.skipper()
+
+        def f(text, pos):
+            q = pos if skip is None else skip(text, pos)
+            c = text[pos:pos + 1]
+
+            if type(text) is bytearray:  # The slices have to be hashable.
+                return candidates(bytes(c), None if q == pos else bytes(text[q:q + 1]))
+
+            return candidates(c, None if q == pos else text[q:q + 1])
+
+        return f
+
+    def lower_wrap(self, el):
+        inner = self.lower(el.el)
+        at_end = self.at_end()
+        c, left = el.c, el.left
+
+        def f(text, pos, whole):
+            a = inner(text, pos, whole)
+
+            if a is None or whole and not at_end(text, a[0]):
+                return None
+
+            return a[0], fold(a[1], c, left)
+
+        return f
+
+    def lower_debugged(self, el):
+        inner = self.lower(el.el)
+        e, a_fn, b_fn = el.el, el.a_fn, el.b_fn
+        ignore = self.ignore
+
+        def f(text, pos, whole):
+            kw = {'ignore': ignore, 'not_whole': not whole}
+
+            a_fn(e, text[pos:], **kw)
+
+            a = inner(text, pos, whole)
+
+            if a is not None:
+                b_fn(e, text[a[0]:], **kw)
+
+            return a
+
+        return f
+
+    def lower_take_out(self, el):
+        inner = self.lower(el.el)
+        at_end = self.at_end()
+        name = el.name
+
+        def f(text, pos, whole):
+            a = inner(text, pos, whole)
+
+            if a is None or whole and not at_end(text, a[0]):
+                return None
+
+            out = []
+
+            for x in a[1]:
+                if type(x) is tuple and x[0] == name:
+                    if type(x[1]) is list:
+                        out += x[1]
+
+                    else:
+                        out.append(x[1])
+
+            return a[0], out
+
+        return f
+
+    # Choices
+
+    def lower_union(self, el):
+        if len(el.xs) > 1 and all([type(x) is s and type(x.value) is str for x in el.xs]):
+            return self.lower_literals([x.value for x in el.xs])
+
+        fs = [self.lower(x) for x in el.xs]
+        skip = self.skipper()
+
+        def f(text, pos, whole):
+            for i in el.candidates(text, pos, skip):
+                a = fs[i](text, pos, whole)
+
+                if a is not None:
+                    return a
+
+            return None
+
+        return f
+
+    def lower_literals(self, vs):
+        # Ordered choice of literals, the ignored text before them gets skipped at most once.
+        skip = self.skipper()
+        at_end = self.at_end()
+
+        def f(text, pos, whole):
+            after = None
+
+            for v in vs:
+                if text.startswith(v, pos):
+                    end = pos + len(v)
+
+                elif skip is None:
+                    continue
+
+                else:
+                    if after is None:
+                        after = skip(text, pos)
+
+                    if not text.startswith(v, after):
+                        continue
+
+                    end = after + len(v)
+
+                if not whole or at_end(text, end):
+                    return end, [v]
+
+            return None
+
+        return f
+
+    def lower_longest(self, el):
+        fs = [self.lower(x) for x in el.xs]
+        skip = self.skipper()
+
+        def f(text, pos, whole):
+            best = None
+
+            # Backwards, so that the last one of the longest is the first found - nothing beats one reaching the end.
+            for i in reversed(el.candidates(text, pos, skip)):
+                a = fs[i](text, pos, whole)
+
+                if a is not None and (best is None or a[0] > best[0]):
+                    best = a
+
+                    if a[0] == len(text):
+                        break
+
+            return best
+
+        return f
+
+    def lower_optional(self, el):
+        inner = self.lower(el.el)
+
+        def f(text, pos, whole):
+            a = inner(text, pos, whole)
+
+            return (pos, []) if a is None else a
+
+        return f
+
+    def lower_negative(self, el):
+        inner = self.lower(el.el)
+
+        return lambda text, pos, whole: (pos, []) if inner(text, pos, whole) is None else None
+
+    def lower_observer(self, el):
+        inner = self.lower(el.el)
+        success, failure = el.success, el.failure
+
+        def f(text, pos, whole):
+            a = inner(text, pos, False)
+
+            if a is None:
+                return pos, failure
+
+            return a[0], success if a[1] else failure
+
+        return f
+
+    # Sequences
+
+    def lower_counter(self, el):
+        inner = self.lower(el.el)
+        at_end = self.at_end()
+        min_, max_ = el.min, el.max
+
+        def f(text, pos, whole):
+            out = []
+            i = 0
+
+            while max_ is None or i < max_:
+                a = inner(text, pos, False)
+
+                if a is None:
+                    break
+
+                pos = a[0]
+                out += a[1]
+
+                i += 1
+
+            if i < min_ or whole and not at_end(text, pos):
+                return None
+
+            return pos, out
+
+        return f
+
+    def lower_combinator(self, el):
+        fs = []
+        fatal_from = None
+
+        run = []
+
+        for x in el.xs + [None]:
+            t = None if x is None else self.terminal(x)
+
+            if t is not None:
+                run.append((x, t))
+
+                continue
+
+            if len(run) > 0:
+                fused = self.lower_run([y[1] for y in run]) if len(run) > 1 else None
+
+                if fused is None:
+                    fs += [self.lower(y[0]) for y in run]
+
+                else:
+                    fs.append(fused)
+
+                run = []
+
+            if x is cut:
+                fatal_from = len(fs)
+
+            elif x is not None:
+                fs.append(self.lower(x))
+
+        return self.sequence(fs, fatal_from)
+
+    def sequence(self, fs, fatal_from):
+        at_end = self.at_end()
+
+        if fatal_from is None:
+            def f(text, pos, whole):
+                out = []
+
+                for x in fs:
+                    a = x(text, pos, False)
+
+                    if a is None:
+                        return None
+
+                    pos = a[0]
+                    out += a[1]
+
+                if whole and not at_end(text, pos):
+                    return None
+
+                return pos, out
+
+            return f
+
+        def f(text, pos, whole):
+            out = []
+
+            for i, x in enumerate(fs):
+                a = x(text, pos, False)
+
+                if a is None:
+                    if i >= fatal_from:
+                        raise FatalParseError('Syntax error at position {}!'.format(pos))
+
+                    return None
+
+                pos = a[0]
+                out += a[1]
+
+            if whole and not at_end(text, pos):
+                return None
+
+            return pos, out
+
+        return f
+
+    # Recursion
+
+    def lower_ptr(self, el):
+        target = [None]
+        active = {}
+        at_end = self.at_end()
+
+        def f(text, pos, whole):
+            # The same seed growing as `ptr.match`, the seeds being kept per input and position - and per thread, as the
+            # program is shared by the parses running in threads.
+            key = (id(text), pos, get_ident())
+            entry = active.get(key, None)
+
+            if entry is not None:
+                entry[1] = True
+
+                return entry[0]
+
+            inner = target[0]
+            entry = active[key] = [None, False]
+
+            try:
+                a = inner(text, pos, whole)
+
+                if not entry[1]:
+                    return a
+
+                if whole:
+                    a = None
+
+                while True:
+                    if a is not None:
+                        entry[0] = a
+
+                    new = inner(text, pos, False)
+
+                    if new is None or a is not None and new[0] <= a[0]:
+                        break
+
+                    a = new
+
+                if a is None or whole and not at_end(text, a[0]):
+                    return None
+
+                return a
+
+            finally:
+                del active[key]
+
+        self.done[id(el)] = f
+
+        target[0] = self.lower(el.el)
+
+        return f
+
+    # Anything else gets parsed by the element itself.
+
+    def lower_fallback(self, el):
+        ctx = ParseContext(ignore=self.ignore)
+
+        return lambda text, pos, whole: el.match(text, pos, ctx if whole else ctx.partial)
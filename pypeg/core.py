@@ -1,11 +1,13 @@
 import sre_constants
-from re import compile
+from re import compile, escape
 
 from operator import add
 
 from pypeg.utils import *
+from pypeg.analysis import FirstDispatch
 
 from functools import reduce
+from threading import local
 
 __author__ = 'Jan Růžička'
 __email__ = 'jan.ruzicka01@gmail.com'
@@ -14,24 +16,149 @@ __version__ = '1.0'
 
 __all__ = ['ParseError', 'ParserElement', 's', 'r', 'u', 'g', 'G', 'cut', 'wrap', 'group', 'combo', 'union', 'named',
            'apply', 'counter', 'suppress', 'debugged', 'optional', 'negative', 'take_out', 'combinator',
-           'expr', 'delim_lst', 'ptr', 'EMPTY', 'trim_comments']
+           'expr', 'delim_lst', 'ptr', 'memo', 'EMPTY', 'trim_comments', 'iter_trim_comments',
+           'MemoTable', 'Node', 'Handler']
 
 indent_level_force = None
 
+# Elements whose `parse_at` or `parse` override is running, by thread (see `overriding`).
+OVERRIDES = local()
+
 
 # Primitive class
 
 
 class ParserElement:
-    __slots__ = ['value']
+    __slots__ = ['value', 'derived']
+
+    # Whether the element starts like its `el`, for the FIRST sets (see `pypeg.analysis`) - wrappers only changing
+    # the result or keeping track of something.
+    transparent = False
 
     def __init__(self, value):
-        if type(value) is not str:
+        if type(value) not in {str, bytes}:
             raise TypeError('ParserElement\'s primitive value must a string, got {} instead!'.format(type(value)))
 
         self.value = value
 
+    def __getstate__(self):
+        # What the element caches for itself (`CACHES`) stays out of a saved grammar (see `pypeg.cache`) and copies.
+        slots = {x: getattr(self, x) for x in slot_names(type(self)) if x not in CACHES and hasattr(self, x)}
+
+        return getattr(self, '__dict__', None), slots
+
+    def __setstate__(self, state):
+        for x in slot_names(type(self)):
+            if x in CACHES:
+                setattr(self, x, None)
+
+        if state[0] is not None:
+            self.__dict__.update(state[0])
+
+        for x, v in state[1].items():
+            setattr(self, x, v)
+
     def parse(self, string, **kw):
+        el = self
+        table = kw.get('packrat', None)
+
+        if table is not None and table is not False:
+            if table is True:
+                table = kw['packrat'] = MemoTable()
+
+            table.reset()
+
+            el = self.derive(('packrat', table.only), table.prepare)
+
+        try:
+            pos, a = el.parse_at(string, 0, **kw)
+
+        finally:
+            if table is not None and table is not False:
+                table.entries.clear()
+
+        return string[pos:], a
+
+    def parse_all(self, string, **kw):
+        # Matches the whole input and returns the result. Unlike `parse`, which checks for the end of input after every
+        # element on the way up (so an alternative can fail on it and let the next one try), the elements just match
+        # as much as they can and the end is checked once, at the top.
+        return full(self).parse(string, **kw)[1]
+
+    def parse_at(self, text, pos, **kw):
+        if not isinstance(text, TEXT_TYPES):
+            raise ParseError('Can\'t match non-string!')
+
+        self.check_text(text)
+
+        failures = Failures()
+        ctx = ParseContext(text, failures=failures, **kw)
+
+        a = self.match(text, pos, ctx)
+
+        if a is None:
+            if failures.incomplete:  # The alternatives `longest` left out could've been expected, they're tried now.
+                if ctx.packrat is not None:
+                    ctx.packrat.entries.clear()
+
+                failures = Failures(complete=True)
+
+                self.match(text, pos, ParseContext(text, failures=failures, **kw))
+
+            raise failures.error(text, pos)
+
+        return a
+
+    def first(self):
+        # FIRST set of an element the analysis doesn't know otherwise, `None` when it can start with anything.
+        return None
+
+    def text_types(self):
+        # Types of the text the element itself matches (`str` or `bytes`), none for those matching through others.
+        return ()
+
+    def check_text(self, text):
+        # Text of the other type than the grammar's fails at the first string or pattern, raising from deep within
+        # or passing for a syntax error, so it's refused up front. A grammar of both (or neither) isn't checked.
+        known = self.derive('text', lambda x: [-1, None])
+
+        if known[0] != ptr.generation:
+            types = {y for x in self.walk() for y in x.text_types()}
+
+            known[:] = ptr.generation, types.pop() if len(types) == 1 else None
+
+        if known[1] is not None and (type(text) is str) != (known[1] is str):
+            raise TypeError('A grammar of {} can\'t parse {}!'.format(known[1].__name__, type(text).__name__))
+
+    def __init_subclass__(cls, **kw):
+        super().__init_subclass__(**kw)
+
+        # A subclass of an element overriding `parse_at` or `parse` (to convert the result, say) is matched through
+        # them as well, not just by the `match` it inherits.
+        if 'match' not in cls.__dict__ and ('parse_at' in cls.__dict__ or 'parse' in cls.__dict__) \
+                and cls.match is not ParserElement.match:
+            cls.match = overriding(cls.match)
+
+    def match(self, text, pos, ctx):
+        # Returns `(pos, result)`, or `None` when the element doesn't match - failures are too frequent to raise.
+        # Elements written against the raising API only override `parse_at` or `parse`, so fall back to them.
+        try:
+            if type(self).parse_at is not ParserElement.parse_at:
+                return self.parse_at(text, pos, **ctx.kw())
+
+            if type(self).parse is not ParserElement.parse:
+                kw = ctx.kw()
+                kw.pop('packrat', None)  # The top-level parse would start the memo table over.
+
+                rest, a = self.parse(text[pos:], **kw)
+
+                return len(text) - len(rest), a
+
+        except ParseError:
+            ctx.fail(pos, self)
+
+            return None
+
         raise NotImplementedError()
 
     def test(self, string, **kw):
@@ -49,6 +176,129 @@ class ParserElement:
     def spr(self):
         return suppress(self)
 
+    def memo(self):
+        return memo(self)
+
+    def compile(self):
+        from pypeg.compiler import compiled
+
+        return compiled(self)
+
+    def parse_tree(self, string, **kw):
+        # Compact result - a tree of `Node`s, one for each named element matched, which keep offsets into the input
+        # instead of copies of the tokens. The grammar drops the tokens and skips reshaping the results on the way.
+        return self.derive('tree', tree).parse(string, **kw)[1][0]
+
+    def parse_events(self, string, handler, **kw):
+        # Reports the named elements and tokens matched to `handler` (see `Handler`) instead of building any result.
+        # Every element has to run for its events, so memoization is off. Those of an element which can still be
+        # backtracked over (an alternative with more to try after it, an item of a repetition, an optional part) wait
+        # until it matches, cuts don't change that. An optional part as long as the input - say a `delim_lst` without
+        # `req_one` around all of it - holds back all of its events until the end.
+        kw.pop('packrat', None)
+
+        self.derive('events', lambda x: x.transform(sax)).parse(string, events=EventLog(handler), **kw)
+
+        return handler
+
+    def derive(self, key, fn):
+        # The grammar `fn(self)` made for parsing with the options `key`, kept for the next parse with them. Changing
+        # the grammar (pointing a `ptr` elsewhere) after it was parsed doesn't reach the grammars made so far.
+        derived = getattr(self, 'derived', None)
+
+        if derived is None:
+            derived = self.derived = {}
+
+        el = derived.get(key, None)
+
+        if el is None:
+            el = derived[key] = fn(self)
+
+        return el
+
+    def profile(self, string, **kw):
+        # Parses the string counting calls and time per element, see `pypeg.profiler`.
+        from pypeg.profiler import Profile
+
+        profile = Profile(self)
+        profile.parse(string, **kw)
+
+        return profile
+
+    def iterparse(self, source, **kw):
+        from pypeg.stream import iterparse
+
+        return iterparse(self, source, **kw)
+
+    def children(self):
+        for name in slot_names(type(self)):
+            x = getattr(self, name, None)
+
+            if isinstance(x, ParserElement):
+                yield x
+
+            elif type(x) is list and len(x) > 0 and all([isinstance(y, ParserElement) for y in x]):
+                yield from x
+
+    def walk(self):
+        seen = set()
+        stack = [self]
+
+        while len(stack) > 0:
+            x = stack.pop()
+
+            if id(x) in seen:
+                continue
+
+            seen.add(id(x))
+
+            yield x
+
+            stack += reversed(list(x.children()))
+
+    def transform(self, fn):
+        # Rebuilds the grammar bottom-up, replacing every element by `fn(copy, original)`. Pointers are copied before
+        # their target so that cycles stay intact, hence `fn` has to return them unchanged (it may modify their target).
+        done = {}
+
+        def visit(x):
+            if id(x) in done:
+                return done[id(x)]
+
+            if x is EMPTY or x is cut:
+                return x
+
+            new = object.__new__(type(x))
+
+            if type(x) is ptr:
+                done[id(x)] = new
+
+            if getattr(x, '__dict__', None) is not None:  # Attributes of a subclass of an element.
+                new.__dict__.update(x.__dict__)
+
+            for name in slot_names(type(x)):
+                if not hasattr(x, name):
+                    continue
+
+                v = getattr(x, name)
+
+                if isinstance(v, ParserElement):
+                    v = visit(v)
+
+                elif type(v) is list and len(v) > 0 and all([isinstance(y, ParserElement) for y in v]):
+                    v = [visit(y) for y in v]
+
+                elif name in {'dispatch', 'derived'}:  # Made for the original, the copy may be different.
+                    v = None
+
+                setattr(new, name, v)
+
+            done[id(x)] = fn(new, x)
+
+            return done[id(x)]
+
+        return visit(self)
+
     def rev(self):
         if hasattr(self, 'el'):
             return self.el
@@ -112,8 +362,10 @@ class ParserElement:
             return named(self, other)
 
         elif isinstance(other, ParserElement):
+            # What the elements cache for themselves (`CACHES`) differs between a grammar used and one not used yet.
             return type(self) is type(other) and self.__slots__ == other.__slots__\
-                   and all([getattr(self, x) == getattr(other, y) for x, y in zip(self.__slots__, other.__slots__)])
+                   and all([getattr(self, x) == getattr(other, y) for x, y in zip(self.__slots__, other.__slots__)
+                            if x not in CACHES])
 
         else:
             raise NotImplementedError()
@@ -141,6 +393,28 @@ class ParserElement:
         return counter(self, start, item.stop)
 
 
+def overriding(inherited):
+    # `match` of a subclass overriding `parse_at` or `parse` of an element: the override gets called, and when it calls
+    # the element's own (through `super()`, which comes back to `match`), that's matched by the `inherited` one.
+    def match(self, text, pos, ctx):
+        waiting = OVERRIDES.__dict__.setdefault('waiting', set())
+
+        if id(self) in waiting:
+            waiting.discard(id(self))
+
+            return inherited(self, text, pos, ctx)
+
+        waiting.add(id(self))
+
+        try:
+            return ParserElement.match(self, text, pos, ctx)
+
+        finally:
+            waiting.discard(id(self))
+
+    return match
+
+
 # Specialized elements
 
 
@@ -149,6 +423,7 @@ class wrap:
 
     class wrapper(ParserElement):
         __slots__ = ['el', 'left', 'c']
+        transparent = True
 
         def __init__(self, el, t, c=2):
             super(wrap.wrapper, self).__init__(el.value)
@@ -160,21 +435,13 @@ class wrap:
         def __str__(self):
             return "wrap('{}', {}) + ({})".format('left' if self.left else 'right', self.c, self.el)
 
-        def parse(self, string, **kw):
-            string, a = self.el.parse(string, **kw)
-
-            check_whole(string, **kw)
-
-            if not self.left:
-                a = recursive_reverse(a)
+        def match(self, text, pos, ctx):
+            a = self.el.match(text, pos, ctx)
 
-            while len(a) > 1:
-                a = [a[:self.c]] + a[self.c:]
+            if a is None or not ctx.is_whole(text, a[0]):
+                return None
 
-            if not self.left:
-                a = recursive_reverse(a)
-
-            return string, a
+            return a[0], fold(a[1], self.c, self.left)
 
     def __init__(self, t, c=2):
         self.c = c
@@ -195,24 +462,31 @@ class s(ParserElement):
     def __str__(self):
         return 's{}'.format(repr(self.value))
 
-    def parse(self, string, **kw):
-        try:
-            a = self.parse_token(string)
+    def text_types(self):
+        return type(self.value),
 
-        except ParseError:
-            string = replace_ignored(string, **kw)
+    def match(self, text, pos, ctx):
+        if not starts_with(text, self.value, pos):
+            q = ctx.skip(text, pos)
+
+            # Nothing to skip means nothing new to try.
+            if q == pos or not starts_with(text, self.value, q):
+                ctx.fail(q, self)
 
-            a = self.parse_token(string)
+                return None
 
-        string = string[len(self.value):]
+            pos = q
 
-        check_whole(string, **kw)
+        pos += len(self.value)
 
-        return string, [a]
+        if not ctx.is_whole(text, pos):
+            return None
 
-    def parse_token(self, string):
-        if not string.startswith(self.value):
-            raise ParseError('Can\'t match a single token from: "{}"'.format(string))
+        return pos, [self.value]
+
+    def parse_token(self, string, pos=0):
+        if not starts_with(string, self.value, pos):
+            raise ParseError('Can\'t match a single token from: "{}"'.format(string[pos:]))
 
         return self.value
 
@@ -229,29 +503,52 @@ class r(ParserElement):
         except sre_constants.error:
             raise ValueError('Passed invalid pattern: {}'.format(pattern))
 
+    def __getstate__(self):
+        state = super(r, self).__getstate__()
+        state[1]['pattern'] = self.pattern.pattern, self.pattern.flags
+
+        return state
+
+    def __setstate__(self, state):
+        # A loaded grammar compiles its regexes as they get used, not all of them at startup.
+        super(r, self).__setstate__(state)
+
+        self.pattern = LazyPattern(self, *state[1]['pattern'])
+
     def __str__(self):
+        if type(self.pattern.pattern) is bytes:
+            return 'rb\'{}\''.format(self.pattern.pattern.decode('latin-1'))
+
         return 'r\'{}\''.format(self.pattern.pattern)
 
-    def parse(self, string, **kw):
-        a = self.pattern.match(string)
+    def text_types(self):
+        return type(self.value),
+
+    def match(self, text, pos, ctx):
+        a = self.pattern.match(text, pos)
 
         if a is None:
-            string = replace_ignored(string, **kw)
+            q = ctx.skip(text, pos)
 
-            a = self.pattern.match(string)
+            if q != pos:
+                a = self.pattern.match(text, q)
 
             if a is None:
-                raise ParseError('"{}" doesn\'t match the pattern "{}"!'.format(string, self.pattern.pattern))
+                ctx.fail(q, self)
+
+                return None
 
-        string = string[len(a.group()):]
+        pos = a.end()
 
-        check_whole(string, **kw)
+        if not ctx.is_whole(text, pos):
+            return None
 
-        return string, [a.group()]
+        return pos, [a.group()]
 
 
 class u(ParserElement):
     __slots__ = ['el']
+    transparent = True
 
     def __init__(self, el):
         super(u, self).__init__(el.value)
@@ -261,17 +558,18 @@ class u(ParserElement):
     def __str__(self):
         return 'u({})'.format(self.el)
 
-    def parse(self, string, **kw):
-        string, a = self.el.parse(string, **kw)
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx)
 
-        if type(a) is list and len(a) == 1:
-            a = a[0]
+        if a is not None and type(a[1]) is list and len(a[1]) == 1:
+            return a[0], a[1][0]
 
-        return string, a
+        return a
 
 
 class g(ParserElement):
     __slots__ = ['el']
+    transparent = True
 
     def __init__(self, el):
         super(g, self).__init__(el.value)
@@ -281,17 +579,18 @@ class g(ParserElement):
     def __str__(self):
         return 'g({})'.format(self.el)
 
-    def parse(self, string, **kw):
-        string, a = self.el.parse(string, **kw)
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx)
 
-        if type(a) is list and len(a) > 1:
-            a = [a]
+        if a is not None and type(a[1]) is list and len(a[1]) > 1:
+            return a[0], [a[1]]
 
-        return string, a
+        return a
 
 
 class G(ParserElement):
     __slots__ = ['el']
+    transparent = True
 
     def __init__(self, el):
         super(G, self).__init__(el.value)
@@ -301,17 +600,18 @@ class G(ParserElement):
     def __str__(self):
         return 'G({})'.format(self.el)
 
-    def parse(self, string, **kw):
-        string, a = self.el.parse(string, **kw)
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx)
 
-        if len(a) == 0 or type(a[0]) not in {list, tuple}:
-            a = [a]
+        if a is not None and (len(a[1]) == 0 or type(a[1][0]) not in {list, tuple}):
+            return a[0], [a[1]]
 
-        return string, a
+        return a
 
 
 class group(ParserElement):
     __slots__ = ['el']
+    transparent = True
 
     def __init__(self, el):
         super(group, self).__init__(el.value)
@@ -321,14 +621,15 @@ class group(ParserElement):
     def __str__(self):
         return '[{}]'.format(self.el)
 
-    def parse(self, string, **kw):
-        string, a = self.el.parse(string, **kw)
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx)
 
-        return string, [a]
+        return None if a is None else (a[0], [a[1]])
 
 
 class combo(ParserElement):
     __slots__ = ['el']
+    transparent = True
 
     def __init__(self, el):
         super(combo, self).__init__(el.value)
@@ -338,28 +639,36 @@ class combo(ParserElement):
     def __str__(self):
         return '+({})'.format(self.el)
 
-    def parse(self, string, **kw):
-        string, a = self.el.parse(string, **kw)
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx)
+
+        if a is None:
+            return None
+
+        pos, a = a
 
         out = []
 
         for x in a:
-            if len(out) > 0 and type(out[-1]) in {str, list}:
-                out[-1] += x
+            if len(out) > 0 and type(out[-1]) in {str, bytes, list}:
+                out[-1] = out[-1] + x  # Results can be shared through the memo table, don't modify them in place.
 
             else:
                 out.append(x)
 
-        return string, out
+        return pos, out
 
 
 class union(ParserElement):
-    __slots__ = ['xs']
+    __slots__ = ['xs', 'dispatch', 'literals', 'heads']
 
     def __init__(self, *xs):
         super(union, self).__init__('')
 
         self.xs = []
+        self.dispatch = None
+        self.literals = None
+        self.heads = None
 
         for x in xs:
             if type(x) is union:
@@ -387,19 +696,110 @@ class union(ParserElement):
 
         return new
 
-    def parse(self, string, **kw):
-        for x in self.xs:
-            try:
-                return x.parse(string, **kw)
+    def candidates(self, text, pos, skip):
+        # Alternatives which can start at `pos` according to their FIRST sets, all of them if that's unknown.
+        dispatch = self.dispatch
+
+        if dispatch is None or dispatch.stale:
+            dispatch = self.dispatch = FirstDispatch(self.xs)
+
+        if not dispatch.useful:
+            return range(len(self.xs))
+
+        d = None
+
+        if skip is not None:
+            q = skip(text, pos)
+
+            if q != pos:
+                d = text[q:q + 1]
+
+        c = text[pos:pos + 1]
+
+        if type(text) is bytearray:  # The slices have to be hashable.
+            c, d = bytes(c), None if d is None else bytes(d)
+
+        return dispatch.candidates(c, d)
+
+    def match(self, text, pos, ctx):
+        skip = None if ctx.ignore is None else ctx.skip
+
+        literals = self.literals
+
+        if literals is None or literals.xs is not self.xs:  # A copy made by `transform` has alternatives of its own.
+            literals = self.literals = LiteralSet(self.xs)
+
+        if literals.index is not None:
+            return self.match_literal(literals, text, pos, ctx)
+
+        xs = self.candidates(text, pos, skip)
+
+        turns = None if len(xs) == len(self.xs) or ctx.failures is None else Turns(ctx.failures)
+
+        for i in xs:
+            if turns is not None:
+                turns.begin(i)
+
+            a = self.xs[i].match(text, pos, ctx)
+
+            if a is not None:
+                return a
+
+        if turns is not None:
+            self.ruled_out(text, pos, ctx, xs, turns)
+
+        return None
+
+    def ruled_out(self, text, pos, ctx, xs, turns):
+        # The alternatives ruled out by the FIRST sets are expected at the farthest failure as well, in their turn as if
+        # they were tried (after the ones in `xs`, see `Turns`).
+        if ctx.skip(text, pos) < ctx.failures.pos:
+            return
 
-            except ParseError:
-                pass
+        for i in range(len(self.xs)):
+            if i not in xs:
+                turns.begin(i)
 
-        raise ParseError('All cases failed!')
+                self.rule_out(text, pos, ctx, i)
+
+        turns.restore()
+
+    def rule_out(self, text, pos, ctx, i):
+        # An alternative ruled out is expected by the terminal it starts with (as in `longest`), or by what it fails on,
+        # it's matched just for that.
+        heads = self.heads
+
+        if heads is None or heads.xs is not self.xs:
+            heads = self.heads = Heads(self.xs)
+
+        if heads.terminals[i] is not None:
+            ctx.fail(ctx.skip(text, pos), heads.terminals[i])
+
+        else:
+            self.xs[i].match(text, pos, ctx)
+
+    def match_literal(self, literals, text, pos, ctx):
+        # Same as trying the literals in order, including the failures recorded. Those don't matter short of the
+        # farthest failure, then only the literals found need to be tried.
+        ends, q = literals.ends(text, pos, ctx.skip)
+
+        record = ctx.failures is not None and q >= ctx.failures.pos
+
+        for i in range(len(self.xs)) if record else sorted(ends):
+            end = ends.get(i, None)
+
+            if end is None:
+                ctx.fail(q, self.xs[i])
+
+            elif ctx.is_whole(text, end):
+                return end, [self.xs[i].value]
+
+        return None
 
 
 class named(ParserElement):
     __slots__ = ['el', 'name']
+    transparent = True
 
     def __init__(self, el, name):
         super(named, self).__init__(el.value)
@@ -410,16 +810,18 @@ class named(ParserElement):
     def __str__(self):
         return ':{}'.format(self.name)
 
-    def parse(self, string, **kw):
-        string, a = self.el.parse(string, **kw)
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx)
 
-        check_whole(string, **kw)
+        if a is None or not ctx.is_whole(text, a[0]):
+            return None
 
-        return string, [(self.name, a)]
+        return a[0], [(self.name, a[1])]
 
 
 class apply(ParserElement):
     __slots__ = ['el', 'fn']
+    transparent = True
 
     def __init__(self, el, fn):
         super(apply, self).__init__(el.value)
@@ -430,12 +832,13 @@ class apply(ParserElement):
     def __str__(self):
         return '{} // {}'.format(self.el, self.fn)
 
-    def parse(self, string, **kw):
-        string, a = self.el.parse(string, **kw)
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx)
 
-        check_whole(string, **kw)
+        if a is None or not ctx.is_whole(text, a[0]):
+            return None
 
-        return string, list(map(self.fn, a))
+        return a[0], list(map(self.fn, a[1]))
 
 
 class counter(ParserElement):
@@ -451,40 +854,38 @@ class counter(ParserElement):
     def __str__(self):
         return '({})[{}:{}]'.format(self.el, self.min, self.max)
 
-    def parse(self, string, **kw):
+    def match(self, text, pos, ctx):
         out = []
 
-        k = kw.copy()
-        k['not_whole'] = True
-
         i = 0
 
         while self.max is None or i < self.max:
-            try:
-                string, a = self.el.parse(string, **k)
+            a = self.el.match(text, pos, ctx.partial)
 
-                out += a
-
-            except ParseError:
+            if a is None:
                 break
 
-            i += 1
+            pos = a[0]
+            out += a[1]
 
-        if i < self.min:
-            raise ParseError('Minimal count "{}" not reached: "{}"!'.format(self.min, string))
+            i += 1
 
-        check_whole(string, **kw)
+        if i < self.min or not ctx.is_whole(text, pos):
+            return None
 
-        return string, out
+        return pos, out
 
 
 class longest(ParserElement):
-    __slots__ = ['xs']
+    __slots__ = ['xs', 'literals', 'dispatch', 'heads']
 
     def __init__(self, *xs):
         super(longest, self).__init__('')
 
         self.xs = []
+        self.literals = None
+        self.dispatch = None
+        self.heads = None
 
         for x in xs:
             if type(x) is longest:
@@ -512,28 +913,106 @@ class longest(ParserElement):
 
         return new
 
-    def parse(self, string, **kw):
-        solutions = {}
+    def match(self, text, pos, ctx):
+        literals = self.literals
 
-        for x in self.xs:
-            try:
-                new_string, a = x.parse(string, **kw)
+        if literals is None or literals.xs is not self.xs:  # A copy made by `transform` has alternatives of its own.
+            literals = self.literals = LiteralSet(self.xs)
+
+        if literals.index is not None:
+            return self.match_literal(literals, text, pos, ctx)
+
+        heads = self.heads
+
+        if heads is None or heads.xs is not self.xs:
+            heads = self.heads = Heads(self.xs)
+
+        # What the alternatives starting with the same element got from it, so that it's matched only once. By the
+        # context it got, the alternative itself gets the whole-input check, a sequence doesn't.
+        shared = {} if heads.any else None
+
+        xs = self.candidates(text, pos, None if ctx.ignore is None else ctx.skip)
 
-                solutions[new_string] = a
+        # The alternatives the FIRST sets rule out fail short of the farthest failure, they need to be tried only to
+        # record it (as in `match_literal`) - unless they start with a terminal, which is the failure recorded.
+        q = ctx.skip(text, pos)
 
-            except ParseError:
-                pass
+        record = ctx.failures is not None and q >= ctx.failures.pos and len(xs) < len(self.xs)
 
-        if len(solutions) == 0:
-            raise ParseError('All cases failed!')
+        # Unless the failures have to be complete (and in order), the alternatives are gone through backwards, so that
+        # the last one of the longest is the first found - nothing beats one reaching the end, those before it are left
+        # out. The failures from here on can be missing some then (see `ParserElement.parse_at`).
+        complete = ctx.failures is not None and ctx.failures.complete
 
-        ret = min(solutions.keys(), key=len)
+        if ctx.failures is not None and not complete:
+            ctx.failures.leave_out(pos)
 
-        return ret, solutions[ret]
+        order = range(len(self.xs)) if record else xs
+
+        best = None
+
+        for i in order if complete else reversed(order):
+            x = self.xs[i]
+
+            if record and i not in xs and heads.terminals[i] is not None:
+                ctx.fail(q, heads.terminals[i])
+
+                continue
+
+            head = None if shared is None else heads.shared[i]
+
+            if head is None:
+                a = x.match(text, pos, ctx)
+
+            else:
+                c = ctx if head is x else ctx.partial
+                key = id(head), id(c)
+
+                if key in shared:
+                    a = shared[key]
+
+                else:
+                    a = shared[key] = head.match(text, pos, c)
+
+                if a is not None and head is not x:
+                    a = x.match_from(text, 1, a[0], list(a[1]), ctx)
+
+            if a is not None and (best is None or a[0] > best[0] or complete and a[0] == best[0]):
+                best = a  # The last one wins a tie.
+
+                if a[0] == len(text) and not complete:
+                    break
+
+        return best
+
+    candidates = union.candidates
+
+    def match_literal(self, literals, text, pos, ctx):
+        # As with `union`, the literals not found only need to be tried for the failures recorded.
+        ends, q = literals.ends(text, pos, ctx.skip)
+
+        record = ctx.failures is not None and q >= ctx.failures.pos
+
+        best = None
+
+        for i in range(len(self.xs)) if record else sorted(ends):
+            end = ends.get(i, None)
+
+            if end is None:
+                ctx.fail(q, self.xs[i])
+
+            elif ctx.is_whole(text, end) and (best is None or end >= best[0]):  # The last one wins a tie.
+                best = end, i
+
+        if best is None:
+            return None
+
+        return best[0], [self.xs[best[1]].value]
 
 
 class suppress(ParserElement):
     __slots__ = ['el']
+    transparent = True
 
     def __init__(self, el):
         super(suppress, self).__init__(el.value)
@@ -543,15 +1022,13 @@ class suppress(ParserElement):
     def __str__(self):
         return '{}.spr()'.format(self.el)
 
-    def parse(self, string, **kw):
-        if type(string) is not str:
-            raise ParseError('Can\'t match non-string!')
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx)
 
-        string, _ = self.el.parse(string, **kw)
+        if a is None or not ctx.is_whole(text, a[0]):
+            return None
 
-        check_whole(string, **kw)
-
-        return string, []
+        return a[0], []
 
 
 class debugged(ParserElement):
@@ -565,17 +1042,15 @@ class debugged(ParserElement):
         self.a_fn = a_fn if a_fn else lambda e, string, **kw: print('A', e, repr(string))
         self.b_fn = b_fn if b_fn else lambda e, string, **kw: print('B', e, repr(string))
 
-    def parse(self, string, **kw):
-        if type(string) is not str:
-            raise ParseError('Can\'t match non-string!')
-
-        self.a_fn(self.el, string, **kw)
+    def match(self, text, pos, ctx):
+        self.a_fn(self.el, text[pos:], **ctx.kw())
 
-        string, a = self.el.parse(string, **kw)
+        a = self.el.match(text, pos, ctx)
 
-        self.b_fn(self.el, string, **kw)
+        if a is not None:
+            self.b_fn(self.el, text[a[0]:], **ctx.kw())
 
-        return string, a
+        return a
 
 
 class optional(ParserElement):
@@ -592,15 +1067,10 @@ class optional(ParserElement):
     def opt(self):
         return self
 
-    def parse(self, string, **kw):
-        if type(string) is not str:
-            raise ParseError('Can\'t match non-string!')
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx)
 
-        try:
-            return self.el.parse(string, **kw)
-
-        except ParseError:
-            return string, []
+        return (pos, []) if a is None else a
 
 
 class negative(ParserElement):
@@ -617,24 +1087,26 @@ class negative(ParserElement):
     def opt(self):
         return EMPTY
 
-    def parse(self, string, **kw):
-        if type(string) is not str:
-            raise ParseError('Can\'t match non-string!')
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx)
 
-        try:
-            self.el.parse(string, **kw)
+        if a is None:
+            return pos, []
 
-        except ParseError:
-            return string, []
+        ctx.fail(pos, self)
 
-        raise ParseError('Syntax error at: "{}"\nExpecting anything but: "{}"'.format(string, self.el))
+        if ctx.failures is not None:
+            ctx.failures.looked(a[0])
+
+        return None
 
 
 class take_out(ParserElement):
     __slots__ = ['el', 'name']
+    transparent = True
 
     def __new__(cls, *args):
-        if type(args[0]) is named:
+        if len(args) > 0 and type(args[0]) is named:  # Unpickling passes no arguments.
             return args[0].el
 
         return super(take_out, cls).__new__(cls)
@@ -649,11 +1121,13 @@ class take_out(ParserElement):
         return str(self.el.el) if type(self.el) is named and self.el.name == self.name\
                                else '({} >> {})'.format(self.el, self.name)
 
-    def parse(self, string, **kw):
-        if type(string) is not str:
-            raise ParseError('Can\'t match non-string!')
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx)
 
-        string, a = self.el.parse(string, **kw)
+        if a is None or not ctx.is_whole(text, a[0]):
+            return None
+
+        pos, a = a
 
         a = [x[1] for x in a if type(x) is tuple and x[0] == self.name]
 
@@ -665,9 +1139,7 @@ class take_out(ParserElement):
             else:
                 out.append(x)
 
-        check_whole(string, **kw)
-
-        return string, out
+        return pos, out
 
 
 class observer(ParserElement):
@@ -689,17 +1161,13 @@ class observer(ParserElement):
     def __str__(self):
         return 'observer({}, {}, {})'.format(self.el, self.success, self.failure)
 
-    def parse(self, string, **kw):
-        try:
-            kw = kw.copy()
-            kw['not_whole'] = True
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx.partial)
 
-            string, a = self.el.parse(string, **kw)
-
-            return string, self.success if a else self.failure
+        if a is None:
+            return pos, self.failure
 
-        except ParseError:
-            return string, self.failure
+        return a[0], self.success if a[1] else self.failure
 
 
 class combinator(ParserElement):
@@ -736,42 +1204,337 @@ class combinator(ParserElement):
 
         return new
 
-    def parse(self, string, **kw):
-        if type(string) is not str:
-            raise ParseError('Can\'t match non-string!')
-
-        k = kw.copy()
-        k['not_whole'] = True
-
-        out = []
+    def match(self, text, pos, ctx):
+        return self.match_from(text, 0, pos, [], ctx)
 
+    def match_from(self, text, i, pos, out, ctx):
+        # The sequence from its `i`-th element on, the ones before it matched up to `pos` with the results `out` (the
+        # first one shared by alternatives of `longest`, say).
         fatal = False
 
-        for x in self.xs:
+        for x in self.xs[i:] if i else self.xs:
             if x is cut:
                 fatal = True
 
             else:
-                try:
-                    string, a = x.parse(string, **k)
-
-                    out += a
+                a = x.match(text, pos, ctx.partial)
 
-                except ParseError as e:
+                if a is None:
                     if fatal:
-                        raise FatalParseError(str(e))
+                        raise FatalParseError('Can\'t match {} at position {}!'.format(x, pos))
 
-                    raise
+                    return None
 
-        check_whole(string, **kw)
+                pos = a[0]
+                out += a[1]
 
-        return string, out
+        if not ctx.is_whole(text, pos):
+            return None
+
+        return pos, out
+
+
+class memo(ParserElement):
+    __slots__ = ['el']
+    transparent = True
+
+    def __init__(self, el):
+        super(memo, self).__init__(el.value)
+
+        self.el = el
+
+    def __str__(self):
+        return '{}.memo()'.format(self.el)
+
+    def memo(self):
+        return self
+
+    def match(self, text, pos, ctx):
+        table = ctx.packrat
+
+        if table is None:
+            return self.el.match(text, pos, ctx)
+
+        key = (id(self), pos, ctx.not_whole)
+
+        a = table.lookup(key)
+
+        if a is None:
+            hits = ctx.recursion.hits
+
+            a = self.el.match(text, pos, ctx)
+
+            # Results built from a left recursion seed are only temporary.
+            if ctx.recursion.hits == hits:
+                table.store(key, False if a is None else a)
+
+        return a or None
+
+
+class full(ParserElement):
+    # The element has to match the whole input, which is only checked once it's done (see `ParserElement.parse_all`).
+    __slots__ = ['el']
+
+    def __init__(self, el):
+        super(full, self).__init__(el.value)
+
+        self.el = el
+
+    def __str__(self):
+        return 'full({})'.format(self.el)
+
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx.partial)
+
+        if a is None:
+            return None
+
+        pos = ctx.skip(text, a[0])
+
+        if pos < len(text):
+            ctx.fail(pos, None)
+
+            return None
+
+        return a
+
+
+class node(ParserElement):
+    # Builds a `Node` of a compact parse tree for the element it stands in for (see `ParserElement.parse_tree`), or just
+    # keeps the whole-input check of a dropped one when that's `None`. The root of the tree adds no check of its own.
+    __slots__ = ['el', 'origin', 'check']
+    transparent = True
+
+    def __init__(self, el, origin, check=True):
+        super(node, self).__init__(el.value)
+
+        self.el = el
+        self.origin = origin
+        self.check = check
+
+    def __str__(self):
+        return 'node({})'.format(self.el)
+
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx)
+
+        if a is None or self.check and not ctx.is_whole(text, a[0]):
+            return None
+
+        if self.origin is None:
+            return a
+
+        return a[0], [Node(self.origin, ctx, pos, ctx.skip(text, pos), a[0], a[1])]
+
+
+def tree(el):
+    # Grammar for `ParserElement.parse_tree`, whose result is the root `Node` - that of the element when it's named.
+    x = el.transform(compact)
+
+    if type(x) is node and x.origin is not None:
+        return x
+
+    return node(x, el, check=False)
+
+
+def compact(x, original):
+    # Elements of the grammar for `ParserElement.parse_tree`, whose results are just the `Node`s.
+    from pypeg.compiler import compiled
+
+    t = type(x)
+
+    if t in {s, r}:
+        return suppress(x)
+
+    elif t is named:
+        return node(x.el, original)
+
+    elif t in {apply, take_out, wrap.wrapper}:
+        return node(x.el, None)
+
+    elif t in {u, g, G, group, combo, compiled}:
+        return x.el
+
+    elif t is observer:
+        x.success, x.failure = [], []
+
+    elif t is expr:
+        x.engine = False
+
+    return x
+
+
+class token(ParserElement):
+    __slots__ = ['el']
+    transparent = True
+
+    def __init__(self, el):
+        super(token, self).__init__(el.value)
+
+        self.el = el
+
+    def __str__(self):
+        return 'token({})'.format(self.el)
+
+    def match(self, text, pos, ctx):
+        a = self.el.match(text, pos, ctx)
+
+        if a is None:
+            return None
+
+        ctx.events.emit(ctx.events.handler.token, ctx.skip(text, pos), a[0])
+
+        return a[0], []
+
+
+class event(ParserElement):
+    __slots__ = ['el', 'name']
+    transparent = True
+
+    def __init__(self, el, name):
+        super(event, self).__init__(el.value)
+
+        self.el = el
+        self.name = name
+
+    def __str__(self):
+        return 'event({}, {})'.format(self.el, self.name)
+
+    def match(self, text, pos, ctx):
+        events = ctx.events
+
+        events.emit(events.handler.enter, self.name, pos)
+
+        a = self.el.match(text, pos, ctx)
+
+        if a is None or not ctx.is_whole(text, a[0]):
+            return None
+
+        events.emit(events.handler.exit, self.name, ctx.skip(text, pos), a[0])
+
+        return a
+
+
+class checkpoint(ParserElement):
+    # Holds back the events of an element whose failure gets recovered from, to drop them if it fails - or always,
+    # when it's only looked at.
+    __slots__ = ['el', 'keep']
+    transparent = True
+
+    def __init__(self, el, keep=True):
+        super(checkpoint, self).__init__(el.value)
+
+        self.el = el
+        self.keep = keep
+
+    def __str__(self):
+        return 'checkpoint({})'.format(self.el)
+
+    def match(self, text, pos, ctx):
+        events = ctx.events
+
+        events.mark()
+
+        a = self.el.match(text, pos, ctx)
+
+        if a is None or not self.keep:
+            events.rollback()
+
+        else:
+            events.commit()
+
+        return a
+
+
+class choice(union):
+    # `union` for events - its alternatives are `checkpoint`s, but the last one tried goes without, as there's nothing
+    # left to backtrack to. A choice the FIRST sets narrow down to one alternative (the value of a JSON document, say)
+    # doesn't hold back the events of all of the text it matches.
+    __slots__ = []
+
+    def match(self, text, pos, ctx):
+        xs = self.candidates(text, pos, None if ctx.ignore is None else ctx.skip)
+
+        turns = None if len(xs) == len(self.xs) or ctx.failures is None else Turns(ctx.failures)
+
+        for i in xs:
+            x = self.xs[i]
+
+            if turns is not None:
+                turns.begin(i)
+
+            a = (x if i != xs[-1] else x.el).match(text, pos, ctx)
+
+            if a is not None:
+                return a
+
+        if turns is not None:
+            self.ruled_out(text, pos, ctx, xs, turns)
+
+        return None
+
+
+class replay(ParserElement):
+    # `longest` for events - the alternatives are tried without them, then the chosen one is matched again.
+    __slots__ = ['xs']
+
+    def __init__(self, *xs):
+        super(replay, self).__init__('')
+
+        self.xs = list(xs)
+
+    def __str__(self):
+        return ' ^ '.join([str(x) for x in self.xs])
+
+    def match(self, text, pos, ctx):
+        best = None
+
+        for x in self.xs:
+            a = x.match(text, pos, ctx)
+
+            if a is not None and (best is None or a[0] >= best[0]):  # The last one wins a tie, like in `longest`.
+                best = a[0], x.el
+
+        if best is None:
+            return None
+
+        return best[1].match(text, pos, ctx)
+
+
+def sax(x, original):
+    # Elements of the grammar for `ParserElement.parse_events`.
+    t = type(x)
+
+    if t in {s, r}:
+        return token(x)
+
+    elif t is named:
+        return event(x.el, x.name)
+
+    elif t is union:
+        return choice(*[checkpoint(y) for y in x.xs])
+
+    elif t in {optional, counter, observer}:
+        x.el = checkpoint(x.el)
+
+    elif t is negative:
+        x.el = checkpoint(x.el, keep=False)
+
+    elif t is longest:
+        return replay(*[checkpoint(y, keep=False) for y in x.xs])
+
+    elif t is memo:
+        return x.el
+
+    return compact(x, original)
 
 
 # Helpers
 
 class expr(ParserElement):
-    __slots__ = ['expr', 'ops', 'operand']
+    # Parsed by precedence climbing (see `climb`). The grammar built out of the other elements describes the same and
+    # stays for the analyses, the compiler and the transformations, which need the elements (`engine` is off then).
+    __slots__ = ['expr', 'ops', 'operand', 'factor', 'binary', 'left', 'engine', 'dispatch']
 
     def __init__(self, operand, operators, lp='(', rp=')'):
         for o in operators:
@@ -784,15 +1547,6 @@ class expr(ParserElement):
         lp = suppress(to_valid_element(lp)) if lp is not None else None
         rp = suppress(to_valid_element(rp)) if lp is not None else None  # `lp` is intended!
 
-        exp = ptr()
-
-        factor = operand
-
-        if lp is not None:
-            factor ^= lp + exp + rp
-
-        factor = g(factor)
-
         u_ops, b_ops = [], []
 
         for o in operators:
@@ -802,13 +1556,9 @@ class expr(ParserElement):
             else:
                 u_ops.append(o[::2])
 
-        for o in u_ops:
-            a = o[1]
-            o = o[0][0:]
-
-            factor = g(wrap('right') + (o + factor) if a == 0 else wrap('left') + (factor + o))
+        exp = ptr()
 
-        tmp_exp = factor
+        tmp_exp = expr.make_factor(operand, u_ops, lp, rp, exp)
 
         for o in b_ops:
             tmp_exp = EMPTY + g(wrap('left' if o[1] == 0 else 'right', 3) + (tmp_exp + (o[0] + tmp_exp)[0:]))
@@ -819,24 +1569,115 @@ class expr(ParserElement):
         self.ops = operators
         self.operand = operand
 
+        # The parenthesized expressions get climbed as well.
+        inner = ptr()
+        inner &= self
+
+        self.factor = expr.make_factor(operand, u_ops, lp, rp, inner)
+        self.binary = [o[0] for o in b_ops]
+        self.left = [o[1] == 0 for o in b_ops]
+        self.engine = True
+        self.dispatch = None
+
         super(expr, self).__init__(exp.value)
 
-    def parse(self, string, **kw):
-        if type(string) is not str:
-            raise ParseError('Can\'t match non-string!')
+    @staticmethod
+    def make_factor(operand, u_ops, lp, rp, exp):
+        factor = operand
+
+        if lp is not None:
+            factor ^= lp + exp + rp
+
+        factor = g(factor)
+
+        for o in u_ops:
+            a = o[1]
+            o = o[0][0:]
+
+            factor = g(wrap('right') + (o + factor) if a == 0 else wrap('left') + (factor + o))
+
+        return factor
+
+    def match(self, text, pos, ctx):
+        # Without the whole-input check for `expr` itself as well.
+        if not self.engine:
+            return self.expr.match(text, pos, ctx.partial)
+
+        return self.climb(text, pos, ctx.partial, len(self.binary) - 1)
+
+    def climb(self, text, pos, ctx, k):
+        # A factor followed by the operators of the levels up to `k`, the tightest first - each level gets the result
+        # of the ones below as its operand and repeats its operator with another such operand. That's what the
+        # elements do, the levels without an operator just don't go through the motions.
+        a = self.factor.match(text, pos, ctx)
+
+        if a is None:
+            return None
+
+        pos, out = a
+
+        near, at = None, -1
+
+        for j in range(k + 1):
+            items = None
+
+            while True:
+                if at != pos:
+                    near, at = self.operators_at(text, pos, ctx), pos
+
+                if near is not None and j not in near:
+                    break
+
+                a = self.binary[j].match(text, pos, ctx)
+
+                if a is None:
+                    break
+
+                b = self.climb(text, a[0], ctx, j - 1)
+
+                if b is None:
+                    break
+
+                if items is None:
+                    items = list(out)
+
+                items += a[1]
+                items += b[1]
+
+                pos = b[0]
+
+            if items is not None:
+                out = fold(items, 3, self.left[j])
+
+        return pos, out
+
+    def operators_at(self, text, pos, ctx):
+        # Levels whose operator can start at `pos` according to their FIRST sets. `None` when all of them have to be
+        # tried - when the sets don't tell, or to record the failures of the rest (see `union.match_literal`).
+        dispatch = self.dispatch
+
+        if dispatch is None or dispatch.stale:
+            dispatch = self.dispatch = FirstDispatch(self.binary)
+
+        if not dispatch.useful:
+            return None
+
+        q = ctx.skip(text, pos)
 
-        kw = kw.copy()
-        kw['not_whole'] = True
+        if ctx.failures is not None and q >= ctx.failures.pos:
+            return None
 
-        string, a = self.expr.parse(string, **kw)
+        c = text[pos:pos + 1]
+        d = None if q == pos else text[q:q + 1]
 
-        check_whole(string, **kw)
+        if type(text) is bytearray:  # The slices have to be hashable.
+            c, d = bytes(c), None if d is None else bytes(d)
 
-        return string, a
+        return dispatch.candidates(c, d)
 
 
 class delim_lst(ParserElement):
-    __slots__ = ['expr']
+    __slots__ = ['expr', 'el', 'sep', 'min', 'max', 'extra_comma', 'req_one']
 
     EXTRA_COMMA_ALLOWED = 1
     EXTRA_COMMA_REQUIRED = 2
@@ -849,6 +1690,14 @@ class delim_lst(ParserElement):
         if omit_blank:
             el = optional(el)
 
+        # The parts are kept for parsing the list an item at a time (see `pypeg.stream`).
+        self.el = el
+        self.sep = sep
+        self.min = min_c
+        self.max = max_c
+        self.extra_comma = extra_comma
+        self.req_one = req_one
+
         if extra_comma == 1 and min_c > 0:
             self.expr = el + ((sep + el)[min_c:max_c] + optional(sep) | sep)
 
@@ -869,15 +1718,13 @@ class delim_lst(ParserElement):
 
         super(delim_lst, self).__init__(self.expr.value)
 
-    def parse(self, string, **kw):
-        if type(string) is not str:
-            raise ParseError('Can\'t match non-string!')
+    def match(self, text, pos, ctx):
+        a = self.expr.match(text, pos, ctx)
 
-        string, a = self.expr.parse(string, **kw)
+        if a is None or not ctx.is_whole(text, a[0]):
+            return None
 
-        check_whole(string, **kw)
-
-        return string, a
+        return a
 
 
 # Pointer to parser element (can be used for recursive grammars)
@@ -885,6 +1732,9 @@ class delim_lst(ParserElement):
 class ptr(ParserElement):
     __slots__ = ['el']
 
+    # Counts the times any pointer got pointed somewhere, see `FirstDispatch.stale`.
+    generation = 0
+
     def __init__(self):
         super(ptr, self).__init__('')
 
@@ -896,13 +1746,62 @@ class ptr(ParserElement):
     def __iand__(self, other):
         self.el = other
 
+        ptr.generation += 1
+
         return self
 
-    def parse(self, string, **kw):
-        if type(string) is not str:
-            raise ParseError('Can\'t match non-string!')
+    def match(self, text, pos, ctx):
+        state = ctx.recursion
+
+        key = (id(self), pos)
+        entry = state.active.get(key, None)
+
+        # Reentering at the same position means left recursion, answer with the current seed.
+        if entry is not None:
+            if ctx.events is not None:
+                raise TypeError('Left recursion can\'t be parsed into events!')
+
+            entry[1] += 1
+            state.hits += 1
+
+            return entry[0]
+
+        entry = state.active[key] = [None, 0]
 
-        return self.el.parse(string, **kw)
+        try:
+            a = self.el.match(text, pos, ctx)
+
+            if entry[1] == 0:
+                return a
+
+            return self.grow(text, pos, entry, a, ctx)
+
+        finally:
+            del state.active[key]
+
+            state.hits -= entry[1]
+
+    def grow(self, text, pos, entry, a, ctx):
+        # Seed growing: reparse the rule, feeding the previous result to the recursive call, while it gets longer.
+        # The seed must not depend on the whole-input check, so it gets recomputed when that was in effect.
+        if not ctx.not_whole:
+            a = None
+
+        while True:
+            if a is not None:
+                entry[0] = a
+
+            new = self.el.match(text, pos, ctx.partial)
+
+            if new is None or a is not None and new[0] <= a[0]:
+                break
+
+            a = new
+
+        if a is None or not ctx.is_whole(text, a[0]):
+            return None
+
+        return a
 
 
 # Empty element - does nothing
@@ -941,8 +1840,8 @@ class EMPTY(ParserElement):
     def __xor__(self, other):
         return to_valid_element(other).opt()
 
-    def parse(self, string, **kw):
-        return string, []
+    def match(self, text, pos, ctx):
+        return pos, []
 
 
 # Cutting element - when it gets invoked, any error becomes fatal.
@@ -0,0 +1,303 @@
+from pypeg.core import *
+from pypeg.core import memo
+from pypeg.analysis import accepts, regex_first
+from pypeg.compiler import compiled
+from pypeg.lexer import lexed
+from pypeg.utils import TEXT_TYPES, Failures, ParseContext
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+# Reparsing a text after small edits, as an editor does on every keystroke. The rules of the grammar (`named` elements
+# and pointer targets) keep their results from parse to parse along with how far into the text they looked - an edit
+# drops the results which looked at the text it changed, the ones after it get moved by the difference in length and
+# the rest stays. The parse then only goes again through the rules around the edit, those elsewhere are looked up.
+#
+# How far a rule looked is told by the failures recorded inside it and by its match. A failed literal has looked at
+# as many characters as it has and a failed pattern only at the first one when that's not one it can start with - at
+# the rest of the text otherwise, it could have gone on to the end. A failed negative lookahead has looked as far as
+# the match it found. No element of the grammar may look more than `lookahead` characters past its match (a greedy
+# pattern looks at the one character after it) nor behind where it started. The rules also keep their farthest
+# failures, to be recorded again when they're looked up.
+#
+#   doc = Document(grammar, text, ignore=r'\s+')
+#   rest, result = doc.parse()
+#   rest, result = doc.edit(10, 3, 'abc')  # Replaces 3 characters at offset 10 by 'abc'.
+
+class Document:
+    # The results are kept in one table per version of the text (`tables[-1]` being the current one), an entry is
+    # looked up through the `edits` made since its version. They get merged into one table after `max_edits` edits.
+    __slots__ = ['el', 'text', 'kw', 'lookahead', 'max_edits', 'tables', 'edits', 'failures', 'firsts', 'hits',
+                 'misses']
+
+    def __init__(self, el, text, *, lookahead=16, max_edits=32, **kw):
+        if not isinstance(text, TEXT_TYPES):
+            raise ParseError('Can\'t match non-string!')
+
+        el.check_text(text)
+
+        if kw.get('events', None) is not None:
+            raise TypeError('Events can\'t be parsed incrementally, the rules looked up would leave theirs out!')
+
+        kw.pop('packrat', None)  # The rules keep their results anyway.
+
+        self.el = el.transform(self.bind)
+        self.text = text
+        self.kw = kw
+        self.lookahead = lookahead
+        self.max_edits = max_edits
+
+        self.tables = [{}]
+        self.edits = []
+
+        self.failures = None
+        self.firsts = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def bind(self, x, original):
+        t = type(x)
+
+        if t is ptr:
+            if x.el is not None and type(x.el) is not rule:
+                x.el = rule(x.el, self)
+
+            return x
+
+        elif t is named:
+            return rule(x, self)
+
+        elif t in {memo, compiled}:  # The rules keep the results, the compiled program would go around them.
+            return x.el
+
+        elif t is lexed:
+            raise TypeError('A lexed grammar can\'t be parsed incrementally, its positions are those of tokens!')
+
+        return x
+
+    def parse(self):
+        # Parses the current text like `ParserElement.parse`, the results of the rules stay for the next parse.
+        text = self.text
+
+        self.failures = Reach(self)
+
+        a = self.el.match(text, 0, ParseContext(text, failures=self.failures, **self.kw))
+
+        if a is None:
+            raise self.failures.error(text, 0)
+
+        return text[a[0]:], a[1]
+
+    def edit(self, offset, deleted, inserted):
+        # Replaces `deleted` characters at `offset` by `inserted` and parses the text again.
+        if offset < 0 or deleted < 0 or offset + deleted > len(self.text):
+            raise ValueError('Can\'t delete {} characters at {}, the text has {}!'.format(deleted, offset,
+                                                                                        len(self.text)))
+
+        self.text = self.text[:offset] + inserted + self.text[offset + deleted:]
+
+        self.edits.append((offset, deleted, len(inserted)))
+        self.tables.append({})
+
+        if len(self.edits) >= self.max_edits:
+            self.merge()
+
+        return self.parse()
+
+    def lookup(self, key, pos, not_whole):
+        # The entry of the rule `key` at `pos` of the current text, `None` if there's none the edits have left alone.
+        tables, edits = self.tables, self.edits
+        k = len(edits)
+
+        while True:
+            e = tables[k].get((key, pos, not_whole), None)
+
+            if e is not None:
+                e = self.follow(pos, e, k)
+
+                if e is not None and k < len(edits):  # Moved to the current version, to be found right away next time.
+                    tables[-1][key, e[0], not_whole] = e[1:]
+
+                return e
+
+            if k == 0:
+                return None
+
+            # Where the position was before the edit.
+            k -= 1
+            offset, deleted, inserted = edits[k]
+
+            if pos >= offset + inserted:
+                pos += deleted - inserted
+
+            elif pos >= offset:  # In the inserted text, nothing was parsed there yet.
+                return None
+
+    def follow(self, pos, e, k):
+        # The entry made at `pos` of the `k`-th version of the text moved through the edits since, `None` if one of
+        # them changed what it looked at.
+        end, a, reach, farthest, expected = e
+
+        for offset, deleted, inserted in self.edits[k:]:
+            if reach <= offset:
+                continue
+
+            if pos < offset + deleted:
+                return None
+
+            shift = inserted - deleted
+
+            pos += shift
+            reach += shift
+
+            if end is not None:
+                end += shift
+
+            if farthest >= 0:
+                farthest += shift
+
+        return pos, end, a, reach, farthest, expected
+
+    def merge(self):
+        table = {}
+
+        for k, entries in enumerate(self.tables):
+            for (key, pos, not_whole), e in entries.items():
+                e = self.follow(pos, e, k)
+
+                if e is not None:
+                    table[key, e[0], not_whole] = e[1:]
+
+        self.tables = [table]
+        self.edits = []
+
+
+class Reach(Failures):
+    # Failures of a parse of a `Document`, those of the rule being matched - how far it has looked into the text and
+    # its farthest failure. That's kept in `farthest`, `pos` stays short of any position so that the elements record
+    # all their failures (see `union.match_literal`), not just those from the farthest one on.
+    __slots__ = ['doc', 'farthest', 'reach']
+
+    def __init__(self, doc):
+        super(Reach, self).__init__(complete=True)
+
+        self.doc = doc
+        self.farthest = -1
+        self.reach = 0
+
+    def add(self, pos, el):
+        if pos > self.farthest:
+            self.farthest = pos
+            self.expected = [el]
+
+        elif pos == self.farthest:
+            self.expected.append(el)
+
+        t = type(el)
+
+        if t is s:
+            end = pos + len(el.value)
+
+        elif t is r:
+            firsts = self.doc.firsts
+
+            if id(el) not in firsts:
+                firsts[id(el)] = regex_first(el.pattern)
+
+            text = self.doc.text
+
+            end = len(text) + 1 if accepts(firsts[id(el)], text[pos:pos + 1]) else pos + 1
+
+        else:
+            end = pos + 1
+
+        if end > self.reach:
+            self.reach = end
+
+    def looked(self, end):
+        # The match of a negative lookahead depends on the text up to its end and what lies right after it.
+        end += self.doc.lookahead
+
+        if end > self.reach:
+            self.reach = end
+
+    def enter(self, pos):
+        outer = self.reach, self.farthest, self.expected
+
+        self.reach = pos + 1  # Even an element failing without a word has looked at something.
+        self.farthest = -1
+        self.expected = []
+
+        return outer
+
+    def join(self, reach, farthest, expected):
+        # Adds what a rule has done, matched now or looked up.
+        if reach > self.reach:
+            self.reach = reach
+
+        if farthest > self.farthest:
+            self.farthest = farthest
+            self.expected = list(expected)
+
+        elif farthest == self.farthest >= 0:
+            self.expected += expected
+
+    def error(self, text, pos, origin=(0, 1, 1)):
+        self.pos = self.farthest
+
+        return Failures.error(self, text, pos, origin)
+
+
+class rule(ParserElement):
+    # A rule of a `Document`, whose results outlive the parse.
+    __slots__ = ['el', 'doc']
+    transparent = True
+
+    def __init__(self, el, doc):
+        super(rule, self).__init__(el.value)
+
+        self.el = el
+        self.doc = doc
+
+    def __str__(self):
+        return str(self.el)
+
+    def match(self, text, pos, ctx):
+        doc = self.doc
+        failures = doc.failures
+
+        e = doc.lookup(id(self), pos, ctx.not_whole)
+
+        if e is not None:
+            doc.hits += 1
+
+            failures.join(*e[3:])
+
+            return None if e[1] is None else (e[1], e[2])
+
+        doc.misses += 1
+
+        outer = failures.enter(pos)
+        hits = ctx.recursion.hits
+
+        a = self.el.match(text, pos, ctx)
+
+        reach, farthest, expected = failures.reach, failures.farthest, tuple(failures.expected)
+
+        if a is not None:
+            # Having checked for the end of input, the match depends on all of the text after it.
+            reach = max(reach, a[0] + doc.lookahead if ctx.not_whole else len(text) + 1)
+
+        # Results built from a left recursion seed are only temporary.
+        if ctx.recursion.hits == hits:
+            doc.tables[-1][(id(self), pos, ctx.not_whole)] = (None, None, reach, farthest, expected) if a is None \
+                else (a[0], a[1], reach, farthest, expected)
+
+        failures.reach, failures.farthest, failures.expected = outer
+        failures.join(reach, farthest, expected)
+
+        return a
@@ -0,0 +1,349 @@
+from array import array
+from bisect import bisect_left
+from re import compile, escape, search
+
+from pypeg.core import *
+from pypeg.compiler import compiled
+from pypeg.utils import Failures, MemoTable, ParseContext, comment_scanner, to_valid_element
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+# Lexer front end for token-oriented languages. The tokens are declared by `s` and `r` elements (or `(name, element)`
+# pairs), the lexer joins them into one regex together with the ignored text (an `ignore` pattern and comments as
+# `trim_comments` finds them), so the input gets split into tokens in one pass and the ignored text gets dropped there.
+#
+# The tokens are tried in the order declared, the first one matching wins - except that a literal goes before the
+# shorter ones it starts with (`==` before `=`). A literal which a pattern matches as a whole (a keyword matched by the
+# pattern for names) is left to that pattern instead - its text then makes it the literal's token, while a longer name
+# starting with it stays a name. A token can't be empty and a pattern can't refer to its groups by number (the groups of
+# all the tokens are numbered together).
+#
+# `Lexer.grammar` turns a grammar into one matching the tokens - its `s` and `r` elements are replaced by the tokens
+# they declare (a literal not declared can also be the text of a pattern's token) and the whole is wrapped in `lexed`,
+# which lexes the input from where it's matched and maps the positions back to the text. The error messages point at the
+# tokens then. Compact parse trees and events aren't available for such grammars, their positions are those of tokens.
+
+class Lexer:
+    __slots__ = ['tokens', 'names', 'pattern', 'groups', 'skip', 'literals', 'keywords']
+
+    def __init__(self, tokens, *, ignore=None, comment_marker=None, end_comment='\n'):
+        self.tokens, self.names = [], []
+
+        for x in tokens:
+            name, x = x if type(x) is tuple else (None, x)
+            x = to_valid_element(x)
+
+            if type(x) not in {s, r}:
+                raise TypeError('A token has to be declared by s or r, not {}!'.format(type(x).__name__))
+
+            if type(x) is s and len(x.value) == 0:
+                raise ValueError('A token can\'t be empty!')
+
+            if type(x) is r and search(r'(?<!\\)(?:\\\\)*\\[1-9]|\(\?\(\d', to_str(x.pattern.pattern)):
+                raise ValueError('Pattern {} refers to its groups by number, it can\'t be a token!'.format(x))
+
+            self.tokens.append(x)
+            self.names.append(name if name is not None else repr(x.value) if type(x) is s else str(x))
+
+        if len({type(x.value) for x in self.tokens}) > 1:
+            raise TypeError('Tokens can\'t mix str and bytes!')
+
+        patterns = [(i, x.pattern.pattern) for i, x in enumerate(self.tokens) if type(x) is r]
+
+        self.literals = {}
+        self.keywords = [None] * len(self.tokens)
+
+        # Which literals the patterns take over.
+        first = join(patterns)
+
+        for i, x in enumerate(self.tokens):
+            if type(x) is not s or x.value in self.literals:
+                continue
+
+            self.literals[x.value] = i
+
+            a = None if first is None else first[0].match(x.value)
+
+            if a is not None and a.end() == len(x.value):
+                k = first[1][a.lastindex]
+
+                if self.keywords[k] is None:
+                    self.keywords[k] = {}
+
+                self.keywords[k].setdefault(x.value, i)
+
+        taken = {v for x in self.keywords if x is not None for v in x}
+
+        parts = []
+
+        for i, x in enumerate(self.tokens):
+            if type(x) is r:
+                parts.append((i, x.pattern.pattern))
+
+            elif x.value not in taken:
+                # Before the shorter literals it starts with, `==` has to be tried before `=`.
+                j = next((j for j, (k, _) in enumerate(parts) if type(self.tokens[k]) is s and
+                          x.value.startswith(self.tokens[k].value)), len(parts))
+
+                parts.insert(j, (i, escape(x.value)))
+
+        if len(parts) == 0:
+            raise ValueError('A lexer needs some tokens!')
+
+        # The ignored text gets matched along with the token after it, or by `skip` at the end.
+        skipped = []
+
+        if ignore is not None:
+            skipped.append(to_str(ignore))
+
+        if comment_marker is not None:
+            skipped.append(comment_scanner(comment_marker, end_comment).pattern)
+
+        prefix = '(?:{})*'.format('|'.join(['(?:{})'.format(x) for x in skipped])) if len(skipped) > 0 else ''
+
+        self.pattern, self.groups = join(parts, prefix)
+        self.skip = compile(prefix.encode('latin-1') if type(parts[0][1]) is bytes else prefix)
+
+    def __str__(self):
+        return 'Lexer({})'.format(', '.join(self.names))
+
+    def lex(self, text, pos=0):
+        # Splits `text` from `pos` into tokens, up to the end of it or the first place where none of them matches.
+        kinds, starts, ends = array('i'), array('q'), array('q')
+        add_kind, add_start, add_end = kinds.append, starts.append, ends.append
+
+        groups = self.groups
+        keywords = self.keywords
+
+        for a in self.pattern.finditer(text, pos):
+            if a.start() != pos:  # Skipped something no token matches.
+                break
+
+            i = a.lastindex
+            start, pos = a.span(i)
+
+            if start == pos:
+                break
+
+            k = groups[i]
+
+            if keywords[k] is not None:
+                k = keywords[k].get(text[start:pos], k)
+
+            add_kind(k)
+            add_start(start)
+            add_end(pos)
+
+        return Tokens(text, self, kinds, starts, ends, self.skip.match(text, pos).end())
+
+    def grammar(self, el):
+        return lexed(el.transform(self.bind), self)
+
+    def bind(self, x, original):
+        t = type(x)
+
+        if t is compiled:  # The compiled program reads characters.
+            return x.el
+
+        elif t is s:
+            i = self.literals.get(x.value, None)
+
+            if i is not None:
+                return kind(i, self.names[i])
+
+            a = self.pattern.match(x.value)
+
+            if a is not None and a.span(a.lastindex) == (0, len(x.value)):
+                return kind(self.groups[a.lastindex], repr(x.value), x.value)
+
+        elif t is r:
+            for i, y in enumerate(self.tokens):
+                if type(y) is r and y.pattern.pattern == x.pattern.pattern:
+                    return kind(i, self.names[i])
+
+        else:
+            return x
+
+        raise ValueError('{} isn\'t a token of {}!'.format(x, self))
+
+
+class Tokens:
+    # Tokens of a text as arrays of their kinds (indices of the tokens of the lexer), starts and ends. `stop` is where
+    # the lexing stopped, the end of the text unless there's something no token matches.
+    __slots__ = ['text', 'lexer', 'kinds', 'starts', 'ends', 'stop']
+
+    def __init__(self, text, lexer, kinds, starts, ends, stop):
+        self.text = text
+        self.lexer = lexer
+        self.kinds = kinds
+        self.starts = starts
+        self.ends = ends
+        self.stop = stop
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, i):
+        if type(i) is slice:  # Just the kinds, as the FIRST sets of the tokens have them.
+            return tuple(self.kinds[i])
+
+        return self.lexer.names[self.kinds[i]], self.starts[i], self.ends[i]
+
+    def value(self, i):
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def offset(self, i):
+        # Position in the text of the `i`-th token, the ignored text before it counts as matched.
+        return self.starts[i] if i < len(self.kinds) else self.stop
+
+    def index(self, pos):
+        # Index of the token lexing from `pos` starts with - the one starting there or after the one ending there -
+        # `None` when it's none of them. (The ignored text can't start a token, so its start gives the same tokens.)
+        starts = self.starts
+        i = bisect_left(starts, pos)
+
+        if i < len(starts) and starts[i] == pos or i > 0 and self.ends[i - 1] == pos:
+            return i
+
+        if i == len(starts) and pos == self.stop:
+            return i
+
+        return None
+
+
+class Lexes:
+    # Tokens a lexer has made of a text during a parse, with a memo table for each (their positions are token indices)
+    # and where to start in them for the positions of the text looked up so far.
+    __slots__ = ['text', 'at', 'last']
+
+    def __init__(self, text):
+        self.text = text
+        self.at = {}
+        self.last = None
+
+
+class kind(ParserElement):
+    # A token of the given kind, with the given text if that's not `None`.
+    __slots__ = ['index', 'name', 'text']
+
+    def __init__(self, index, name, text=None):
+        super(kind, self).__init__('')
+
+        self.index = index
+        self.name = name
+        self.text = text
+
+    def __str__(self):
+        return self.name
+
+    def first(self):
+        return frozenset([(self.index,)]), (), False  # Its kind stands in for the character.
+
+    def match(self, text, pos, ctx):
+        kinds = text.kinds
+
+        if pos < len(kinds) and kinds[pos] == self.index:
+            value = text.text[text.starts[pos]:text.ends[pos]]
+
+            if self.text is None or value == self.text:
+                if not ctx.is_whole(text, pos + 1):
+                    return None
+
+                return pos + 1, [value]
+
+        ctx.fail(pos, self)
+
+        return None
+
+
+class lexed(ParserElement):
+    __slots__ = ['el', 'lexer']
+
+    def __init__(self, el, lexer):
+        super(lexed, self).__init__(el.value)
+
+        self.el = el
+        self.lexer = lexer
+
+    def __str__(self):
+        return 'lexed({})'.format(self.el)
+
+    def text_types(self):
+        return [type(x.value) for x in self.lexer.tokens]
+
+    def match(self, text, pos, ctx):
+        if ctx.events is not None:
+            raise TypeError('Events of a lexed grammar aren\'t supported, its positions are those of tokens!')
+
+        tokens, table, i = self.tokens(text, pos, ctx)
+
+        failures = None if ctx.failures is None else Failures(ctx.failures.complete)
+
+        a = self.el.match(tokens, i, ParseContext(tokens, not_whole=ctx.not_whole, packrat=table, failures=failures,
+                                                  **ctx.options))
+
+        if failures is not None and failures.pos >= 0:
+            q = tokens.offset(failures.pos)
+
+            for x in failures.expected:
+                ctx.fail(q, x)
+
+        if failures is not None and failures.left_out is not None:
+            ctx.failures.leave_out(tokens.offset(failures.left_out))
+
+        if a is None:
+            return None
+
+        end = tokens.offset(a[0])
+
+        # The elements have checked for the end of the tokens, not that of the text (the lexing can stop short of it).
+        if a[0] == len(tokens) and not ctx.is_whole(text, end):
+            return None
+
+        return end, a[1]
+
+    def tokens(self, text, pos, ctx):
+        # The tokens from `pos` on, their memo table and the index to start at. The text gets lexed only once for the
+        # positions the tokens lexed last reach, so that a lexed element in a repetition stays linear.
+        lexes = ctx.lexes.get(self.lexer, None)
+
+        if lexes is None or lexes.text is not text:  # A stream parses a new window in the same context.
+            lexes = ctx.lexes[self.lexer] = Lexes(text)
+
+        found = lexes.at.get(pos, None)
+
+        if found is None:
+            i = None if lexes.last is None else lexes.last[0].index(pos)
+
+            if i is None:
+                table = None if ctx.packrat is None else MemoTable(ctx.packrat.max_entries, ctx.packrat.only)
+
+                lexes.last, i = (self.lexer.lex(text, pos), table), 0
+
+            found = lexes.at[pos] = lexes.last + (i,)
+
+        return found
+
+
+def join(parts, prefix=''):
+    # One regex trying the parts in turn, each in a named group, along with the kinds of the parts by group number.
+    if len(parts) == 0:
+        return None
+
+    text = prefix + '(?:{})'.format('|'.join(['(?P<_{}>{})'.format(j, to_str(x)) for j, (_, x) in enumerate(parts)]))
+    pattern = compile(text.encode('latin-1') if type(parts[0][1]) is bytes else text)
+
+    groups = [None] * (pattern.groups + 1)
+
+    for j, (i, _) in enumerate(parts):
+        groups[pattern.groupindex['_{}'.format(j)]] = i
+
+    return pattern, groups
+
+
+def to_str(x):
+    return x.decode('latin-1') if type(x) is bytes else x
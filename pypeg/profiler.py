@@ -0,0 +1,153 @@
+from time import perf_counter
+
+from pypeg.core import *
+from pypeg.core import ptr
+from pypeg.compiler import compiled
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+# Profiling runs a copy of the grammar with every element wrapped in `profiled`, which counts its calls and times
+# them - the grammar itself stays as it is, so there's no cost when not profiling. A compiled element is timed as a
+# whole, its program keeps running.
+#
+# `own` is the time spent in the element itself, `total` includes the elements it called (recursive calls are counted
+# at every level). `backtracks` are calls at a position where the element has already been tried during the same
+# parse - the work a memo table would save.
+
+class Profile:
+    __slots__ = ['el', 'stats', 'stack']
+
+    def __init__(self, el):
+        self.stats = {}
+        self.stack = []
+
+        self.el = el.transform(self._wrap)
+
+    def _wrap(self, x, original):
+        # An element can get copied more than once (one reachable through a pointer besides the top one), the copies
+        # share the numbers.
+        stats = self.stats.get(id(original), None)
+
+        if stats is None:
+            stats = self.stats[id(original)] = ElementStats(original)
+
+        if type(x) is ptr:  # Pointers stay, their target gets profiled in their name.
+            if x.el is not None:
+                x.el = profiled(x.el, stats, self.stack)
+
+            return x
+
+        if type(x) is compiled:
+            x.el = original.el
+            x.programs = original.programs
+
+        return profiled(x, stats, self.stack)
+
+    def parse(self, string, **kw):
+        for x in self.stats.values():
+            x.positions.clear()
+
+        return self.el.parse(string, **kw)
+
+    def sorted(self, key='own'):
+        return sorted([x for x in self.stats.values() if x.calls > 0], key=lambda x: getattr(x, key), reverse=True)
+
+    def export(self, key='own'):
+        # Plain data for `json.dump` and the like.
+        return [x.to_dict() for x in self.sorted(key)]
+
+    def report(self, key='own', limit=20):
+        out = ['{:>9} {:>9} {:>9} {:>9} {:>10} {:>10} {:>9}  {}'.format('calls', 'successes', 'failures', 'backtracks',
+                                                                          'own ms', 'total ms', 'consumed', 'element')]
+
+        for x in self.sorted(key)[:limit]:
+            out.append('{:>9} {:>9} {:>9} {:>9} {:>10.3f} {:>10.3f} {:>9}  {}'.format(
+                x.calls, x.successes, x.failures, x.backtracks, x.own * 1000, x.total * 1000, x.consumed, x.label))
+
+        return '\n'.join(out)
+
+
+class ElementStats:
+    __slots__ = ['el', 'calls', 'successes', 'failures', 'backtracks', 'own', 'total', 'consumed', 'positions']
+
+    def __init__(self, el):
+        self.el = el
+
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.backtracks = 0
+        self.own = 0.0
+        self.total = 0.0
+        self.consumed = 0
+
+        self.positions = set()
+
+    @property
+    def label(self):
+        text = str(self.el)
+
+        if len(text) > 60:
+            text = text[:57] + '...'
+
+        return '{} {}'.format(type(self.el).__name__, text)
+
+    def to_dict(self):
+        return {'element': self.label, 'type': type(self.el).__name__, 'calls': self.calls,
+                'successes': self.successes, 'failures': self.failures, 'backtracks': self.backtracks,
+                'own': self.own, 'total': self.total, 'consumed': self.consumed}
+
+
+class profiled(ParserElement):
+    __slots__ = ['el', 'stats', 'stack']
+    transparent = True
+
+    def __init__(self, el, stats, stack):
+        super(profiled, self).__init__(el.value)
+
+        self.el = el
+        self.stats = stats
+        self.stack = stack
+
+    def __str__(self):
+        return str(self.el)
+
+    def match(self, text, pos, ctx):
+        stats = self.stats
+        stack = self.stack
+
+        stats.calls += 1
+
+        if pos in stats.positions:
+            stats.backtracks += 1
+
+        else:
+            stats.positions.add(pos)
+
+        stack.append(0.0)
+        start = perf_counter()
+
+        try:
+            a = self.el.match(text, pos, ctx)
+
+        finally:
+            elapsed = perf_counter() - start
+
+            stats.total += elapsed
+            stats.own += elapsed - stack.pop()
+
+            if len(stack) > 0:
+                stack[-1] += elapsed
+
+        if a is None:
+            stats.failures += 1
+
+        else:
+            stats.successes += 1
+            stats.consumed += a[0] - pos
+
+        return a
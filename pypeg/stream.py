@@ -0,0 +1,252 @@
+from pypeg.core import *
+from pypeg.core import memo
+from pypeg.compiler import compiled
+from pypeg.utils import Failures, MemoTable, ParseContext
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+# Parses a repeated rule (`counter` or `delim_lst`) from a file object or an iterator of string chunks, yielding the
+# result of one repetition at a time. Only a window of the input is kept in memory: whatever lies before the last
+# parsed repetition is committed and dropped.
+#
+# An element can't tell a failure from a lack of input, so the window has to reach far enough - a match is only
+# trusted when at least `lookahead` characters follow it (or the input has ended), otherwise the window grows and the
+# repetition gets parsed again. No element of the grammar may look more than `lookahead` characters past its match.
+# The window doesn't grow past `max_record` characters (and the lookahead) though - a repetition failing in such a
+# window is a syntax error and one matching but not fitting in it is an error as well, instead of the rest of the
+# input getting read in. Once the repetitions are done, the generator returns the rest of the input as `parse` does
+# (the ignored text after them), or `None` when the input doesn't have to end there (`not_whole`).
+
+def iterparse(el, source, *, chunk_size=65536, lookahead=4096, max_record=2 ** 24, **kw):
+    table = kw.get('packrat', None)
+
+    if table is True:
+        table = kw['packrat'] = MemoTable()
+
+    if type(table) is MemoTable:
+        table.reset()
+
+        el = table.prepare(el)
+
+    else:
+        table = None
+
+    el.check_text('')  # The input is read as `str`.
+
+    el, compiles = top_level(el, table)
+
+    stream = Stream(source, chunk_size, lookahead, max_record, table, **kw)
+
+    if type(el) is counter:
+        yield from stream.repeat(part(el.el, compiles), el.min, el.max)
+
+    elif type(el) is delim_lst:
+        yield from stream.delimited(el, part(el.el, compiles), part(el.sep, compiles))
+
+    else:
+        raise TypeError('Only a repeated element (counter or delim_lst) can be parsed item by item!')
+
+    return stream.finish()
+
+
+def top_level(el, table):
+    compiles = False
+
+    while type(el) in {ptr, memo, compiled}:
+        if type(el) is compiled:
+            compiles = table is None  # Memoization needs the element tree.
+
+        el = el.el
+
+    return el, compiles
+
+
+def part(el, compiles):
+    return el.compile() if compiles else el
+
+
+class Stream:
+    __slots__ = ['chunks', 'text', 'pos', 'origin', 'eof', 'lookahead', 'max_record', 'table', 'failures', 'whole',
+                 'ctx']
+
+    def __init__(self, source, chunk_size, lookahead, max_record, table, **kw):
+        if type(source) is str:
+            self.chunks = iter([source])
+
+        elif hasattr(source, 'read'):
+            self.chunks = iter(lambda: source.read(chunk_size), '')
+
+        else:
+            self.chunks = iter(source)
+
+        self.text = ''
+        self.pos = 0
+        self.origin = (0, 1, 1)
+        self.eof = False
+
+        self.lookahead = lookahead
+        self.max_record = max_record
+        self.table = table
+        self.failures = Failures(complete=True)
+
+        # The repetitions are parsed as parts of the input, the end of it gets checked by `finish`.
+        self.whole = not kw.get('not_whole', False)
+        self.ctx = ParseContext(**dict(kw, not_whole=True))
+
+    def fill(self, size):
+        parts = [self.text]
+        length = len(self.text)
+
+        while length < size:
+            chunk = next(self.chunks, None)
+
+            if chunk is None:
+                self.eof = True
+
+                break
+
+            if type(chunk) is not str:
+                raise ParseError('Can\'t match non-string!')
+
+            parts.append(chunk)
+            length += len(chunk)
+
+        if len(parts) > 1:
+            self.text = ''.join(parts)
+
+    def drop(self):
+        # Forgets the committed input, but only once it makes up most of the buffer to keep the copying linear.
+        k = self.pos
+
+        if 2 * k < len(self.text):
+            return
+
+        offset, line, column = self.origin
+        i = self.text.rfind('\n', 0, k)
+
+        if i < 0:
+            column += k
+
+        else:
+            line += self.text.count('\n', 0, k)
+            column = k - i
+
+        self.origin = offset + k, line, column
+
+        self.text = self.text[k:]
+        self.pos = 0
+
+        self.failures = Failures(complete=True)
+
+    def match(self, el):
+        size = 2 * self.lookahead
+
+        while True:
+            self.fill(self.pos + size)
+
+            if self.table is not None:
+                self.table.entries.clear()  # The positions change along with the window.
+
+            self.ctx.failures = Failures(complete=True)
+
+            a = el.match(self.text, self.pos, self.ctx)
+
+            if self.eof or a is not None and a[0] + self.lookahead <= len(self.text):
+                self.failures = self.ctx.failures
+
+                return a
+
+            if self.max_record is not None and len(self.text) - self.pos >= self.max_record + self.lookahead:
+                if a is not None:
+                    raise ParseError('A repetition at {} is longer than {} characters!'.format(
+                        self.origin[0] + self.pos, self.max_record))
+
+                self.failures = self.ctx.failures
+
+                return None
+
+            size *= 2
+
+    def commit(self, a):
+        self.pos = a[0]
+
+        self.drop()
+
+        return a[1]
+
+    def error(self):
+        return self.failures.error(self.text, self.pos, self.origin)
+
+    def repeat(self, el, min_, max_):
+        i = 0
+
+        while max_ is None or i < max_:
+            pos = self.pos
+            a = self.match(el)
+
+            if a is None:
+                break
+
+            yield self.commit(a)
+
+            i += 1
+
+            if a[0] == pos and max_ is None:  # It would repeat forever.
+                break
+
+        if i < min_:
+            raise self.error()
+
+    def delimited(self, lst, el, sep):
+        # Follows `delim_lst`. The repetitions already yielded can't be taken back, so a list which falls apart later on
+        # is an error even when it's optional.
+        if lst.extra_comma == 1 and lst.min > 0:
+            raise TypeError('Can\'t stream a list which may end with a lone separator!')
+
+        a = self.match(el)
+
+        if a is None:
+            if lst.req_one:
+                raise self.error()
+
+            return
+
+        yield self.commit(a)
+
+        yield from self.repeat(sep + el, lst.min, None if lst.max is None else lst.max - 1)
+
+        if lst.extra_comma in {1, 2}:
+            a = self.match(sep)
+
+            if a is not None:
+                yield self.commit(a)
+
+            elif lst.extra_comma == 2:
+                raise self.error()
+
+    def finish(self):
+        if not self.whole:
+            return None
+
+        size = 2 * self.lookahead
+
+        while True:
+            self.fill(self.pos + size)
+
+            pos = self.ctx.skip(self.text, self.pos)
+
+            if self.eof or pos + self.lookahead <= len(self.text):
+                break
+
+            size *= 2
+
+        if pos < len(self.text):
+            self.failures.add(pos, None)
+
+            raise self.error()
+
+        return self.text[self.pos:]
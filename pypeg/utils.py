@@ -1,16 +1,140 @@
 import pypeg.core
 
+from copy import copy
+from mmap import mmap
+from collections import OrderedDict
+
 
 __author__ = 'Jan Růžička'
 __email__ = 'jan.ruzicka01@gmail.com'
 
 __version__ = '1.0'
 
+# Inputs the parser can read - `s` and `r` elements have to be built from bytes to match the binary ones.
+TEXT_TYPES = (str, bytes, bytearray, mmap)
+
+# Bytes of a mapped file copied at a time to look through it (see `ParseError.line`).
+MMAP_CHUNK = 2 ** 20
+
+# Functions skipping the ignored text, for each ignore pattern used so far.
+SKIPPERS = {}
+
+# Slots the elements fill in as they get used, they don't tell anything about the grammar.
+CACHES = {'dispatch', 'literals', 'heads', 'programs', 'derived'}
+
 
 # Classes to help the parser.
 
 class ParseError(Exception):
-    pass
+    # Raised by the top-level parse. When it comes from a failed parse, it knows the farthest position reached and the
+    # elements expected there; the message, line and column are only worked out when asked for. `origin` is the
+    # offset, line and column of `text[0]` when the text is only a part of the input (e.g. a stream buffer). The
+    # arguments are just the excerpt of the input, the text may be long.
+
+    def __init__(self, message=None, text=None, pos=None, expected=(), origin=(0, 1, 1)):
+        self.message = message
+        self.text = text
+        self.pos = pos
+        self.expected = expected
+        self.origin = origin
+
+        if text is None:
+            super(ParseError, self).__init__(message)
+
+        else:
+            super(ParseError, self).__init__(self.excerpt())
+
+    def __reduce__(self):
+        # Pickled with just the part of the text in the excerpt and the names of the elements expected, which might
+        # not pickle themselves (e.g. to come back from a worker process).
+        if self.text is None:
+            return ParseError, (self.message,)
+
+        start, end = self.window()
+        k = self.pos - start
+
+        return ParseError, (self.message, self.text[start:end], k, tuple(self.expected_names()),
+                            (self.offset - k, self.line, self.column - k))
+
+    def __str__(self):
+        if self.text is None:
+            return str(self.message)
+
+        out = 'Syntax error at line {}, column {}'.format(self.line, self.column)
+
+        if len(self.expected) > 0:
+            out += ', expected {}'.format(' or '.join(self.expected_names()))
+
+        return '{}:\n{}'.format(out, self.excerpt())
+
+    @property
+    def offset(self):
+        return None if self.text is None else self.origin[0] + self.pos
+
+    @property
+    def line(self):
+        if self.text is None:
+            return None
+
+        nl = newline(self.text)
+
+        if type(self.text) is not mmap:
+            return self.origin[1] + self.text.count(nl, 0, self.pos)
+
+        # `mmap` can't count, the text before the error is counted a slice at a time rather than copied whole.
+        return self.origin[1] + sum(self.text[i:min(i + MMAP_CHUNK, self.pos)].count(nl)
+                                    for i in range(0, self.pos, MMAP_CHUNK))
+
+    @property
+    def column(self):
+        if self.text is None:
+            return None
+
+        i = self.text.rfind(newline(self.text), 0, self.pos)
+
+        return self.origin[2] + self.pos if i < 0 else self.pos - i
+
+    def expected_names(self):
+        out = []
+
+        for x in self.expected:
+            if x is None:
+                x = 'end of input'
+
+            elif type(x) is pypeg.core.s:
+                x = repr(x.value)
+
+            else:
+                x = str(x)
+
+            if x not in out:
+                out.append(x)
+
+        return out
+
+    def window(self, width=60):
+        # Where the excerpt starts and ends, at most `width` characters of the line keeping the failure position visible
+        # in long lines. Only those get looked at.
+        nl = newline(self.text)
+
+        lo = max(0, self.pos - width // 2)
+        i = self.text.rfind(nl, lo, self.pos)
+        start = lo if i < 0 else i + 1
+
+        end = self.text.find(nl, self.pos, start + width)
+        end = min(len(self.text), start + width) if end < 0 else end
+
+        return start, end
+
+    def excerpt(self, width=60):
+        start, end = self.window(width)
+
+        line = self.text[start:end]
+
+        if type(line) is not str:
+            line = line.decode('ascii', 'replace')  # One character per byte keeps the caret in place.
+
+        return '    {}\n    {}^'.format(line, ' ' * (self.pos - start))
 
 
 class FatalParseError(Exception):
@@ -21,11 +145,429 @@ class BlockInterrupt(Exception):
     pass
 
 
+class Failures:
+    # The farthest position where a terminal failed during a parse, along with the elements expected there
+    # (`None` stands for the end of input). Unless they have to be `complete`, `longest` goes through its alternatives
+    # backwards and leaves out those which can't win - `left_out` is the first position where it did, the failures from
+    # there on may be missing some or be out of order.
+    __slots__ = ['pos', 'expected', 'complete', 'left_out']
+
+    def __init__(self, complete=False):
+        self.pos = -1
+        self.expected = []
+        self.complete = complete
+        self.left_out = None
+
+    def add(self, pos, el):
+        if pos > self.pos:
+            self.pos = pos
+            self.expected = [el]
+
+        elif pos == self.pos:
+            self.expected.append(el)
+
+    def leave_out(self, pos):
+        if self.left_out is None or pos < self.left_out:
+            self.left_out = pos
+
+    @property
+    def incomplete(self):
+        return self.left_out is not None and self.left_out <= self.pos
+
+    @property
+    def farthest(self):
+        # Where the elements `expected` failed, a subclass may record failures short of it as well.
+        return self.pos
+
+    def looked(self, end):
+        # An element failed although what it matched first ended at `end` (a negative lookahead) - only matters to
+        # `pypeg.incremental.Reach`, which keeps track of how far the elements looked.
+        pass
+
+    def error(self, text, pos, origin=(0, 1, 1)):
+        if self.pos < 0:
+            return ParseError('Can\'t match the input from position {}!'.format(origin[0] + pos))
+
+        return ParseError(None, text, self.pos, tuple(self.expected), origin)
+
+
+class Turns:
+    # Failures recorded by the alternatives of a choice tried out of order, to be put back in their turn. Each of them
+    # `begin`s where its failures start.
+    __slots__ = ['failures', 'marks']
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.marks = []
+
+    def begin(self, i):
+        self.marks.append((i, self.failures.farthest, len(self.failures.expected)))
+
+    def restore(self):
+        failures = self.failures
+        farthest = failures.farthest
+
+        # Where the failures of each one start, those before the farthest position changed are gone.
+        starts = [n if at == farthest else 0 for _, at, n in self.marks]
+        ends = starts[1:] + [len(failures.expected)]
+
+        parts = sorted([(i, k) for k, (i, _, _) in enumerate(self.marks) if starts[k] < ends[k]])
+
+        if len(parts) < 2:
+            return
+
+        got = failures.expected
+
+        failures.expected = got[:starts[0]] + [x for _, k in parts for x in got[starts[k]:ends[k]]]
+
+
+class MemoTable:
+    # Packrat memo table used by `memo` elements during one top-level parse (`parse(..., packrat=MemoTable())`).
+    # `max_entries` caps its size, the least recently used results get evicted first. `only` limits the automatic
+    # memoization to the given element class(es), e.g. `only=ptr` memoizes just pointer targets and `only=()` just
+    # the elements wrapped by hand using `memo`.
+
+    def __init__(self, max_entries=None, only=None):
+        if max_entries is not None and max_entries < 1:
+            raise ValueError('Memo table must be able to hold at least one entry!')
+
+        self.max_entries = max_entries
+        self.only = only
+
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __str__(self):
+        return 'MemoTable(hits={}, misses={}, evictions={}, hit rate={:.1%})'.format(self.hits, self.misses,
+                                                                                   self.evictions, self.hit_rate)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+
+        return self.hits / total if total else 0.0
+
+    def reset(self):
+        self.entries.clear()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key):
+        a = self.entries.get(key, None)
+
+        if a is None:
+            self.misses += 1
+
+        else:
+            self.hits += 1
+
+            if self.max_entries is not None:
+                self.entries.move_to_end(key)
+
+        return a
+
+    def store(self, key, a):
+        self.entries[key] = a
+
+        if self.max_entries is not None and len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+            self.evictions += 1
+
+    def prepare(self, el):
+        return el.transform(self._wrap)
+
+    def _wrap(self, x, original):
+        core = pypeg.core
+
+        if self.only is not None and not isinstance(x, self.only):
+            return x
+
+        if type(x) is core.ptr:
+            if x.el is not None and type(x.el) is not core.memo:
+                x.el = core.memo(x.el)
+
+            return x
+
+        if type(x) in {core.s, core.r, core.memo}:  # Matching a terminal is cheaper than looking it up.
+            return x
+
+        return core.memo(x)
+
+
+class LazyPattern:
+    # Stands in for the compiled regex of an `r` until something else than its source is asked for, then compiles it
+    # and puts it in its place. Copies of the element made before that (see `ParserElement.transform`) keep using it.
+    __slots__ = ['owner', 'pattern', 'flags', 'compiled']
+
+    def __init__(self, owner, pattern, flags):
+        self.owner = owner
+        self.pattern = pattern
+        self.flags = flags
+        self.compiled = None
+
+    def __getattr__(self, name):
+        if self.compiled is None:
+            self.compiled = self.owner.pattern = pypeg.core.compile(self.pattern, self.flags)
+
+        return getattr(self.compiled, name)
+
+
+class LiteralSet:
+    # Alternatives of a choice which are all literals (`s`), found by looking up the text - a slice for each of their
+    # lengths - instead of trying them one by one. Made for the list `xs`, `index` is `None` unless they're literals
+    # and enough of them start with the same character, otherwise the FIRST sets narrow them down well enough.
+    __slots__ = ['xs', 'index', 'lengths']
+
+    def __init__(self, xs, crowd=3):
+        self.xs = xs
+        self.index = None
+        self.lengths = []
+
+        if not all([type(x) is pypeg.core.s for x in xs]):
+            return
+
+        firsts = [x.value[:1] for x in xs]
+
+        if max([firsts.count(c) for c in firsts]) < crowd:
+            return
+
+        self.index = {}
+
+        for i, x in enumerate(xs):
+            self.index[x.value] = self.index.get(x.value, ()) + (i,)
+
+        self.lengths = sorted({len(x.value) for x in xs})
+
+    def ends(self, text, pos, skip):
+        # Where the literals found end, by their index, and where the ignored text ends. Like `s`, a literal is looked
+        # for after the ignored text only when it's not right at `pos`.
+        out = {}
+
+        self.find(text, pos, out)
+
+        q = skip(text, pos)
+
+        if q != pos:
+            self.find(text, q, out)
+
+        return out, q
+
+    def find(self, text, pos, out):
+        binary = type(text) is bytearray  # The slices have to be hashable.
+
+        for n in self.lengths:
+            a = text[pos:pos + n]
+
+            if len(a) < n:
+                break
+
+            for i in self.index.get(bytes(a) if binary else a, ()):
+                if i not in out:
+                    out[i] = pos + n
+
+
+class Heads:
+    # What the alternatives of a choice start with (the alternative itself, or the first element of a sequence). In
+    # `shared[i]` when another alternative starts with the same element, in `terminals[i]` when it's a literal or a
+    # pattern, maybe inside of wrappers starting like it (a named one, say) - the alternative fails right there if that
+    # does, recording just that failure.
+    __slots__ = ['xs', 'shared', 'terminals', 'any']
+
+    def __init__(self, xs):
+        self.xs = xs
+
+        heads = [x.xs[0] if type(x) is pypeg.core.combinator and len(x.xs) > 0 and x.xs[0] is not pypeg.core.cut else x
+                 for x in xs]
+        ids = [id(x) for x in heads]
+
+        self.shared = [x if ids.count(id(x)) > 1 else None for x in heads]
+        self.terminals = [terminal(x) for x in heads]
+        self.any = any([x is not None for x in self.shared])
+
+
+def terminal(x):
+    while x.transparent and getattr(x, 'el', None) is not None:
+        x = x.el
+
+        if type(x) is pypeg.core.combinator and len(x.xs) > 0 and x.xs[0] is not pypeg.core.cut:
+            x = x.xs[0]
+
+    return x if type(x) in {pypeg.core.s, pypeg.core.r} else None
+
+
+class RecursionState:
+    # Pointers being parsed at the moment, keyed by their id and position, together with their left recursion seeds.
+    # `hits` counts the recursive calls answered with a seed that haven't been grown to a final result yet.
+    __slots__ = ['active', 'hits']
+
+    def __init__(self):
+        self.active = {}
+        self.hits = 0
+
+
+class EventLog:
+    # Events of `ParserElement.parse_events` on their way to the handler. They are delivered right away unless an
+    # element which can still be backtracked over is being matched - then they wait until it succeeds, or get dropped.
+    __slots__ = ['handler', 'pending', 'marks']
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.pending = []
+        self.marks = []
+
+    def emit(self, fn, *args):
+        if len(self.marks) == 0:
+            fn(*args)
+
+        else:
+            self.pending.append((fn, args))
+
+    def mark(self):
+        self.marks.append(len(self.pending))
+
+    def commit(self):
+        self.marks.pop()
+
+        if len(self.marks) == 0 and len(self.pending) > 0:
+            for fn, args in self.pending:
+                fn(*args)
+
+            self.pending.clear()
+
+    def rollback(self):
+        del self.pending[self.marks.pop():]
+
+
+class Handler:
+    # Receiver of the events of `ParserElement.parse_events`, to be overridden. Positions are offsets into the input,
+    # `start` is past the ignored text.
+    def enter(self, name, pos):
+        pass
+
+    def token(self, start, end):
+        pass
+
+    def exit(self, name, start, end):
+        pass
+
+
+class Node:
+    # Result of a named element in a compact parse tree (see `ParserElement.parse_tree`): the span of the input it
+    # matched and the nodes of the named elements inside. `pos` is where the element started and `start` where its
+    # first token is, past the ignored text.
+    __slots__ = ['el', 'ctx', 'pos', 'start', 'end', 'children']
+
+    def __init__(self, el, ctx, pos, start, end, children):
+        self.el = el
+        self.ctx = ctx
+        self.pos = pos
+        self.start = start
+        self.end = end
+        self.children = children
+
+    def __repr__(self):
+        return 'Node({!r}, {}, {}, {})'.format(self.name, self.start, self.end, self.children)
+
+    @property
+    def name(self):
+        return getattr(self.el, 'name', None)
+
+    @property
+    def text(self):
+        return self.ctx.text[self.start:self.end]
+
+    def walk(self):
+        stack = [self]
+
+        while len(stack) > 0:
+            x = stack.pop()
+
+            yield x
+
+            stack += reversed(x.children)
+
+    def to_list(self):
+        # The usual result of the element, which gets matched once more to rebuild it.
+        ctx = self.ctx
+        a = self.el.match(ctx.text, self.pos, ParseContext(ctx.text, ignore=ctx.ignore, not_whole=ctx.not_whole,
+                                                            **ctx.options))
+
+        return a[1]
+
+
+class ParseContext:
+    # State of one top-level parse, created once and passed to every element by reference. `partial` is the same
+    # context with the whole-input check switched off, as the elements of sequences and repetitions get it - both
+    # share the same memo table, left recursion state, failures, event log and tokens lexed (see `pypeg.lexer`).
+    # Options the engine doesn't know about are kept in `options` for the elements that want them.
+    __slots__ = ['text', 'ignore', 'skip', 'not_whole', 'packrat', 'recursion', 'failures', 'events', 'lexes',
+                 'options', 'partial']
+
+    def __init__(self, text=None, *, ignore=None, not_whole=False, packrat=None, failures=None, events=None,
+                 **options):
+        self.text = text
+        self.ignore = ignore
+        self.skip = no_skip if ignore is None else skipper(ignore)
+        self.not_whole = not_whole
+        self.packrat = packrat if type(packrat) is MemoTable else None
+        self.recursion = RecursionState()
+        self.failures = failures
+        self.events = events
+        self.lexes = {}
+        self.options = options
+
+        if not_whole:
+            self.partial = self
+
+        else:
+            self.partial = copy(self)
+            self.partial.not_whole = True
+            self.partial.partial = self.partial
+
+    def kw(self):
+        # The options as keyword arguments, for elements written against the keyword API.
+        kw = dict(self.options)
+
+        if self.ignore is not None:
+            kw['ignore'] = self.ignore
+
+        if self.not_whole:
+            kw['not_whole'] = True
+
+        if self.packrat is not None:
+            kw['packrat'] = self.packrat
+
+        return kw
+
+    def is_whole(self, text, pos):
+        if self.not_whole:
+            return True
+
+        pos = self.skip(text, pos)
+
+        if pos >= len(text):
+            return True
+
+        self.fail(pos, None)
+
+        return False
+
+    def fail(self, pos, el):
+        if self.failures is not None:
+            self.failures.add(pos, el)
+
+
 # Functions to help the parser
 
 def to_valid_element(other):
     if not isinstance(other, pypeg.ParserElement):
-        if type(other) is str:
+        if type(other) in {str, bytes}:
             other = pypeg.s(other)
 
         elif type(other) is list and len(other) == 1:
@@ -40,44 +582,78 @@ def to_valid_element(other):
 # Functions used to process AST.
 
 def trim_comments(string, comment_marker, *, end_comment='\n', quote_markers=None, nested_comments=True):
-    out = ''
+    # A comment runs from its marker up to and including the end of comment, which is looked for from the character
+    # after the marker's first one. The quote markers never open a quote and comments can't nest, so neither option
+    # changes the output.
+    return comment_scanner(comment_marker, end_comment).sub('', string)
 
-    quote_markers = {'"', '\''} if quote_markers is None else quote_markers
 
-    commented = 0
-    quoted_by = None
+def comment_scanner(comment_marker, end_comment):
+    # One regex matching whole comments, an unterminated one runs to the end of the input.
+    if len(comment_marker) == 0:
+        start = '(?s:.)'
 
-    i = 0
+    else:
+        start = '{}(?={})'.format(pypeg.core.escape(comment_marker[0]), pypeg.core.escape(comment_marker[1:]))
 
-    while i < len(string):
-        if not commented:
-            if quoted_by is None and string[i:len(comment_marker) + i] == comment_marker:
-                commented += 1
+    if len(end_comment) == 1:
+        body = '[^{}]*'.format(pypeg.core.escape(end_comment))  # Much faster than a lazy repeat.
 
-                i += 1
+    else:
+        body = '(?s:.*?)'
 
-                continue
+    return pypeg.core.compile('{}{}(?:{}|\\Z)'.format(start, body, pypeg.core.escape(end_comment)))
 
-            else:
-                for q in quote_markers:
-                    if string[i:len(q) + i] == q:
-                        if quoted_by == q:
-                            quoted_by = None
 
-                        break
+def iter_trim_comments(source, comment_marker, *, end_comment='\n', quote_markers=None, nested_comments=True,
+                       chunk_size=65536):
+    # Streaming `trim_comments` - reads a file object or an iterator of strings and yields the text outside of
+    # comments piece by piece. Just enough of each chunk is held back to find the markers crossing chunk boundaries.
+    if len(comment_marker) == 0:
+        raise ValueError('Comment marker can\'t be empty!')
+
+    chunks = iter(lambda: source.read(chunk_size), '') if hasattr(source, 'read') else source
 
-            out += string[i]
+    buf = ''
+    commented = False
 
-        elif string[i:len(end_comment) + i] == end_comment:
-            commented -= 1 if nested_comments else commented
+    for chunk in chunks:
+        buf += chunk
+        pos = 0
 
-            i += len(end_comment)
+        while True:
+            if not commented:
+                i = buf.find(comment_marker, pos)
 
-            continue
+                if i < 0:
+                    i = max(pos, len(buf) - len(comment_marker) + 1)
 
-        i += 1
+                    if i > pos:
+                        yield buf[pos:i]
 
-    return out
+                    buf = buf[i:]
+
+                    break
+
+                if i > pos:
+                    yield buf[pos:i]
+
+                commented = True
+                pos = i + 1
+
+            else:
+                j = buf.find(end_comment, pos)
+
+                if j < 0:
+                    buf = buf[max(pos, len(buf) - len(end_comment) + 1):]
+
+                    break
+
+                commented = False
+                pos = j + len(end_comment)
+
+    if not commented and len(buf) > 0:
+        yield buf
 
 
 def replace_ignored(string, **kw):
@@ -86,18 +662,60 @@ def replace_ignored(string, **kw):
     if ig is None:
         return string
 
-    if type(ig) is not str:
-        raise TypeError('I can ignore parts of string only using RegEx!')
+    return string[skipper(ig)(string, 0):]
+
+
+def no_skip(text, pos):
+    return pos
+
+
+def skipper(ignore):
+    # Returns a function skipping the ignored text from a position, built once for each pattern.
+    skip = SKIPPERS.get(ignore, None)
 
-    ig = pypeg.core.compile(ig)
+    if skip is None:
+        if type(ignore) not in {str, bytes}:
+            raise TypeError('I can ignore parts of string only using RegEx!')
 
-    while True:
-        a = ig.match(string)
+        skip = SKIPPERS[ignore] = make_skipper(ignore)
 
-        if not a:
-            return string
+    return skip
 
-        string = string[len(a.group(0)):]
+
+def make_skipper(ignore):
+    ig = pypeg.core.compile(ignore)
+
+    # Repeating the pattern inside the regex skips everything in one match.
+    try:
+        match = pypeg.core.compile(('(?:%s)*' if type(ignore) is str else b'(?:%s)*') % ignore).match
+
+    except pypeg.core.sre_constants.error:  # E.g. global flags, which have to stay at the start.
+        match = None
+
+    if match is not None:
+        return lambda text, pos: match(text, pos).end()
+
+    def skip(text, pos):
+        while True:
+            a = ig.match(text, pos)
+
+            if not a or a.end() == pos:
+                return pos
+
+            pos = a.end()
+
+    return skip
+
+
+def starts_with(text, value, pos):
+    if type(text) is mmap:  # Has no `startswith`, but can look for the value within bounds.
+        return text.find(value, pos, pos + len(value)) == pos
+
+    return text.startswith(value, pos)
+
+
+def newline(text):
+    return '\n' if type(text) is str else b'\n'
 
 
 def check_whole(string, **kw):
@@ -118,13 +736,51 @@ def static_vars(**attrs):
     return __dec__
 
 
+def slot_names(cls):
+    names = []
+
+    for c in reversed(cls.__mro__):
+        for x in getattr(c, '__slots__', ()):
+            if x not in names:
+                names.append(x)
+
+    return names
+
+
 def recursive_reverse(lst):
     return [recursive_reverse(x) if type(x) is list else x for x in lst[::-1]]
 
 
+def fold(lst, c, left):
+    # Groups the items by `c` until there's only one, starting from the left or from the right - the same as repeating
+    # `[lst[:c]] + lst[c:]` (on the recursively reversed list for the right), without copying the list every time.
+    if len(lst) <= 1:
+        return lst
+
+    if left:
+        out = lst[:c]
+        i = c
+
+        while i < len(lst):
+            out = [out] + lst[i:i + c - 1]
+            i += c - 1
+
+    else:
+        i = len(lst) - c
+        out = lst[max(i, 0):]
+
+        while i > 0:
+            out = lst[max(i - c + 1, 0):i] + [out]
+            i -= c - 1
+
+    return [out]
+
+
 # Functions to help constructing grammar.
 
 def singleton(cls):
+    cls.__reduce__ = lambda self: self.__name__  # Pickled by name, so that there's still just the one.
+
     obj = cls()
     obj.__name__ = cls.__name__
 
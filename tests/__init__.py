@@ -0,0 +1,34 @@
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+# Helpers and grammars the tests share.
+
+
+def outcome(fn, *args, **kw):
+    # The result of a parse, or its error message - to compare two ways of parsing the same input.
+    try:
+        return fn(*args, **kw)
+
+    except ParseError as e:
+        return str(e)
+
+
+def json():
+    value = ptr()
+
+    string = r(r'"(?:[^"\\]|\\.)*"')
+    number = r(r'-?(?:0|[1-9]\d*)(?:\.\d+)?')
+
+    member = (string == 'key') + s(':').spr() + value
+
+    obj = (s('{').spr() + delim_lst(member, s(',').spr(), extra_comma=0) + s('}').spr()) == 'object'
+    arr = (s('[').spr() + delim_lst(value, s(',').spr(), extra_comma=0) + s(']').spr()) == 'array'
+
+    value &= obj | arr | string | number | s('true') | s('false') | s('null')
+
+    return value
@@ -0,0 +1,90 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from pypeg import *
+from pypeg import parse_async
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+async def chunks(*xs):
+    for x in xs:
+        yield x
+
+
+def items():
+    return delim_lst(r(r'\w+') == 'item', s(',').spr(), extra_comma=0)
+
+
+class AsyncTest(IsolatedAsyncioTestCase):
+    async def test_same_as_parse(self):
+        text = 'ab, c,de ,f  '
+
+        for el in [items(), s('a') | r('[a-z, ]+')]:
+            self.assertEqual(await parse_async(el, chunks(text[:3], text[3:8], text[8:]), ignore=' '),
+                             el.parse(text, ignore=' '))
+
+    async def test_rest(self):
+        # The ignored text after the repetitions stays in the rest, as in `parse`.
+        el = s('a')[0:]
+
+        self.assertEqual(await parse_async(el, chunks(' '), ignore=' '), el.parse(' ', ignore=' '))
+        self.assertEqual(await parse_async(el, chunks('a a', ' a  '), ignore=' '), ('  ', ['a', 'a', 'a']))
+
+    async def test_stream_reader(self):
+        reader = asyncio.StreamReader()
+        reader.feed_data('ab,čd'.encode('utf-8')[:4])
+        reader.feed_data('ab,čd'.encode('utf-8')[4:])
+        reader.feed_eof()
+
+        self.assertEqual(await parse_async(items(), reader, encoding='utf-8', chunk_size=2),
+                         ('', [('item', ['ab']), ('item', ['čd'])]))
+
+    async def test_error(self):
+        with self.assertRaises(ParseError):
+            await parse_async(items(), chunks('ab,', '?'))
+
+    async def test_paced(self):
+        # The other tasks run while the input gets parsed.
+        turns = []
+
+        async def count():
+            while True:
+                turns.append(None)
+
+                await asyncio.sleep(0)
+
+        counter = asyncio.create_task(count())
+
+        text = ','.join(['ab'] * 2000)
+
+        self.assertEqual(await parse_async(items(), chunks(text), steps=10), items().parse(text))
+        self.assertGreater(len(turns), 10)
+
+        counter.cancel()
+
+    async def test_cancelled(self):
+        # A parse waiting for the input stops when it's cancelled.
+        started = asyncio.Event()
+
+        async def endless():
+            yield 'ab,'
+
+            started.set()
+
+            await asyncio.Event().wait()
+
+            yield 'cd'
+
+        task = asyncio.create_task(parse_async(items(), endless()))
+
+        await started.wait()
+        await asyncio.sleep(0.01)
+
+        task.cancel()
+
+        with self.assertRaises(asyncio.CancelledError):
+            await asyncio.wait_for(task, 5)
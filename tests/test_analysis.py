@@ -0,0 +1,185 @@
+import random
+import re
+from unittest import TestCase, mock
+
+from pypeg import *
+from pypeg.analysis import FirstDispatch, accepts, regex_first
+from tests import outcome
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+CHARS = 'abcxyzABCXYZ019 _-#\n\tčŽ'
+
+
+def whole(el, *texts):
+    return any([el.test(x) and el.parse(x)[0] == '' for x in texts])
+
+
+class Blind(FirstDispatch):
+    # Dispatch which doesn't rule out any alternative.
+    def __init__(self, xs):
+        super(Blind, self).__init__(xs)
+
+        self.useful = False
+
+
+class RegexFirstTest(TestCase):
+    def assertSound(self, pattern, chars=CHARS):
+        # No character the regex can start with gets ruled out.
+        pattern = re.compile(pattern)
+        first = regex_first(pattern)
+
+        for c in chars:
+            for text in [c, c + c, c + 'b', c + 'ab']:
+                if pattern.match(text) is not None:
+                    self.assertTrue(accepts(first, text[:1]), (pattern, text))
+
+        return first
+
+    def assertRules(self, pattern, allowed, ruled_out):
+        first = self.assertSound(pattern)
+
+        self.assertIsNotNone(first)
+
+        for c in allowed:
+            self.assertTrue(accepts(first, c), (pattern, c))
+
+        for c in ruled_out:
+            self.assertFalse(accepts(first, c), (pattern, c))
+
+    def test_inline_flags(self):
+        self.assertRules('(?i)ab', 'aA', 'bB')
+        self.assertRules('(?x) a b', 'a', ' b')
+        self.assertRules('(?s).', 'a\n', '')
+        self.assertRules('.', 'a', '\n')
+        self.assertRules('(?a)\\w', 'a_1', 'č ')
+        self.assertRules('(?m)$a', 'a', 'b')
+
+        self.assertIsNone(self.assertSound('(?i:a)b'))  # Local flags aren't followed.
+
+    def test_ignorecase(self):
+        self.assertRules(re.compile('[a-c]x', re.IGNORECASE), 'aBc', 'xd')
+        self.assertRules(re.compile('[^a]', re.IGNORECASE), 'bX', 'aA')
+        self.assertRules(re.compile('ž', re.IGNORECASE), 'žŽ', 'z')
+
+    def test_branches(self):
+        self.assertRules('ab|c', 'ac', 'b')
+        self.assertRules('(?:ab|c)?d', 'acd', 'b')
+        self.assertRules('(?>a|b)c', 'ab', 'c')
+
+        for pattern in ['a|', '|b', 'a?', 'a*', '(?:a|b?)c?', 'a{0}']:
+            first = self.assertSound(pattern)
+
+            self.assertTrue(first[2], pattern)  # It can match nothing, so it can't rule anything out.
+            self.assertTrue(all([accepts(first, c) for c in CHARS]), pattern)
+
+    def test_zero_width(self):
+        self.assertRules('(?=a)b', 'b', 'c')  # Never matches with `a`, still `b` being what it starts with is sound.
+        self.assertRules('(?!a).', 'ab', '\n')
+        self.assertRules('\\bx', 'x', 'y')
+        self.assertRules('^a', 'a', 'b')
+
+        for pattern in ['(?=a)', '(?<=a)b?', '\\b', '$']:
+            first = self.assertSound(pattern)
+
+            self.assertTrue(all([accepts(first, c) for c in CHARS]), pattern)
+
+    def test_classes(self):
+        self.assertRules('[^a-c]', 'xz\n', 'abc')
+        self.assertRules('[^\\d]', 'a ', '019')
+        self.assertRules('\\D', 'a ', '019')
+        self.assertRules('\\S+', 'aČ', ' \n\t')
+        self.assertRules('\\W', ' -#', 'a_1')
+        self.assertRules('[\\w-]', 'a_-1', ' #')
+        self.assertRules('[^\\s\\d]', 'a#', ' 1')
+        self.assertRules('x*y', 'xy', 'z')
+
+        self.assertIsNone(self.assertSound('(a)?(?(1)b|c)'))  # Depends on a group, unknown.
+
+    def test_bytes(self):
+        everything = [bytes([i]) for i in range(256)]
+
+        for pattern in [rb'[a-c]', rb'\xff', rb'(?i)x', rb'[^a]', rb'\d', rb'\W', rb'a|']:
+            compiled = re.compile(pattern)
+            first = regex_first(compiled)
+
+            self.assertIsNotNone(first, pattern)
+
+            for c in everything:
+                if compiled.match(c) is not None:
+                    self.assertTrue(accepts(first, c), (pattern, c))
+
+        first = regex_first(re.compile(rb'[a-c]'))
+
+        self.assertFalse(accepts(first, b'd'))
+        self.assertFalse(accepts(first, b'\xe1'))  # Not `á` in latin-1.
+
+
+class DispatchTest(TestCase):
+    def test_candidates(self):
+        dispatch = FirstDispatch([s('a'), r('[0-9]+'), r('x?') + s('y'), s('a') + s('b')])
+
+        self.assertEqual(dispatch.candidates('a'), (0, 3))
+        self.assertEqual(dispatch.candidates('5'), (1,))
+        self.assertEqual(dispatch.candidates('x'), (2,))
+        self.assertEqual(dispatch.candidates('y'), (2,))
+        self.assertEqual(dispatch.candidates('-'), ())
+
+        # With the ignored text skipped the alternatives starting with either character are candidates.
+        self.assertEqual(dispatch.candidates(' ', 'a'), (0, 3))
+        self.assertEqual(dispatch.candidates('5', 'a'), (0, 1, 3))
+
+        # At the end of the input only the alternatives which can match nothing are.
+        self.assertEqual(dispatch.candidates(''), ())
+        self.assertEqual(FirstDispatch([s('a'), r('b*'), optional(s('c'))]).candidates(''), (1, 2))
+
+    def test_unknown(self):
+        dispatch = FirstDispatch([s('a'), debugged(s('b'))])
+
+        self.assertEqual(dispatch.candidates('c'), (1,))
+        self.assertFalse(FirstDispatch([debugged(s('a')), r('a?')]).useful)
+
+    def test_same_results(self):
+        # Picking the alternatives by FIRST sets doesn't change what an ordered choice gives, errors included.
+        random.seed(0)
+
+        def grammar():
+            word = r('[a-z]+')
+            num = r('[0-9]+')
+
+            return (num + s('.') + num | num | s('-') + num | word + s('(') + word + s(')') | word | s('()') |
+                    optional(s('!')) + s('?'))
+
+        el = grammar()
+
+        with mock.patch('pypeg.core.FirstDispatch', Blind):
+            tried = grammar()
+
+            tried.test('')  # Makes its dispatch while `Blind`.
+
+        for _ in range(300):
+            text = ''.join([random.choice('ab19.-()!? ') for _ in range(random.randint(0, 6))])
+
+            for kw in [{}, {'ignore': ' '}]:
+                self.assertEqual(outcome(el.parse, text, **kw), outcome(tried.parse, text, **kw), (text, kw))
+                self.assertEqual(outcome(el[0:].parse, text, **kw), outcome(tried[0:].parse, text, **kw), (text, kw))
+
+    def test_repointed(self):
+        # The alternatives picked by the FIRST sets follow a pointer pointed elsewhere after a parse.
+        for make in [lambda p: p | s('x') | s('y'), lambda p: p ^ s('x') ^ s('y'),
+                     lambda p: expr(r('[0-9]'), [(p, 2, 0), (s('x') | s('y'), 2, 0)])]:
+            p = ptr()
+            p &= s('a')
+
+            el = make(p)
+
+            self.assertTrue(whole(el, 'a', '1a2'))
+
+            p &= s('b')
+
+            self.assertTrue(whole(el, 'b', '1b2'))
+            self.assertFalse(whole(el, 'a', '1a2'))
@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+from pypeg import *
+from pypeg import parse_many
+from pypeg.utils import FatalParseError
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+def pairs():
+    # Built in the workers, `apply` with a lambda doesn't pickle.
+    pair = (r('[a-z]+') + s('=').spr() + r('[0-9]+') // (lambda x: int(x))) == 'pair'
+
+    return delim_lst(pair, s(',').spr(), extra_comma=0)
+
+
+def error(el, text):
+    try:
+        el.parse(text)
+
+    except ParseError as e:
+        return e
+
+
+TEXTS = ['a=1,b=2', 'c=3', '', 'd=4,e=5,f=6'] * 5
+BAD = ['a=1', 'b=', 'c=3']
+
+
+class BatchTest(TestCase):
+    def test_results(self):
+        expected = [pairs().parse(x) for x in TEXTS]
+
+        for workers in [1, 2]:
+            self.assertEqual(list(parse_many(pairs, TEXTS, workers=workers, chunk_size=3)), expected)
+
+    def test_unordered(self):
+        expected = list(enumerate([pairs().parse(x) for x in TEXTS]))
+
+        for workers in [1, 2]:
+            self.assertEqual(sorted(parse_many(pairs, TEXTS, workers=workers, ordered=False)), expected)
+
+    def test_grammar(self):
+        el = r('[a-z]+')[1:] == 'words'
+
+        self.assertEqual(list(parse_many(el, ['ab', 'cd'], workers=2)), [el.parse('ab'), el.parse('cd')])
+
+    def test_errors(self):
+        message = str(error(pairs(), 'b='))
+
+        for workers in [1, 2]:
+            with self.assertRaises(ParseError):
+                list(parse_many(pairs, BAD, workers=workers))
+
+            results = list(parse_many(pairs, BAD, workers=workers, errors='return'))
+
+            self.assertEqual(results[0], pairs().parse('a=1'))
+            self.assertIsInstance(results[1], ParseError)
+            self.assertEqual(str(results[1]), message)
+            self.assertEqual(results[2], pairs().parse('c=3'))
+
+    def test_fatal(self):
+        el = s('a') + cut + s('b')
+
+        for workers in [1, 2]:
+            with self.assertRaises(FatalParseError):
+                list(parse_many(el, ['ab', 'ac'], workers=workers))
+
+    def test_arguments(self):
+        # Rejected right away, not once the results are asked for.
+        with self.assertRaises(ValueError):
+            parse_many(pairs, TEXTS, errors='ignore')
+
+        with self.assertRaises(ValueError):
+            parse_many(pairs, TEXTS, workers=0)
@@ -0,0 +1,115 @@
+import mmap
+import tempfile
+from unittest import TestCase, mock
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+def pairs():
+    pair = (r(rb'[a-z]+') + s(b'=').spr() + r(rb'[0-9]+')) == 'pair'
+
+    return delim_lst(pair, s(b',').spr(), extra_comma=0)
+
+
+DATA = b'ab = 1,\ncd=22'
+RESULT = [('pair', [b'ab', b'1']), ('pair', [b'cd', b'22'])]
+
+
+class BinaryTest(TestCase):
+    def test_bytes(self):
+        self.assertEqual(pairs().parse(DATA, ignore=rb'\s+'), (b'', RESULT))
+        self.assertEqual(pairs().compile().parse(DATA, ignore=rb'\s+'), (b'', RESULT))
+
+    def test_bytearray(self):
+        self.assertEqual(pairs().parse(bytearray(DATA), ignore=rb'\s+')[1], RESULT)
+        self.assertEqual(pairs().compile().parse(bytearray(DATA), ignore=rb'\s+')[1], RESULT)
+
+        # The literals are looked up by slices of the input, which have to be hashable.
+        el = s(b'ab') | s(b'ac') | s(b'ad') | s(b'a')
+
+        self.assertEqual(el.parse(bytearray(b'ad'))[1], [b'ad'])
+
+    def test_mmap(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(DATA)
+            f.flush()
+
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            try:
+                self.assertEqual(pairs().parse(m, ignore=rb'\s+')[1], RESULT)
+
+                with self.assertRaises(ParseError) as e:
+                    pairs().parse_all(m)
+
+                self.assertEqual((e.exception.line, e.exception.column), (1, 3))
+                self.assertEqual(e.exception.expected_names(), ["b'='"])
+
+            finally:
+                m.close()
+
+    def test_mmap_line(self):
+        # The lines before an error deep in a mapped file are counted a slice at a time, across their boundaries too.
+        data = b'ab=1,\n' * 40 + b'cd=\n'
+
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.flush()
+
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            try:
+                for chunk in [1, 5, 6, 7, 2 ** 20]:
+                    with mock.patch('pypeg.utils.MMAP_CHUNK', chunk):
+                        with self.assertRaises(ParseError) as e:
+                            pairs().parse_all(m, ignore=rb'\s+')
+
+                        self.assertEqual((e.exception.line, e.exception.column), (42, 1))
+
+            finally:
+                m.close()
+
+    def test_mixed(self):
+        with self.assertRaises(TypeError):
+            pairs().parse('ab=1')
+
+        with self.assertRaises(ParseError):
+            pairs().parse(['ab=1'])
+
+    def test_mismatch(self):
+        # Refused before matching, rather than failing at the first literal or passing for a syntax error.
+        for el, text in [(s('a'), b'a'), (s('a') | s('b'), b'ab'), (s(b'a'), 'a'), (r('[a-z]+'), bytearray(b'ab'))]:
+            with self.assertRaises(TypeError) as e:
+                el.parse(text)
+
+            self.assertIn('can\'t parse', str(e.exception))
+
+        with self.assertRaises(TypeError):
+            pairs().compile().parse('ab=1')
+
+        with self.assertRaises(TypeError):
+            Document(pairs(), 'ab=1')
+
+        with self.assertRaises(TypeError):
+            list(s(b'a')[0:].iterparse('aa'))
+
+        with self.assertRaises(TypeError):
+            Lexer([r('[a-z]+')]).grammar(r('[a-z]+')).parse(b'a')
+
+        # The grammar is looked at again after a pointer gets pointed elsewhere.
+        p = ptr()
+        p &= s('a')
+
+        self.assertEqual(p.parse('a')[1], ['a'])
+
+        p &= s(b'a')
+
+        self.assertEqual(p.parse(b'a')[1], [b'a'])
+
+        with self.assertRaises(TypeError):
+            p.parse('a')
@@ -0,0 +1,112 @@
+import os
+import pickle
+import shutil
+import tempfile
+from unittest import TestCase, mock
+
+from pypeg import *
+from pypeg import cache
+from pypeg.utils import CACHES, slot_names
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+def pairs():
+    value = ptr()
+
+    pair = (r('[a-z]+') == 'key') + s('=').spr() + value
+    value &= r('[0-9]+') | s('(').spr() + delim_lst(pair, s(',').spr(), extra_comma=0) + s(')').spr()
+
+    return value
+
+
+TEXT = '(a=1,b=(c=2))'
+
+
+class CacheTest(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'grammar.pickle')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_caches_left_out(self):
+        # What the elements cached while parsing doesn't get saved.
+        el = pairs()
+        size = len(pickle.dumps(el))
+
+        el.parse(TEXT, packrat=True)
+        el.parse_tree(TEXT)
+
+        self.assertEqual(len(pickle.dumps(el)), size)
+
+        cache.save(el, self.path)
+        loaded = cache.load(self.path)
+
+        for x in loaded.walk():
+            for name in slot_names(type(x)):
+                if name in CACHES:
+                    self.assertFalse(getattr(x, name, None), name)
+
+        self.assertEqual(loaded.parse(TEXT, packrat=True), el.parse(TEXT))
+        self.assertEqual(repr(loaded.parse_tree(TEXT)), repr(el.parse_tree(TEXT)))
+
+    def test_fingerprint(self):
+        self.assertEqual(cache.fingerprint(pairs()), cache.fingerprint(pairs()))
+
+        el = pairs()
+        el.parse(TEXT, packrat=True)
+
+        self.assertEqual(cache.fingerprint(el), cache.fingerprint(pairs()))
+
+        # Any change to the structure makes another one.
+        changed = pairs()
+        changed.el.xs[0] = r('[0-9]')
+
+        self.assertNotEqual(cache.fingerprint(changed), cache.fingerprint(pairs()))
+        self.assertNotEqual(cache.fingerprint(s('a') + s('b')), cache.fingerprint(s('b') + s('a')))
+
+    def test_key(self):
+        cache.save(pairs(), self.path)
+
+        self.assertIsNotNone(cache.load(self.path, cache.fingerprint(pairs())))
+        self.assertIsNone(cache.load(self.path, 'another'))
+        self.assertIsNone(cache.load(os.path.join(self.dir, 'missing')))
+
+    def test_stale(self):
+        # A file saved by another build of pypeg doesn't get loaded.
+        cache.save(pairs(), self.path)
+
+        with mock.patch.object(cache, 'sources_key', return_value='another build'):
+            self.assertIsNone(cache.load(self.path))
+
+        self.assertIsNotNone(cache.load(self.path))
+
+    def test_cached(self):
+        built = []
+
+        def factory():
+            built.append(None)
+
+            return pairs()
+
+        first = cache.cached(factory, self.path)
+        second = cache.cached(factory, self.path)
+
+        self.assertEqual(len(built), 1)
+        self.assertEqual(second.parse(TEXT), first.parse(TEXT))
+
+    def test_cycles(self):
+        # The pointers come back pointing at their loaded targets.
+        cache.save(pairs(), self.path)
+
+        loaded = cache.load(self.path)
+
+        self.assertIs(type(loaded), ptr)
+        self.assertTrue(any([y is loaded for x in loaded.walk() for y in x.children()]))
+        self.assertEqual(loaded.parse(TEXT), pairs().parse(TEXT))
+        self.assertEqual(loaded.parse('(a=(b=(c=(d=1))))'), pairs().parse('(a=(b=(c=(d=1))))'))
@@ -0,0 +1,85 @@
+import io
+import random
+from unittest import TestCase
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+def scanned(string, comment_marker, end_comment='\n'):
+    # Character by character, as `trim_comments` used to go.
+    out = ''
+    commented = False
+
+    i = 0
+
+    while i < len(string):
+        if not commented:
+            if string[i:len(comment_marker) + i] == comment_marker:
+                commented = True
+
+                i += 1
+
+                continue
+
+            out += string[i]
+
+        elif string[i:len(end_comment) + i] == end_comment:
+            commented = False
+
+            i += len(end_comment)
+
+            continue
+
+        i += 1
+
+    return out
+
+
+def random_text(marker, end):
+    return ''.join([random.choice(['a', ' ', '\n', '#', '/', '*', '-', marker, end])
+                    for _ in range(random.randint(0, 40))])
+
+
+MARKERS = [('#', '\n'), ('//', '\n'), ('/*', '*/'), ('--', '--')]
+
+
+class CommentsTest(TestCase):
+    def test_trim(self):
+        self.assertEqual(trim_comments('a # b\nc #d', '#'), 'a c ')
+        self.assertEqual(trim_comments('a /* b */ c', '/*', end_comment='*/'), 'a  c')
+
+        random.seed(0)
+
+        for marker, end in MARKERS:
+            for _ in range(50):
+                text = random_text(marker, end)
+
+                self.assertEqual(trim_comments(text, marker, end_comment=end), scanned(text, marker, end), text)
+
+    def test_streamed(self):
+        # Same as trimming all of it, wherever the chunks split the markers.
+        random.seed(0)
+
+        for marker, end in MARKERS:
+            for _ in range(50):
+                text = random_text(marker, end)
+
+                expected = trim_comments(text, marker, end_comment=end)
+
+                for size in [1, 2, 3, 5, 64]:
+                    out = ''.join(iter_trim_comments(io.StringIO(text), marker, end_comment=end, chunk_size=size))
+
+                    self.assertEqual(out, expected, (text, marker, end, size))
+
+                chunks = [text[i:i + 2] for i in range(0, len(text), 2)]
+
+                self.assertEqual(''.join(iter_trim_comments(iter(chunks), marker, end_comment=end)), expected)
+
+    def test_empty_marker(self):
+        with self.assertRaises(ValueError):
+            list(iter_trim_comments(iter(['a']), ''))
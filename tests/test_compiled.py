@@ -0,0 +1,73 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, mock
+
+from pypeg import *
+from pypeg.compiler import Compiler
+from tests import json, outcome
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+def arithmetic():
+    return expr(r(r'\d+'), [(s('-'), 1, 0), (s('^'), 2, 1), (s('*') | s('/'), 2, 0), (s('+') | s('-'), 2, 0)])
+
+
+def sums():
+    exp = ptr()
+    exp &= g(exp + s('+').spr() + r(r'\d+')) | r(r'\d+')
+
+    return exp
+
+
+class CompiledTest(TestCase):
+    def assertSame(self, el, texts, **kw):
+        fast = el.compile()
+
+        for text in texts:
+            self.assertEqual(outcome(fast.parse, text, **kw), outcome(el.parse, text, **kw), text)
+
+    def test_json(self):
+        texts = ['{"a": [1, 2.5, {"b": "c\\"d"}], "e": [true, false, null]}', '[1, 2', '{"a" 1}', '[]', ' [1 ] ']
+
+        self.assertSame(json(), texts, ignore=r'\s+')
+        self.assertSame(json(), [x.replace(' ', '') for x in texts])
+
+    def test_expr(self):
+        random.seed(0)
+
+        texts = ['1+2*3^4^5-6/7', '-(1+2)*-3', '1+', '((1)', '']
+        texts += ['{}{}{}*{}-({}+-{})'.format(*[random.randint(0, 9) for _ in range(6)]) for _ in range(20)]
+
+        self.assertSame(arithmetic(), texts)
+        self.assertSame(arithmetic(), [' '.join(x) for x in texts], ignore=' ')
+
+    def test_expr_climbs(self):
+        # The compiled `expr` climbs the precedence levels, the grammar of the elements isn't lowered at all.
+        el = arithmetic()
+        lower = Compiler.lower
+
+        with mock.patch.object(Compiler, 'lower', autospec=True, side_effect=lower) as lowered:
+            self.assertEqual(el.compile().parse('(1+2)*3'), el.parse('(1+2)*3'))
+
+        self.assertNotIn(id(el.expr), [id(x.args[1]) for x in lowered.call_args_list])
+
+    def test_elements(self):
+        el = (+(s('a') + r('[bc]')) == 'x') + (~s('d') + u(r('[a-z]'))[1:3] >> 'x').opt() + (s('e') ^ s('ef'))
+
+        self.assertSame(el, ['abef', 'acef', 'abe', 'abxe', 'ab'])
+        self.assertSame(delim_lst(s('a'), s(','), req_one=True), ['a,a,', 'a', '', ',a'])
+
+    def test_left_recursion(self):
+        self.assertSame(sums(), ['1+2+3', '1', '1+', '+1'])
+
+    def test_threads(self):
+        # The seeds of the left recursion are kept apart for the parses running at the same time.
+        el = sums().compile()
+        texts = ['+'.join([str(i)] * (i % 50 + 1)) for i in range(200)]
+
+        with ThreadPoolExecutor(4) as pool:
+            self.assertEqual(list(pool.map(el.parse, texts)), [sums().parse(x) for x in texts])
@@ -0,0 +1,76 @@
+from unittest import TestCase
+
+from pypeg import *
+from pypeg.utils import ParseContext
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+class option(ParserElement):
+    # Matches nothing, keeping the context it was matched with.
+    __slots__ = ['seen']
+
+    def __init__(self):
+        super(option, self).__init__('')
+
+        self.seen = []
+
+    def match(self, text, pos, ctx):
+        self.seen.append(ctx)
+
+        return pos, []
+
+
+class ContextTest(TestCase):
+    def test_partial(self):
+        ctx = ParseContext('ab')
+
+        self.assertFalse(ctx.not_whole)
+        self.assertTrue(ctx.partial.not_whole)
+        self.assertIs(ctx.partial.partial, ctx.partial)
+        self.assertIs(ctx.partial.recursion, ctx.recursion)
+
+        ctx = ParseContext('ab', not_whole=True)
+
+        self.assertIs(ctx.partial, ctx)
+
+    def test_options(self):
+        ctx = ParseContext('a b', ignore=r'\s+', foo=1)
+
+        self.assertEqual(ctx.options, {'foo': 1})
+        self.assertEqual(ctx.kw(), {'foo': 1, 'ignore': r'\s+'})
+        self.assertEqual(ctx.partial.kw(), {'foo': 1, 'ignore': r'\s+', 'not_whole': True})
+
+    def test_is_whole(self):
+        ctx = ParseContext('a  ', ignore=r'\s+')
+
+        self.assertTrue(ctx.is_whole('a  ', 1))
+        self.assertFalse(ParseContext('ab').is_whole('ab', 1))
+
+    def test_passed_by_reference(self):
+        x, y = option(), option()
+
+        (s('a') + x + s('b') + y).parse('ab', foo=1)
+
+        self.assertIs(x.seen[0], y.seen[0])
+        self.assertTrue(x.seen[0].not_whole)
+        self.assertEqual(x.seen[0].options, {'foo': 1})
+
+    def test_keyword_api(self):
+        # Elements written against the keyword API still get the options as keyword arguments.
+        seen = []
+
+        el = debugged(s('a'), lambda e, string, **kw: seen.append(kw), lambda e, string, **kw: None)
+        el.parse('a', foo=1)
+
+        self.assertEqual(seen, [{'foo': 1}])
+
+    def test_ignore(self):
+        el = s('a') + s('b')
+
+        # The ignored text after the match stays in the rest.
+        self.assertEqual(el.parse(' a  b ', ignore=r'\s+'), (' ', ['a', 'b']))
+        self.assertFalse(el.test('a b'))
@@ -0,0 +1,58 @@
+import pickle
+from unittest import TestCase
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+def error(fn):
+    try:
+        fn()
+
+    except ParseError as e:
+        return e
+
+    raise AssertionError('No error raised!')
+
+
+name = r('[a-z]+')
+
+
+class ErrorTest(TestCase):
+    def test_position(self):
+        e = error(lambda: (s('a') + s('b'))[1:].parse('ab\nab\naxb', ignore=r'\s+'))
+
+        self.assertEqual((e.offset, e.line, e.column), (7, 3, 2))
+        self.assertEqual(e.expected_names(), ["'b'"])
+        self.assertEqual(str(e), 'Syntax error at line 3, column 2, expected \'b\':\n    axb\n     ^')
+
+    def test_ruled_out_alternatives(self):
+        # The alternatives the FIRST sets rule out are expected by the terminals they start with.
+        el = s('if') + name + s('then') | s('while') + name + s('do') | (s('x') == 'x')[2:] | s('print') + name
+
+        for fn in [lambda: el.parse('?'), lambda: el.parse_events('?', Handler())]:
+            self.assertEqual(error(fn).expected_names(), ["'if'", "'while'", "'x'", "'print'"])
+
+    def test_args(self):
+        # The text isn't kept in the arguments, nor pickled.
+        text = 'ab' * 1000 + '?' + 'ab' * 1000
+
+        e = error(lambda: (s('a') + s('b'))[1:].parse_all(text))
+
+        self.assertNotIn(text, repr(e))
+        self.assertLess(len(pickle.dumps(e)), 500)
+
+        loaded = pickle.loads(pickle.dumps(e))
+
+        self.assertEqual(str(loaded), str(e))
+        self.assertEqual((loaded.offset, loaded.line, loaded.column), (e.offset, e.line, e.column))
+
+    def test_message(self):
+        e = pickle.loads(pickle.dumps(ParseError('Oops!')))
+
+        self.assertEqual(str(e), 'Oops!')
+        self.assertIsNone(e.line)
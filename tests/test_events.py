@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+class Log(Handler):
+    def __init__(self):
+        self.events = []
+
+    def enter(self, name, pos):
+        self.events.append(('enter', name, pos))
+
+    def token(self, start, end):
+        self.events.append(('token', start, end))
+
+    def exit(self, name, start, end):
+        self.events.append(('exit', name, start, end))
+
+
+class EventsTest(TestCase):
+    def test_events(self):
+        key = r('[a-z]+') == 'key'
+        value = r('[0-9]+') == 'value'
+
+        el = (key + s('=').spr() + value) == 'pair'
+
+        self.assertEqual(el.parse_events('ab = 1', Log(), ignore=r'\s+').events, [
+            ('enter', 'pair', 0), ('enter', 'key', 0), ('token', 0, 2), ('exit', 'key', 0, 2), ('token', 3, 4),
+            ('enter', 'value', 4), ('token', 5, 6), ('exit', 'value', 5, 6), ('exit', 'pair', 0, 6),
+        ])
+
+    def test_backtracking(self):
+        # The events of the alternative which failed get dropped.
+        el = (s('a') == 'x') + s('b') | (s('a') == 'y') + s('c')
+
+        self.assertEqual(el.parse_events('ac', Log()).events, [
+            ('enter', 'y', 0), ('token', 0, 1), ('exit', 'y', 0, 1), ('token', 1, 2),
+        ])
+
+    def test_longest(self):
+        el = (s('a') == 'x') ^ (s('a') + s('b') == 'y')
+
+        self.assertEqual(el.parse_events('ab', Log()).events, [
+            ('enter', 'y', 0), ('token', 0, 1), ('token', 1, 2), ('exit', 'y', 0, 2),
+        ])
+
+    def test_error(self):
+        with self.assertRaises(ParseError):
+            ((s('a') == 'x') + s('b')).parse_events('ac', Log())
+
+    def test_left_recursion(self):
+        el = ptr()
+        el &= el + s('a') | s('a')
+
+        with self.assertRaises(TypeError):
+            el.parse_events('aa', Log())
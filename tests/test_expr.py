@@ -0,0 +1,85 @@
+import random
+from unittest import TestCase
+
+from pypeg import *
+from tests import outcome
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+def arithmetic(engine=True):
+    el = expr(r(r'\d+'), [(s('-'), 1, 0), (s('^'), 2, 1), (s('*') | s('/'), 2, 0), (s('+') | s('-'), 2, 0)])
+
+    for x in el.walk():
+        if type(x) is expr:
+            x.engine = engine
+
+    return el
+
+
+def random_expression(depth):
+    if depth == 0 or random.random() < 0.3:
+        return str(random.randint(0, 99))
+
+    x = random.random()
+
+    if x < 0.1:
+        return '-' + random_expression(depth - 1)
+
+    elif x < 0.2:
+        return '(' + random_expression(depth - 1) + ')'
+
+    return random_expression(depth - 1) + random.choice('^*/+-') + random_expression(depth - 1)
+
+
+class ExprTest(TestCase):
+    def test_precedence(self):
+        self.assertEqual(arithmetic().parse('1+2*3'), ('', [['1', '+', ['2', '*', '3']]]))
+
+    def test_left_associative(self):
+        self.assertEqual(arithmetic().parse('1+2+3'), ('', [[['1', '+', '2'], '+', '3']]))
+
+    def test_right_associative(self):
+        self.assertEqual(arithmetic().parse('2^3^4'), ('', [['2', '^', ['3', '^', '4']]]))
+
+    def test_parentheses(self):
+        self.assertEqual(arithmetic().parse('(1+2)*3'), ('', [[['1', '+', '2'], '*', '3']]))
+
+    def test_unary(self):
+        self.assertEqual(arithmetic().parse('1*-2'), ('', [['1', '*', ['-', '2']]]))
+        self.assertEqual(arithmetic().parse('--1'), ('', [['-', ['-', '1']]]))
+
+    def test_rest(self):
+        # An `expr` doesn't check for the end of input.
+        self.assertEqual(arithmetic().parse('1+(2'), ('+(2', ['1']))
+
+    def test_same_as_grammar(self):
+        # Climbing gives what the grammar built out of the elements does, errors included.
+        random.seed(0)
+
+        climbed, grammar = arithmetic(), arithmetic(engine=False)
+
+        for _ in range(300):
+            text = random_expression(5)
+
+            if random.random() < 0.2:
+                i = random.randrange(len(text) + 1)
+                text = text[:i] + random.choice('+*()x ') + text[i:]
+
+            for kw in ({}, {'ignore': r'\s+'}):
+                self.assertEqual(outcome(climbed.parse, text, **kw), outcome(grammar.parse, text, **kw), text)
+
+    def test_long_expression(self):
+        rest, a = arithmetic().parse('+'.join(['1'] * 5000))
+
+        self.assertEqual(rest, '')
+        self.assertEqual(len(a), 1)
+
+    def test_compiled_and_tree(self):
+        el = arithmetic()
+
+        self.assertEqual(el.compile().parse('1+2*3'), el.parse('1+2*3'))
+        self.assertEqual(el.parse_tree('1+2*3').end, 5)
@@ -0,0 +1,77 @@
+import random
+from unittest import TestCase
+
+from pypeg import *
+from tests import json, outcome
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+TEXT = '{"a": [1, 2, {"b": "c"}], "d": [true, false, null], "e": {"f": [3, 4]}}'
+
+
+class DocumentTest(TestCase):
+    def test_parse(self):
+        el = json()
+
+        self.assertEqual(Document(el, TEXT, ignore=r'\s+').parse(), el.parse(TEXT, ignore=r'\s+'))
+
+    def test_edit(self):
+        el = json()
+        doc = Document(el, TEXT, ignore=r'\s+')
+        doc.parse()
+
+        text = TEXT[:7] + '10' + TEXT[8:]
+
+        self.assertEqual(doc.edit(7, 1, '10'), el.parse(text, ignore=r'\s+'))
+        self.assertEqual(doc.text, text)
+        self.assertGreater(doc.hits, 0)
+
+    def test_random_edits(self):
+        # Every reparse gives what a full parse does, errors included.
+        random.seed(0)
+
+        el = json()
+        doc = Document(el, TEXT, ignore=r'\s+', max_edits=4)
+        doc.parse()
+
+        for _ in range(200):
+            offset = random.randrange(len(doc.text) + 1)
+            deleted = random.randint(0, min(2, len(doc.text) - offset))
+            inserted = ''.join([random.choice('0123456789 ,[]{}":ab') for _ in range(random.randint(0, 2))])
+
+            before = doc.text
+            text = before[:offset] + inserted + before[offset + deleted:]
+
+            self.assertEqual(outcome(doc.edit, offset, deleted, inserted),
+                             outcome(el.parse, text, ignore=r'\s+'), text)
+
+            if not el.test(text, ignore=r'\s+'):  # Undone, so that most of the edits are made to valid documents.
+                self.assertEqual(doc.edit(offset, len(inserted), before[offset:offset + deleted]),
+                                 el.parse(before, ignore=r'\s+'))
+
+    def test_negative_edit(self):
+        # The failure of `w` depends on all of the text its negative lookahead matched.
+        w = (~s('abc') + r('[a-z]+')) == 'w'
+        v = (s('ab') + r('[a-z]+')) == 'v'
+
+        doc = Document(w | v, 'abcx')
+
+        self.assertEqual(doc.parse(), ('', [('v', ['ab', 'cx'])]))
+        self.assertEqual(doc.edit(2, 1, 'd'), (w | v).parse('abdx'))
+
+    def test_edit_out_of_text(self):
+        doc = Document(json(), '[1]')
+
+        with self.assertRaises(ValueError):
+            doc.edit(2, 2, '')
+
+    def test_rejected(self):
+        with self.assertRaises(TypeError):
+            Document(json(), '[1]', events=Handler())
+
+        with self.assertRaises(ParseError):
+            Document(json(), None)
@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+def sums():
+    term = r(r'\d+')
+
+    exp = ptr()
+    exp &= g(exp + s('+').spr() + term) | term
+
+    return exp
+
+
+class LeftRecursionTest(TestCase):
+    def test_direct(self):
+        self.assertEqual(sums().parse('1+2+3'), ('', [[['1', '2'], '3']]))
+
+    def test_indirect(self):
+        term = r(r'\d+')
+
+        a, b = ptr(), ptr()
+        a &= g(b + s('-').spr() + term) | term
+        b &= a
+
+        self.assertEqual(a.parse('1-2-3'), ('', [[['1', '2'], '3']]))
+
+    def test_seed_alone(self):
+        self.assertEqual(sums().parse('7'), ('', ['7']))
+
+    def test_whole_input_checked_once(self):
+        self.assertEqual(sums().parse('1+2+', not_whole=True), ('+', [['1', '2']]))
+
+        with self.assertRaises(ParseError) as e:
+            sums().parse('1+2+')
+
+        self.assertEqual(e.exception.pos, 4)
+
+    def test_packrat(self):
+        self.assertEqual(sums().parse('1+2+3', packrat=True), ('', [[['1', '2'], '3']]))
+
+    def test_named(self):
+        term = r(r'\d+')
+
+        exp = ptr()
+        exp &= (g(exp + s('-').spr() + term) == 'sub') | term
+
+        self.assertEqual(exp.parse('5-2-1'), ('', [('sub', [[('sub', [['5', '2']]), '1']])]))
+
+    def test_long_input(self):
+        # Grown in a loop, not by recursing once per operator.
+        rest, a = sums().parse('+'.join(['1'] * 3000))
+
+        self.assertEqual(rest, '')
+        self.assertEqual(a[0][1], '1')
+
+    def test_events_rejected(self):
+        with self.assertRaises(TypeError):
+            sums().parse_events('1+2', Handler())
@@ -0,0 +1,40 @@
+from unittest import TestCase, mock
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+name, num = r('[a-z]+'), r('[0-9]+')
+
+
+class LexerTest(TestCase):
+    def test_grammar(self):
+        lx = Lexer([name, num, s('=')], ignore=r'\s+')
+        el = lx.grammar((name + s('=').spr() + num)[1:])
+
+        self.assertEqual(el.parse('a = 1  b=2'), ('', ['a', '1', 'b', '2']))
+        self.assertFalse(el.test('a = = 1'))
+
+    def test_packrat_at_many_positions(self):
+        # The token indices of one lexing aren't those of another, each gets a memo table of its own.
+        lx = Lexer([name, num], ignore=' ')
+        el = (lx.grammar(g(name + num) == 'item') + s('|'))[0:]
+
+        expected = ('', [('item', [['ab', '1']]), '|', ('item', [['cd', '2']]), '|'])
+
+        self.assertEqual(el.parse('ab 1|cd 2|'), expected)
+        self.assertEqual(el.parse('ab 1|cd 2|', packrat=True), expected)
+
+    def test_lexed_once(self):
+        # A lexed element repeated goes on with the tokens lexed for the first repetition.
+        lx = Lexer([name, num], ignore=' ')
+        el = lx.grammar(g(name + num) == 'item')[0:]
+
+        with mock.patch.object(Lexer, 'lex', autospec=True, side_effect=Lexer.lex) as lex:
+            self.assertEqual(el.parse('ab 1 cd 2 ef 3', packrat=True)[1],
+                             [('item', [['ab', '1']]), ('item', [['cd', '2']]), ('item', [['ef', '3']])])
+            self.assertEqual(lex.call_count, 1)
@@ -0,0 +1,52 @@
+import random
+from functools import reduce
+from operator import or_, xor
+from unittest import TestCase
+
+from pypeg import *
+from pypeg.utils import LiteralSet
+from tests import outcome
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+WORDS = ['in', 'if', 'int', 'import', 'i', 'for', 'from', 'fo', 'in']
+
+
+class LiteralSetTest(TestCase):
+    def test_index(self):
+        self.assertIsNotNone(LiteralSet([s(x) for x in WORDS]).index)
+        self.assertIsNone(LiteralSet([s('a'), s('b'), s('c')]).index)  # The FIRST sets tell them apart.
+        self.assertIsNone(LiteralSet([s('a'), s('ab'), s('ac'), r('a')]).index)
+
+    def test_same_as_trying_in_turn(self):
+        # The literals looked up give what trying them one by one does - the first one matching for a union, the
+        # longest one (the last of those as long) for `longest` - along with the same errors. Wrapped in `g`, they
+        # aren't literals any more.
+        random.seed(0)
+
+        for op in [or_, xor]:
+            found = reduce(op, [s(x) for x in WORDS])
+            tried = reduce(op, [g(s(x)) for x in WORDS])
+
+            self.assertIsNotNone(LiteralSet(found.xs).index)
+
+            for _ in range(300):
+                text = ''.join([random.choice('inftmpor ') for _ in range(random.randint(0, 5))])
+
+                for kw in [{}, {'ignore': ' '}]:
+                    self.assertEqual(outcome(found.parse, text, **kw), outcome(tried.parse, text, **kw), (text, kw))
+                    self.assertEqual(outcome(found[0:].parse, text, **kw), outcome(tried[0:].parse, text, **kw), (text, kw))
+
+    def test_ties(self):
+        union_ = reduce(or_, [s(x) for x in WORDS])
+        longest_ = reduce(xor, [s(x) for x in WORDS])
+
+        # `in` comes first, but leaves the rest of the input.
+        self.assertEqual(union_.parse('int'), ('', ['int']))
+        self.assertEqual((union_ + r('[a-z]')).parse('int'), ('', ['in', 't']))
+        self.assertEqual(longest_.parse(' import', ignore=' '), ('', ['import']))
+        self.assertFalse((longest_ + s('t')).test('int'))  # The longest one is taken, no matter what follows.
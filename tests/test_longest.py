@@ -0,0 +1,85 @@
+import random
+from unittest import TestCase, mock
+
+from pypeg import *
+from pypeg.utils import ParseContext
+from tests import outcome
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+def choice(shared):
+    # Alternatives starting with the same element, or with equal ones when not `shared`.
+    head = r('[ab]+')
+
+    def h():
+        return head if shared else r('[ab]+')
+
+    return (h() + s('c')) ^ (h() + s('cd')) ^ h() ^ (s('a') + s('bc') == 'w') ^ (h() + s('c') + s('d')[0:1])
+
+
+class LongestTest(TestCase):
+    def test_ties(self):
+        # The last of the longest matches wins.
+        el = (s('ab') == 'x') ^ (s('a') + s('b') == 'y') ^ (s('a') == 'z')
+
+        self.assertEqual(el.parse('ab'), ('', [('y', ['a', 'b'])]))
+        self.assertEqual(el.parse('ab', ignore=' '), ('', [('y', ['a', 'b'])]))
+        self.assertEqual((s('a') ^ s('ab') ^ s('b') ^ s('ab') ^ s('ac') ^ s('a')).parse('ab'), ('', ['ab']))
+
+    def test_shared_head(self):
+        # An element the alternatives start with gets matched only once, with the same results.
+        random.seed(0)
+
+        shared, separate = choice(True), choice(False)
+
+        for _ in range(200):
+            text = ''.join([random.choice('abcd ') for _ in range(random.randint(0, 6))])
+
+            for kw in [{}, {'ignore': ' '}]:
+                self.assertEqual(outcome(shared.parse, text, **kw), outcome(separate.parse, text, **kw), (text, kw))
+                self.assertEqual(outcome(shared[0:].parse, text, **kw), outcome(separate[0:].parse, text, **kw), (text, kw))
+
+    def test_matched_once(self):
+        el = choice(True)
+        match = r.match
+
+        with mock.patch.object(r, 'match', autospec=True, side_effect=match) as matched:
+            self.assertIsNone(el.match('abcx', 0, ParseContext('abcx')))
+
+        # Once for the sequences, once for the alternative that is the head itself - that one has the whole-input check.
+        self.assertEqual(matched.call_count, 2)
+
+        with mock.patch.object(r, 'match', autospec=True, side_effect=match) as matched:
+            self.assertEqual(el.parse('abcd'), ('', ['ab', 'c', 'd']))
+
+        # The last alternative reaches the end of the input, no other one can win over it.
+        self.assertEqual(matched.call_count, 1)
+
+    def test_end_reached(self):
+        # Going through the alternatives stops at the last one reaching the end, the result's the same.
+        seen = []
+
+        def alternative(x):
+            return apply(x, lambda a: seen.append(a) or a)
+
+        el = alternative(s('ab')) ^ alternative(s('a') + s('b')) ^ alternative(s('a'))
+
+        self.assertEqual(el.parse('ab'), ('', ['a', 'b']))
+        self.assertEqual(seen, ['a', 'b'])  # Not 'ab', the first one isn't tried.
+
+    def test_left_out_expected(self):
+        # The alternatives left out could still have gone on at the end of the input, the error expects them as well.
+        num = r('[0-9]+')
+        el = s('[') + ((num + s('.') + num) ^ num) + s(']')
+
+        for kw in [{}, {'packrat': True}, {'ignore': ' '}]:
+            with self.assertRaises(ParseError) as e:
+                el.parse('[9', **kw)
+
+            self.assertEqual(e.exception.expected_names(), ["'.'", "']'"])
+
+        self.assertEqual(el.parse('[9.5]'), ('', ['[', '9', '.', '5', ']']))
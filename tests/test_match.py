@@ -0,0 +1,86 @@
+from unittest import TestCase, mock
+
+from pypeg import *
+from pypeg.utils import FatalParseError, Failures, ParseContext
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+class MatchTest(TestCase):
+    def test_match(self):
+        el = r(r'\d+')
+
+        self.assertEqual(el.match('ab12', 2, ParseContext('ab12')), (4, ['12']))
+        self.assertIsNone(el.match('ab12', 0, ParseContext('ab12')))
+
+    def test_failure_recorded(self):
+        ctx = ParseContext('ab', failures=Failures())
+
+        self.assertIsNone((s('a') + s('c')).match('ab', 0, ctx))
+        self.assertEqual(ctx.failures.pos, 1)
+
+    def test_backtracking_doesnt_raise(self):
+        # The failed alternatives return `None`, only the top-level parse makes an error.
+        el = (s('a') + s('x') | s('a') + s('y') | s('a') + s('z'))[1:]
+        init = ParseError.__init__
+
+        with mock.patch.object(ParseError, '__init__', autospec=True, side_effect=init) as made:
+            self.assertEqual(el.parse('azay'), ('', ['a', 'z', 'a', 'y']))
+            self.assertEqual(made.call_count, 0)
+
+            self.assertFalse(el.test('azaq'))
+            self.assertEqual(made.call_count, 1)
+
+    def test_packrat_failures(self):
+        el = ptr()
+        el &= s('a') + el | s('b')
+
+        table = MemoTable()
+
+        self.assertFalse(el.test('aac', packrat=table))
+        self.assertEqual(el.parse('aab', packrat=table), ('', ['a', 'a', 'b']))
+
+    def test_cut_stays_fatal(self):
+        with self.assertRaises(FatalParseError):
+            (s('a') + cut + s('b') | s('ac')).parse('ac')
+
+    def test_parse_at_override(self):
+        # An element written against the raising API fails with `None` through the fallback.
+        class digit(ParserElement):
+            def parse_at(self, text, pos, **kw):
+                if not text[pos:pos + 1].isdigit():
+                    raise ParseError('Expected a digit!')
+
+                return pos + 1, [text[pos]]
+
+        el = digit('') | s('x')
+
+        self.assertEqual(el.parse('7'), ('', ['7']))
+        self.assertEqual(el.parse('x'), ('', ['x']))
+        self.assertIsNone(digit('').match('x', 0, ParseContext('x')))
+
+    def test_subclass_override(self):
+        # A subclass of a concrete element converting its result in `parse` or `parse_at` is matched through them.
+        class num(r):
+            def parse(self, string, **kw):
+                rest, a = super(num, self).parse(string, **kw)
+
+                return rest, [int(a[0])]
+
+        class digit(r):
+            def parse_at(self, text, pos, **kw):
+                pos, a = super(digit, self).parse_at(text, pos, **kw)
+
+                return pos, [int(a[0])]
+
+        el = num(r'\d+') + s(';')
+
+        self.assertEqual(el.parse('12;'), ('', [12, ';']))
+        self.assertEqual(el.parse(' 12 ;', ignore=' '), ('', [12, ';']))
+        self.assertEqual(el[1:].parse('1;2;', packrat=True), ('', [1, ';', 2, ';']))
+        self.assertFalse(el.test('x;'))
+
+        self.assertEqual((digit(r'\d') + s(';'))[1:].parse('1;2;'), ('', [1, ';', 2, ';']))
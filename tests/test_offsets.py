@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+class OffsetTest(TestCase):
+    def test_literal_at_offset(self):
+        self.assertEqual(s('cd').parse_at('ab12cd', 4), (6, ['cd']))
+
+    def test_pattern_at_offset(self):
+        self.assertEqual(r(r'\d+').parse_at('ab12cd', 2, not_whole=True), (4, ['12']))
+
+    def test_sequence_returns_end(self):
+        el = r(r'\d+') + s('+') + r(r'\d+')
+
+        self.assertEqual(el.parse_at('x=1+2;', 2, not_whole=True), (5, ['1', '+', '2']))
+
+    def test_parse_keeps_rest(self):
+        self.assertEqual(r(r'\d+').parse('12ab', not_whole=True), ('ab', ['12']))
+
+    def test_failure_at_offset(self):
+        with self.assertRaises(ParseError) as e:
+            s('x').parse_at('ab', 1)
+
+        self.assertEqual(e.exception.pos, 1)
+
+    def test_anchor_only_at_start(self):
+        # The pattern is matched at an offset, '^' doesn't match in the middle of the input.
+        self.assertTrue(r(r'^a').test('a'))
+        self.assertFalse((s('b') + r(r'^a')).test('ba'))
+
+    def test_parse_override(self):
+        # An element written against the slicing API still works through the fallback.
+        class upper(ParserElement):
+            def parse(self, string, **kw):
+                if not string[:1].isupper():
+                    raise ParseError('Expected an upper case letter!')
+
+                return string[1:], [string[0]]
+
+        self.assertEqual((s('a') + upper('') + s('b')).parse('aXb'), ('', ['a', 'X', 'b']))
+        self.assertFalse((s('a') + upper('') + s('b')).test('axb'))
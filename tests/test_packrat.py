@@ -0,0 +1,87 @@
+from unittest import TestCase
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+def sums():
+    term, value = ptr(), ptr()
+
+    term &= r('[0-9]+') | s('(') + value + s(')')
+    value &= term + s('+') + value | term + s('-') + value | term
+
+    return value
+
+
+TEXT = '1+(2-3)-(4+(5-6))'
+
+
+class PackratTest(TestCase):
+    def test_same_results(self):
+        el = sums()
+
+        self.assertEqual(el.parse(TEXT, packrat=True), el.parse(TEXT))
+        self.assertEqual(el.test('1+(2-'), el.test('1+(2-', packrat=True))
+
+    def test_table(self):
+        el = sums()
+        table = MemoTable()
+
+        self.assertEqual(el.parse(TEXT, packrat=table), el.parse(TEXT))
+        self.assertGreater(table.hits, 0)
+        self.assertEqual(len(table.entries), 0)  # Cleared after the parse.
+
+    def test_bounded(self):
+        el = sums()
+        table = MemoTable(max_entries=2)
+
+        self.assertEqual(el.parse(TEXT, packrat=table), el.parse(TEXT))
+        self.assertGreater(table.evictions, 0)
+
+        with self.assertRaises(ValueError):
+            MemoTable(max_entries=0)
+
+    def test_only(self):
+        el = sums()
+        table = MemoTable(only=())
+
+        self.assertEqual(el.parse(TEXT, packrat=table), el.parse(TEXT))
+        self.assertEqual(table.hits + table.misses, 0)
+
+        self.assertEqual(memo(el).parse(TEXT, packrat=table), el.parse(TEXT))
+        self.assertEqual(table.misses, 1)
+
+    def test_grammar_kept(self):
+        el = sums()
+
+        el.parse(TEXT, packrat=True)
+        derived = dict(el.derived)
+
+        el.parse(TEXT, packrat=MemoTable())
+
+        self.assertEqual(el.derived, derived)
+
+    def test_subclass_attributes(self):
+        # The copies of the grammar the memo table (and the others rebuilding it) works with keep what a subclass of an
+        # element sets for itself.
+        class num(r):
+            def __init__(self, base):
+                super(num, self).__init__('[0-9a-f]+')
+
+                self.base = base
+
+            def match(self, text, pos, ctx):
+                a = super(num, self).match(text, pos, ctx)
+
+                return None if a is None else (a[0], [int(a[1][0], self.base)])
+
+        el = num(16) + s(';')
+
+        self.assertEqual(el.parse('ff;', packrat=True), ('', [255, ';']))
+        self.assertEqual((el == 'n').parse_tree('ff;').end, 3)
+        self.assertEqual(el.profile('ff;').stats[id(el)].calls, 1)
+        self.assertEqual(Document(el, 'ff;').parse(), ('', [255, ';']))
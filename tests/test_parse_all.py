@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+class ParseAllTest(TestCase):
+    def test_result(self):
+        el = delim_lst(r('[a-z]+') == 'word', s(',').spr(), extra_comma=0)
+
+        self.assertEqual(el.parse_all('ab, cd  ', ignore=' '), el.parse('ab, cd  ', ignore=' ')[1])
+        self.assertEqual(el.compile().parse_all('ab,cd'), el.parse('ab,cd')[1])
+
+    def test_checked_once(self):
+        # Only the top checks for the end of input, an alternative doesn't fail on it to let the next one try.
+        el = s('a') | s('ab')
+
+        self.assertEqual(el.parse('ab'), ('', ['ab']))
+
+        with self.assertRaises(ParseError) as e:
+            el.parse_all('ab')
+
+        self.assertEqual((e.exception.offset, e.exception.expected_names()), (1, ['end of input']))
+
+    def test_error(self):
+        with self.assertRaises(ParseError) as e:
+            s('a')[1:].parse_all('aab')
+
+        self.assertEqual((e.exception.offset, e.exception.expected_names()), (2, ["'a'", 'end of input']))
+
+        with self.assertRaises(ParseError):
+            s('a').compile().parse_all('b')
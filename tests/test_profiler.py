@@ -0,0 +1,67 @@
+from unittest import TestCase
+
+from pypeg import *
+from pypeg.profiler import profiled
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+class ProfilerTest(TestCase):
+    def setUp(self):
+        self.a, self.b, self.x = s('a'), s('b'), s('x')
+        self.el = (self.a + self.x | self.a + self.b)[1:]
+
+    def stats(self, profile, el):
+        x = profile.stats[id(el)]
+
+        return x.calls, x.successes, x.failures, x.backtracks, x.consumed
+
+    def test_counts(self):
+        profile = self.el.profile('abab')
+
+        # `a` is tried again at both positions after the first alternative fails on `x`.
+        self.assertEqual(self.stats(profile, self.a), (4, 4, 0, 2, 4))
+        self.assertEqual(self.stats(profile, self.x), (2, 0, 2, 0, 0))
+        self.assertEqual(self.stats(profile, self.b), (2, 2, 0, 0, 2))
+        self.assertEqual(self.stats(profile, self.el), (1, 1, 0, 0, 4))
+
+    def test_times(self):
+        profile = self.el.profile('abab')
+
+        for x in profile.stats.values():
+            self.assertGreaterEqual(x.total, x.own)
+            self.assertGreaterEqual(x.own, 0)
+
+        self.assertGreaterEqual(profile.stats[id(self.el)].total,
+                                sum([x.own for x in profile.stats.values()]) * 0.999)
+
+    def test_report(self):
+        profile = self.el.profile('abab')
+
+        lines = profile.report(key='calls').split('\n')
+
+        self.assertEqual(len(lines), 1 + len(profile.sorted()))
+        self.assertTrue(lines[1].split()[0] == '4' and lines[1].endswith("s s'a'"))
+
+        exported = profile.export(key='calls')
+
+        self.assertEqual([x['calls'] for x in exported], sorted([x['calls'] for x in exported], reverse=True))
+        self.assertEqual(exported[0]['type'], 's')
+
+    def test_pointer(self):
+        el = ptr()
+        el &= s('(') + el + s(')') | s('x')
+
+        profile = el.profile('((x))')
+
+        self.assertEqual(profile.stats[id(el)].calls, 3)
+        self.assertEqual(profile.stats[id(el)].consumed, 5 + 3 + 1)
+
+    def test_grammar_unchanged(self):
+        self.el.profile('abab')
+
+        self.assertFalse(any([type(x) is profiled for x in self.el.walk()]))
+        self.assertEqual(self.el.profile('ab').parse('abab'), self.el.parse('abab'))
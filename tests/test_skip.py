@@ -0,0 +1,74 @@
+import mmap
+import tempfile
+from unittest import TestCase
+
+from pypeg import *
+from pypeg.utils import make_skipper, skipper
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+class SkipperTest(TestCase):
+    def test_skip(self):
+        skip = make_skipper(r'\s+')
+
+        self.assertEqual(skip('a \t\n b', 1), 5)
+        self.assertEqual(skip('a b', 0), 0)
+        self.assertEqual(skip('a ', 2), 2)
+
+    def test_middle(self):
+        # From a position inside of the input, up to where the ignored text ends.
+        skip = make_skipper(r'\s+|#[^\n]*')
+        text = 'a  # one\n  b # two\n\nc'
+
+        self.assertEqual(skip(text, 1), 11)
+        self.assertEqual(skip(text, 5), 5)
+        self.assertEqual(skip(text, 12), 20)
+        self.assertEqual(skip(text, 20), 20)
+
+    def test_global_flags(self):
+        # The pattern can't be repeated inside another one, it's matched again and again instead.
+        skip = make_skipper('(?i)x')
+
+        self.assertEqual(skip('aXxXb', 1), 4)
+        self.assertEqual(skip('aXxXb', 0), 0)
+        self.assertEqual(make_skipper('(?x) x | y ')('axyxb', 1), 4)
+        self.assertEqual((s('a') + s('b')).parse('aXxb', ignore='(?i)x'), ('', ['a', 'b']))
+
+    def test_empty_match(self):
+        # A pattern matching nothing ends the skipping rather than repeating forever.
+        for ignore in [r'\s*', r'(?i)\s*', r'(?i)x?']:
+            skip = make_skipper(ignore)
+
+            self.assertEqual(skip('ab', 1), 1)
+
+        self.assertEqual(make_skipper(r'\s*')('a  b', 1), 3)
+        self.assertEqual(make_skipper(r'(?i)\s*')('a  b', 1), 3)
+        self.assertEqual((s('a') + s('b')).parse('a  b', ignore=r'\s*'), ('', ['a', 'b']))
+
+    def test_bytes(self):
+        for ignore in [rb'\s+', rb'(?i)x']:
+            skip = make_skipper(ignore)
+            text = b'a  b' if ignore == rb'\s+' else b'axXb'
+
+            self.assertEqual(skip(text, 1), 3)
+            self.assertEqual(skip(bytearray(text), 1), 3)
+
+            with tempfile.TemporaryFile() as f:
+                f.write(text)
+                f.flush()
+
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    self.assertEqual(skip(m, 1), 3)
+
+        self.assertEqual((s(b'a') + s(b'b')).parse(b'a \n b', ignore=rb'\s+'), (b'', [b'a', b'b']))
+
+    def test_cached(self):
+        self.assertIs(skipper(r'\s+'), skipper(r'\s+'))
+        self.assertIsNot(skipper(r'\s+'), skipper(rb'\s+'))
+
+        with self.assertRaises(TypeError):
+            skipper(1)
@@ -0,0 +1,72 @@
+import io
+from unittest import TestCase
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+def pairs():
+    pair = (r('[a-z]+') + s('=').spr() + r('[0-9]+')) == 'pair'
+
+    return delim_lst(pair, s(',').spr(), extra_comma=0)
+
+
+TEXT = ',\n'.join(['{}={}'.format(chr(97 + i % 26) * 3, i) for i in range(50)])
+
+
+def error(fn):
+    try:
+        fn()
+
+    except ParseError as e:
+        return e
+
+    raise AssertionError('No error raised!')
+
+
+class StreamTest(TestCase):
+    def test_chunk_boundaries(self):
+        # The items come out the same wherever the chunks split them.
+        expected = pairs().parse(TEXT, ignore=r'\s+')[1]
+
+        for size in [1, 2, 3, 7, 64, 65536]:
+            items = list(pairs().iterparse(io.StringIO(TEXT), chunk_size=size, lookahead=8, ignore=r'\s+'))
+
+            self.assertEqual(len(items), 50)
+            self.assertEqual([x for y in items for x in y], expected, size)
+
+    def test_iterator(self):
+        el = s('ab')[0:]
+        chunks = ['a', 'ba', '', 'b', 'ab']
+
+        self.assertEqual(list(el.iterparse(iter(chunks), lookahead=2)), [['ab']] * 3)
+
+    def test_error_position(self):
+        # The position counts the input dropped from the window.
+        text = TEXT[:100] + '?' + TEXT[101:]
+
+        expected = error(lambda: pairs().parse(text, ignore=r'\s+'))
+
+        for size in [1, 3, 64]:
+            e = error(lambda: list(pairs().iterparse(io.StringIO(text), chunk_size=size, lookahead=8,
+                                                       ignore=r'\s+')))
+
+            self.assertEqual((e.offset, e.line, e.column), (expected.offset, expected.line, expected.column))
+            self.assertEqual(e.expected_names(), expected.expected_names())
+
+    def test_end_of_input(self):
+        e = error(lambda: list(s('a')[0:].iterparse(iter(['aa', 'ab']))))
+
+        self.assertEqual((e.offset, e.expected_names()), (3, ["'a'", 'end of input']))
+
+    def test_max_record(self):
+        with self.assertRaises(ParseError):
+            list(r('[a-z]+')[0:].iterparse(iter(['abc'] * 100), lookahead=4, max_record=16))
+
+    def test_not_repeated(self):
+        with self.assertRaises(TypeError):
+            list((s('a') + s('b')).iterparse(iter(['ab'])))
@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from pypeg import *
+
+__author__ = 'Jan Růžička'
+__email__ = 'jan.ruzicka01@gmail.com'
+
+__version__ = '1.0'
+
+
+def pairs():
+    key = r('[a-z]+') == 'key'
+    value = r('[0-9]+') == 'value'
+
+    return delim_lst(g(key + s('=').spr() + value) == 'pair', s(',').spr(), extra_comma=0)
+
+
+class TreeTest(TestCase):
+    def test_tree(self):
+        root = pairs().parse_tree('a = 1, bc = 23', ignore=r'\s+')
+
+        self.assertIsNone(root.name)
+        self.assertEqual([x.name for x in root.children], ['pair', 'pair'])
+        self.assertEqual([x.text for x in root.walk()], ['a = 1, bc = 23', 'a = 1', 'a', '1', 'bc = 23', 'bc', '23'])
+
+        bc = root.children[1].children[0]
+
+        self.assertEqual((bc.pos, bc.start, bc.end), (6, 7, 9))
+
+    def test_named_root(self):
+        # A named root is the root node itself, not wrapped in another one.
+        el = (s('a') + s('b')) == 'pair'
+
+        root = el.parse_tree('ab')
+
+        self.assertEqual((root.name, root.start, root.end, root.children), ('pair', 0, 2, []))
+        self.assertEqual(root.to_list(), el.parse('ab')[1])
+
+    def test_to_list(self):
+        el = pairs()
+        text = 'a=1,b=2'
+
+        self.assertEqual([x.to_list() for x in el.parse_tree(text).children], [[x] for x in el.parse(text)[1]])
+
+    def test_error(self):
+        with self.assertRaises(ParseError):
+            pairs().parse_tree('a = 1, b')